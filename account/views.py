@@ -1,13 +1,16 @@
+from django.conf import settings
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.shortcuts import get_current_site
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
+from orders.history import ORDER_HISTORY_ORDERING, order_summary
 from orders.views import user_orders
+from store.pagination import InvalidCursor, KeysetPaginator
 
 from .forms import RegistrationForm, UserEditForm
 from .models import UserBase
@@ -17,13 +20,20 @@ from .tokens import account_activation_token
 @login_required
 def dashboard(request):
     """
-    Display the user dashboard with a list of their orders.
-    Only accessible to logged-in users.
+    Display the user dashboard with a page of their orders and a summary
+    of all of them. Only accessible to logged-in users.
     """
-    orders = user_orders(request)
+    paginator = KeysetPaginator(
+        user_orders(request), settings.ORDER_HISTORY_PAGE_SIZE, ordering=ORDER_HISTORY_ORDERING
+    )
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise Http404('Invalid page')
     return render(request,
                   'account/dashboard/dashboard.html',
-                  {'section': 'profile', 'orders': orders})
+                  {'section': 'profile', 'orders': page.object_list, 'page': page,
+                   'summary': order_summary(request.user.id)})
 
 
 @login_required
@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .models import DailyCategorySales, DailyProductSales, DailySales, SalesWatermark
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    list_display = ["day", "orders", "units", "revenue"]
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ["day", "product", "units", "revenue"]
+    raw_id_fields = ["product"]
+
+
+@admin.register(DailyCategorySales)
+class DailyCategorySalesAdmin(admin.ModelAdmin):
+    list_display = ["day", "category", "units", "revenue"]
+
+
+admin.site.register(SalesWatermark)
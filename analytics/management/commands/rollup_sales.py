@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollup import rollup_orders
+
+
+class Command(BaseCommand):
+    help = "Add the paid orders changed since the last run to the daily sales rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders aggregated per transaction")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(count):
+            self.stdout.write(f"{count} orders rolled up")
+
+        count = rollup_orders(batch_size=options["batch_size"], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {count} orders in {elapsed:.1f}s"))
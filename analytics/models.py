@@ -0,0 +1,88 @@
+from django.db import models
+
+from orders.models import Order
+from store.models import Category, Product
+
+
+class SalesWatermark(models.Model):
+    """
+    How far the rollup command has read a source table.
+
+    ``value`` is the largest ``updated`` timestamp of the orders rolled up
+    so far; the next run only scans orders changed since (minus a small
+    overlap, see analytics.rollup).
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class RolledUpOrder(models.Model):
+    """
+    Marks an order as counted in the rollups, so re-reading it (after an
+    update, or in the watermark overlap) never counts it twice.
+    """
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    rolled_up_at = models.DateTimeField(auto_now_add=True)
+
+
+class DailySales(models.Model):
+    """
+    Paid orders, units and revenue (including shipping) per day.
+    """
+
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ("-day",)
+        verbose_name_plural = "daily sales"
+
+    def __str__(self):
+        return str(self.day)
+
+
+class DailyProductSales(models.Model):
+    """
+    Units and item revenue of one product per day.
+    """
+
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ("-day", "product")
+        verbose_name_plural = "daily product sales"
+        constraints = [models.UniqueConstraint(fields=["day", "product"], name="analytics_product_day_unique")]
+
+    def __str__(self):
+        return f"{self.day}: {self.product_id}"
+
+
+class DailyCategorySales(models.Model):
+    """
+    Units and item revenue of the products filed directly under one
+    category per day. Totals for a whole subtree are summed over the
+    category tree when reporting, so they stay right when categories move.
+    """
+
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ("-day", "category")
+        verbose_name_plural = "daily category sales"
+        constraints = [models.UniqueConstraint(fields=["day", "category"], name="analytics_category_day_unique")]
+
+    def __str__(self):
+        return f"{self.day}: {self.category_id}"
@@ -0,0 +1,74 @@
+"""
+Sales reports built from the rollup tables only.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from store.category_tree import get_category_tree
+
+from .models import DailyCategorySales, DailyProductSales, DailySales
+
+
+def sales_report(days=30, top=20):
+    """
+    Summarise the last ``days`` days of sales.
+
+    Args:
+        days (int): Number of days to report, including today.
+        top (int): Number of best-selling products to list.
+
+    Returns:
+        dict: The ``start`` day, ``daily`` rows, ``totals``, ``products``
+        and ``categories`` (tree nodes with subtree totals).
+    """
+    start = timezone.localdate() - timedelta(days=days - 1)
+    daily = list(DailySales.objects.filter(day__gte=start))
+    totals = {
+        "orders": sum(row.orders for row in daily),
+        "units": sum(row.units for row in daily),
+        "revenue": sum((row.revenue for row in daily), Decimal(0)),
+    }
+    products = (
+        DailyProductSales.objects.filter(day__gte=start)
+        .values("product_id", "product__title")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-units", "product_id")[:top]
+    )
+    return {
+        "start": start,
+        "daily": daily,
+        "totals": totals,
+        "products": list(products),
+        "categories": category_totals(start),
+    }
+
+
+def category_totals(start):
+    """
+    Return ``(node, units, revenue)`` for every category with sales since
+    ``start``, in tree order, each counting its whole subtree.
+    """
+    direct = defaultdict(lambda: [0, Decimal(0)])
+    rows = (
+        DailyCategorySales.objects.filter(day__gte=start)
+        .values_list("category_id")
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by()
+    )
+    for category_id, units, revenue in rows:
+        direct[category_id] = [units, revenue]
+
+    tree = get_category_tree()
+    result = []
+    for node in tree:
+        ids = tree.descendant_ids(node)
+        units = sum(direct[category_id][0] for category_id in ids if category_id in direct)
+        if units:
+            revenue = sum((direct[category_id][1] for category_id in ids if category_id in direct), Decimal(0))
+            result.append((node, units, revenue))
+    return result
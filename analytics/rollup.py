@@ -0,0 +1,144 @@
+"""
+Incremental sales rollups.
+
+``rollup_orders()`` reads the paid orders changed since the last run, in
+batches, and adds them to the daily rollup tables. Each batch is
+aggregated with three GROUP BY queries over just its orders and folded
+into the rollups with one upsert per table, in the same transaction that
+marks its orders as rolled up. Reports then read the small rollup tables
+instead of scanning ``orders_orderitem``.
+
+The watermark is the largest ``updated`` timestamp seen so far. Rows
+written by transactions that committed late can carry an older timestamp,
+so every run re-reads a window of WATERMARK_OVERLAP before it; the
+RolledUpOrder markers make sure nothing in that window is counted twice.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.functions import TruncDate
+
+from orders.models import Order, OrderItem
+
+from .models import DailyCategorySales, DailyProductSales, DailySales, RolledUpOrder, SalesWatermark
+
+ORDERS_WATERMARK = "orders"
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def pending_orders(since=None):
+    """
+    Return the paid orders not rolled up yet, changed at or after ``since``.
+    """
+    orders = Order.objects.filter(billing_status=True).filter(
+        ~Exists(RolledUpOrder.objects.filter(order=OuterRef("pk")))
+    )
+    if since is not None:
+        orders = orders.filter(updated__gte=since)
+    return orders
+
+
+def rollup_orders(batch_size=1000, progress=None):
+    """
+    Add every pending paid order to the rollups.
+
+    Args:
+        batch_size (int): Orders aggregated per transaction.
+        progress (callable): Called with the running number of orders after each batch.
+
+    Returns:
+        int: Number of orders rolled up.
+    """
+    watermark, _ = SalesWatermark.objects.get_or_create(name=ORDERS_WATERMARK)
+    since = watermark.value - WATERMARK_OVERLAP if watermark.value else None
+
+    total = 0
+    while True:
+        count = _rollup_batch(since, batch_size)
+        if not count:
+            return total
+        total += count
+        if progress:
+            progress(total)
+
+
+@transaction.atomic
+def _rollup_batch(since, batch_size):
+    # Locking the watermark row serialises concurrent runs, so a batch is never picked up twice.
+    watermark = SalesWatermark.objects.select_for_update().get(name=ORDERS_WATERMARK)
+    batch = list(pending_orders(since).order_by("updated", "id").values_list("id", "updated")[:batch_size])
+    if not batch:
+        return 0
+    order_ids = [order_id for order_id, updated in batch]
+
+    days = (
+        Order.objects.filter(id__in=order_ids)
+        .annotate(day=TruncDate("created"))
+        .values("day")
+        .annotate(orders=Count("id"), revenue=Sum("total_paid"))
+        .order_by()
+    )
+    lines = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .annotate(day=TruncDate("order__created"))
+        .values("day", "product_id", "product__category_id")
+        .annotate(
+            units=Sum("quantity"),
+            revenue=Sum(F("price") * F("quantity"), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+        )
+        .order_by()
+    )
+
+    daily = {(row["day"],): [row["orders"], 0, row["revenue"]] for row in days}
+    products = {}
+    categories = defaultdict(lambda: [0, Decimal(0)])
+    for row in lines:
+        day, units, revenue = row["day"], row["units"], Decimal(row["revenue"])
+        daily[(day,)][1] += units
+        products[(day, row["product_id"])] = [units, revenue]
+        category = categories[(day, row["product__category_id"])]
+        category[0] += units
+        category[1] += revenue
+
+    _increment(DailySales, ["day"], ["orders", "units", "revenue"], daily)
+    _increment(DailyProductSales, ["day", "product_id"], ["units", "revenue"], products)
+    _increment(DailyCategorySales, ["day", "category_id"], ["units", "revenue"], categories)
+    RolledUpOrder.objects.bulk_create(RolledUpOrder(order_id=order_id) for order_id in order_ids)
+
+    newest = batch[-1][1]
+    if watermark.value is None or newest > watermark.value:
+        watermark.value = newest
+        watermark.save(update_fields=["value"])
+    return len(batch)
+
+
+def _increment(model, key_fields, value_fields, deltas):
+    """
+    Add ``deltas`` (a dict of key tuple to value list) to the rollup rows
+    with those keys, creating the missing ones, in one upsert.
+    """
+    if not deltas:
+        return
+    current = model.objects.filter(
+        **{f"{field}__in": {key[position] for key in deltas} for position, field in enumerate(key_fields)}
+    ).values_list(*key_fields, *value_fields)
+    totals = {key: list(values) for key, values in deltas.items()}
+    for row in current:
+        key = row[: len(key_fields)]
+        if key in totals:
+            totals[key] = [old + delta for old, delta in zip(row[len(key_fields):], totals[key])]
+
+    unique_fields = [field.removesuffix("_id") for field in key_fields]
+    model.objects.bulk_create(
+        [
+            model(**dict(zip(key_fields, key)), **dict(zip(value_fields, values)))
+            for key, values in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=value_fields,
+    )
@@ -0,0 +1,106 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from analytics.models import DailyCategorySales, DailyProductSales, DailySales, RolledUpOrder, SalesWatermark
+from analytics.reports import sales_report
+from analytics.rollup import rollup_orders
+from orders.models import Order, OrderItem
+from orders.views import payment_confirmation
+from store.models import Category, Product, ProductType
+
+
+class TestSalesRollup(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        self.books = Category.objects.create(name='books', slug='books')
+        self.django = Category.objects.create(name='django', slug='django', parent=self.books)
+        self.python = Product.objects.create(
+            product_type=product_type, category=self.books, title='python', slug='python',
+            regular_price='10.00', discount_price='10.00',
+        )
+        self.orm = Product.objects.create(
+            product_type=product_type, category=self.django, title='orm', slug='orm',
+            regular_price='5.00', discount_price='5.00',
+        )
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.today = timezone.localdate()
+
+    def order(self, key, lines, paid=True):
+        total = sum(Decimal(product.regular_price) * qty for product, qty in lines)
+        order = Order.objects.create(
+            user=self.user, full_name='name', address1='add1', address2='add2', city='', phone='',
+            post_code='', total_paid=total, order_key=key, billing_status=paid,
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price=product.regular_price, quantity=qty)
+            for product, qty in lines
+        )
+        return order
+
+    def test_rollup_counts_paid_orders_once(self):
+        self.order('a', [(self.python, 2), (self.orm, 1)])
+        self.order('b', [(self.orm, 3)])
+        unpaid = self.order('c', [(self.python, 5)], paid=False)
+
+        self.assertEqual(rollup_orders(batch_size=1), 2)
+        self.assertEqual(rollup_orders(), 0)
+        day = DailySales.objects.get(day=self.today)
+        self.assertEqual((day.orders, day.units, day.revenue), (2, 6, Decimal('40.00')))
+        self.assertEqual(
+            dict(DailyProductSales.objects.values_list('product_id', 'units')), {self.python.id: 2, self.orm.id: 4}
+        )
+        self.assertEqual(DailyCategorySales.objects.get(category=self.django).revenue, Decimal('20.00'))
+
+        payment_confirmation(unpaid.order_key)
+        self.assertEqual(rollup_orders(), 1)
+        day.refresh_from_db()
+        self.assertEqual((day.orders, day.units, day.revenue), (3, 11, Decimal('90.00')))
+        self.assertEqual(DailyProductSales.objects.get(product=self.python).units, 7)
+        self.assertEqual(RolledUpOrder.objects.count(), 3)
+
+    def test_watermark_skips_old_orders(self):
+        old = self.order('old', [(self.python, 1)])
+        rollup_orders()
+        RolledUpOrder.objects.all().delete()
+        Order.objects.filter(pk=old.pk).update(updated=timezone.now() - timedelta(days=1))
+        self.assertEqual(rollup_orders(), 0)
+        self.assertIsNotNone(SalesWatermark.objects.get().value)
+
+    def test_report_rolls_categories_up_the_tree(self):
+        self.order('a', [(self.python, 2), (self.orm, 1)])
+        rollup_orders()
+        report = sales_report(days=7)
+        self.assertEqual(report['totals'], {'orders': 1, 'units': 3, 'revenue': Decimal('25.00')})
+        self.assertEqual(
+            [(node.slug, units, revenue) for node, units, revenue in report['categories']],
+            [('books', 3, Decimal('25.00')), ('django', 1, Decimal('5.00'))],
+        )
+        self.assertEqual(report['products'][0]['product__title'], 'python')
+
+    def test_command(self):
+        self.order('a', [(self.python, 1)])
+        out = StringIO()
+        call_command('rollup_sales', stdout=out)
+        self.assertIn('Rolled up 1 orders', out.getvalue())
+
+    def test_report_view_is_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('analytics:sales')).status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.order('a', [(self.python, 1)])
+        rollup_orders()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('analytics:sales'), {'days': 7})
+        self.assertContains(response, 'python')
+        self.assertFalse([query for query in queries if 'orders_' in query['sql']])
@@ -0,0 +1,21 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+
+from .reports import sales_report
+
+REPORT_PERIODS = (7, 30, 90, 365)
+
+
+@staff_member_required
+def sales(request):
+    """
+    Staff-only sales report over the rollup tables.
+    """
+    try:
+        days = int(request.GET.get("days", 30))
+    except ValueError:
+        days = 30
+    if days not in REPORT_PERIODS:
+        days = 30
+    report = sales_report(days)
+    return render(request, "analytics/sales.html", {"report": report, "days": days, "periods": REPORT_PERIODS})
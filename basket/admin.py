@@ -1,3 +1,9 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BasketLine
+
+
+@admin.register(BasketLine)
+class BasketLineAdmin(admin.ModelAdmin):
+    list_display = ["user", "product", "qty", "cents", "updated_at"]
+    raw_id_fields = ["user", "product"]
@@ -1,27 +1,116 @@
+from contextlib import asynccontextmanager, contextmanager
 from decimal import Decimal
+from typing import NamedTuple
 
 from django.conf import settings
 from store.models import Product
 
+from .encoding import WIRE_VERSION, decode, encode, from_cents, to_cents
+from .storage import get_storage
+
+SHIPPING_CENTS = 1150
+
+
+class BasketItem(NamedTuple):
+    """
+    One basket line with its resolved product, as yielded by iterating a Basket.
+    """
+
+    product: Product
+    price: Decimal
+    qty: int
+    total_price: Decimal
+
 
 class Basket:
     """
     A base Basket class, providing default behaviors for managing
-    a shopping basket using Django sessions.
+    a shopping basket using Django sessions or a signed cookie.
+
+    The basket is stored (see basket.storage) as parallel arrays of product ids,
+    quantities and unit prices in cents, plus the running item count and
+    subtotal, which are updated on every change so counts and prices never
+    need to re-read every line::
+
+        {"v": 2, "ids": [3, 7], "qty": [1, 2], "cents": [2000, 999], "count": 3, "subtotal": 3998}
     """
 
     def __init__(self, request):
         """
-        Initialize the basket.
-        If no basket is in the session, create an empty one.
-        
+        Initialize the basket from its storage, migrating older encodings.
+        An empty basket is only stored once something is added.
+
         :param request: Django HttpRequest object
         """
-        self.session = request.session
-        basket = self.session.get(settings.BASKET_SESSION_ID)
-        if settings.BASKET_SESSION_ID not in request.session:
-            basket = self.session[settings.BASKET_SESSION_ID] = {}
-        self.basket = basket
+        self.storage = get_storage(request)
+        if self._load(self.storage.load()):
+            self.save()
+
+    @classmethod
+    async def acreate(cls, request, user):
+        """
+        Async version of the constructor.
+
+        :param user: The request's user, as returned by ``await request.auser()``
+        """
+        basket = cls.__new__(cls)
+        basket.storage = get_storage(request, user)
+        if basket._load(await basket.storage.aload()):
+            await basket.asave()
+        return basket
+
+    def _load(self, data):
+        """
+        Set up the basket from stored data.
+
+        :return: True if the data used an older encoding and should be saved again
+        """
+        self._changed = set()
+        self.unavailable = set()
+        self._batching = False
+        self._products = {}
+        self.ids, self.qtys, self.cents = decode(data)
+        self._positions = {product_id: position for position, product_id in enumerate(self.ids)}
+        if data and data.get("v") == WIRE_VERSION:
+            self.count, self.subtotal = data["count"], data["subtotal"]
+            return False
+        self.count, self.subtotal = self.compute_totals()
+        return bool(data)
+
+    def compute_totals(self):
+        """
+        Recompute the running totals from the basket lines.
+
+        :return: Tuple of the item count and subtotal in cents
+        """
+        return sum(self.qtys), sum(qty * cents for qty, cents in zip(self.qtys, self.cents))
+
+    def check_totals(self):
+        """
+        Verify that the running totals match the basket lines.
+
+        :raises AssertionError: If they have drifted apart
+        """
+        expected = self.compute_totals()
+        if (self.count, self.subtotal) != expected:
+            raise AssertionError(f"Basket totals {(self.count, self.subtotal)} do not match lines {expected}")
+
+    def _set_qty(self, position, qty):
+        delta = qty - self.qtys[position]
+        if not delta:
+            return False
+        self.qtys[position] = qty
+        self._changed.add(self.ids[position])
+        self.count += delta
+        self.subtotal += delta * self.cents[position]
+        return True
+
+    def _append(self, product_id, cents):
+        position = self._positions[product_id] = len(self.ids)
+        self.ids.append(product_id)
+        self.qtys.append(0)
+        self.cents.append(cents)
+        return position
 
     def add(self, product, qty):
         """
@@ -30,31 +119,72 @@ class Basket:
         :param product: Product instance to add
         :param qty: Quantity of the product
         """
-        product_id = str(product.id)
+        position = self._positions.get(product.id)
 
-        if product_id in self.basket:
-            self.basket[product_id]["qty"] = qty
+        if position is not None:
+            changed = self._set_qty(position, qty)
         else:
-            self.basket[product_id] = {"price": str(product.regular_price), "qty": qty}
+            self._set_qty(self._append(product.id, to_cents(product.regular_price)), qty)
+            changed = True
 
-        self.save()
+        if changed:
+            self.save()
 
-    def __iter__(self):
+    def merge(self, data):
         """
-        Iterate over the basket items and attach the product instances.
-        Also calculate the total price per item.
+        Merge another stored basket into this one.
+        Quantities from the other basket win for products in both, and
+        products that no longer exist are dropped.
+
+        :param data: Stored basket data, as returned by a storage backend
         """
-        product_ids = self.basket.keys()
-        products = Product.objects.filter(id__in=product_ids)
-        basket = self.basket.copy()
+        lines = list(zip(*decode(data)))
+        existing = set(Product.objects.filter(id__in=[line[0] for line in lines]).values_list("id", flat=True))
+        changed = False
+        for product_id, qty, cents in lines:
+            if product_id not in existing:
+                continue
+            position = self._positions.get(product_id)
+            if position is None:
+                position = self._append(product_id, cents)
+            changed = self._set_qty(position, qty) or changed
+        if changed:
+            self.save()
+
+    def get_products(self):
+        """
+        Resolve the products in the basket.
 
-        for product in products:
-            basket[str(product.id)]["product"] = product
+        Products are fetched once and memoised, so iterating the basket again
+        only queries for products added since.
 
-        for item in basket.values():
-            item["price"] = Decimal(item["price"])
-            item["total_price"] = item["price"] * item["qty"]
-            yield item
+        :return: Dict of product id to Product instance
+        """
+        missing = [product_id for product_id in self.ids if product_id not in self._products]
+        if missing:
+            self._products.update(Product.objects.with_feature_image().in_bulk(missing))
+        return self._products
+
+    async def aget_products(self):
+        """
+        Async version of get_products().
+        """
+        missing = [product_id for product_id in self.ids if product_id not in self._products]
+        if missing:
+            async for product in Product.objects.with_feature_image().filter(id__in=missing):
+                self._products[product.id] = product
+        return self._products
+
+    def __iter__(self):
+        """
+        Iterate over the basket lines with their product instances.
+        Lines whose product no longer exists are skipped.
+        """
+        products = self.get_products()
+        for product_id, qty, cents in zip(self.ids, self.qtys, self.cents):
+            if product_id in products:
+                price = from_cents(cents)
+                yield BasketItem(products[product_id], price, qty, price * qty)
 
     def __len__(self):
         """
@@ -62,19 +192,18 @@ class Basket:
 
         :return: Total quantity of all basket items
         """
-        return sum(item["qty"] for item in self.basket.values())
+        return self.count
 
     def update(self, product, qty):
         """
         Update the quantity of a product in the basket.
 
-        :param product: Product instance to update
+        :param product: Id of the product to update
         :param qty: New quantity
         """
-        product_id = str(product)
-        if product_id in self.basket:
-            self.basket[product_id]["qty"] = qty
-        self.save()
+        position = self._positions.get(int(product))
+        if position is not None and self._set_qty(position, qty):
+            self.save()
 
     def get_subtotal_price(self):
         """
@@ -82,7 +211,7 @@ class Basket:
 
         :return: Subtotal as Decimal
         """
-        return sum(Decimal(item["price"]) * item["qty"] for item in self.basket.values())
+        return from_cents(self.subtotal)
 
     def get_total_price(self):
         """
@@ -90,37 +219,114 @@ class Basket:
 
         :return: Total price as Decimal
         """
-        subtotal = sum(Decimal(item["price"]) * item["qty"] for item in self.basket.values())
-
-        if subtotal == 0:
-            shipping = Decimal(0.00)
-        else:
-            shipping = Decimal(11.50)
-
-        total = subtotal + shipping
-        return total
+        shipping = SHIPPING_CENTS if self.subtotal else 0
+        return from_cents(self.subtotal + shipping)
 
     def delete(self, product):
         """
         Remove a product from the basket.
 
-        :param product: Product instance to remove
+        :param product: Id of the product to remove
         """
-        product_id = str(product)
+        position = self._positions.get(int(product))
 
-        if product_id in self.basket:
-            del self.basket[product_id]
+        if position is not None:
+            self._set_qty(position, 0)
+            self._changed.add(self.ids[position])
+            for values in (self.ids, self.qtys, self.cents):
+                del values[position]
+            self._positions = {product_id: position for position, product_id in enumerate(self.ids)}
             self.save()
 
     def clear(self):
         """
-        Remove the entire basket from the session.
+        Remove the entire basket from its storage.
         """
-        del self.session[settings.BASKET_SESSION_ID]
-        self.save()
+        self.ids, self.qtys, self.cents = [], [], []
+        self.count = self.subtotal = 0
+        self._positions = {}
+        self.unavailable = set()
+        self.storage.clear()
+
+    @contextmanager
+    def batch(self):
+        """
+        Apply several changes with a single write to the storage.
+
+        Changes made inside the block are saved once when it exits
+        normally; nothing is saved if it raises.
+        """
+        self._batching = True
+        try:
+            yield self
+        finally:
+            self._batching = False
+        if self._changed:
+            self.save()
+
+    @asynccontextmanager
+    async def abatch(self):
+        """
+        Async version of batch(): changes made inside the block are saved
+        with ``asave()`` when it exits.
+        """
+        self._batching = True
+        try:
+            yield self
+        finally:
+            self._batching = False
+        if self._changed:
+            await self.asave()
+
+    def _encode_changes(self):
+        if settings.BASKET_CHECK_TOTALS:
+            self.check_totals()
+        changed, self._changed = self._changed, set()
+        return encode(self.ids, self.qtys, self.cents, self.count, self.subtotal), changed
 
     def save(self):
         """
-        Mark the session as modified to make sure it's saved.
+        Write the basket to its storage.
+        """
+        if self._batching:
+            return
+        data, changed = self._encode_changes()
+        self._set_unavailable(changed, self.storage.save(data, changed))
+
+    async def asave(self):
+        """
+        Async version of save().
         """
-        self.session.modified = True
+        data, changed = self._encode_changes()
+        self._set_unavailable(changed, await self.storage.asave(data, changed))
+
+    def _set_unavailable(self, changed, short):
+        """
+        Track the products whose basket quantity could not be held in stock.
+        """
+        self.unavailable = (self.unavailable - changed) | set(short or ())
+
+
+def get_basket(request):
+    """
+    Return the basket of this request, creating it on first use.
+
+    Views, context processors and helpers share the one instance, so
+    products are resolved at most once per request.
+    """
+    try:
+        return request._basket
+    except AttributeError:
+        request._basket = Basket(request)
+        return request._basket
+
+
+async def aget_basket(request):
+    """
+    Async version of get_basket().
+    """
+    try:
+        return request._basket
+    except AttributeError:
+        request._basket = await Basket.acreate(request, await request.auser())
+        return request._basket
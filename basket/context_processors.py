@@ -1,5 +1,7 @@
-from .basket import Basket
+from django.utils.functional import SimpleLazyObject
+
+from .basket import get_basket
 
 
 def basket(request):
-    return {"basket": Basket(request)}
\ No newline at end of file
+    return {"basket": SimpleLazyObject(lambda: get_basket(request))}
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+# Version of the basket encoding written by save().
+WIRE_VERSION = 2
+
+
+def to_cents(price):
+    """
+    Convert a price (Decimal or string) to integer minor units.
+    """
+    return int(Decimal(price).scaleb(2).to_integral_value())
+
+
+def from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+def decode(data):
+    """
+    Decode stored basket data of any supported version.
+
+    Besides the current encoding this accepts the original format,
+    {product_id: {"price": str, "qty": int}}.
+
+    :return: Tuple of the product id, quantity and price-in-cents lists
+    """
+    if not data:
+        return [], [], []
+    if data.get("v") == WIRE_VERSION:
+        return data["ids"], data["qty"], data["cents"]
+    return (
+        [int(product_id) for product_id in data],
+        [item["qty"] for item in data.values()],
+        [to_cents(item["price"]) for item in data.values()],
+    )
+
+
+def encode(ids, qtys, cents, count=None, subtotal=None):
+    """
+    Build the stored form of a basket, computing the totals if not given.
+    """
+    if count is None:
+        count = sum(qtys)
+    if subtotal is None:
+        subtotal = sum(qty * price for qty, price in zip(qtys, cents))
+    return {"v": WIRE_VERSION, "ids": ids, "qty": qtys, "cents": cents, "count": count, "subtotal": subtotal}
@@ -0,0 +1,43 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+class BasketCookieMiddleware:
+    """
+    Write or delete the basket cookie requested by CookieStorage during the view.
+
+    Runs natively in both modes so ASGI requests reach the async views
+    without a sync_to_async hop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        value = getattr(request, "_basket_cookie", None)
+        if value:
+            response.set_cookie(
+                settings.BASKET_COOKIE_NAME,
+                value,
+                max_age=settings.BASKET_COOKIE_AGE,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        elif value == "" and settings.BASKET_COOKIE_NAME in request.COOKIES:
+            response.delete_cookie(settings.BASKET_COOKIE_NAME, samesite=settings.SESSION_COOKIE_SAMESITE)
+        return response
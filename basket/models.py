@@ -1,3 +1,28 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+from store.models import Product
+
+
+class BasketLine(models.Model):
+    """
+    One product in the persistent basket of an authenticated user.
+
+    Lines are written one row at a time with an upsert on (user, product)
+    and the whole basket is read with one query on that unique index.
+    ``cents`` is the unit price when the product was added.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="basket_lines")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    qty = models.PositiveIntegerField()
+    cents = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ("id",)
+        constraints = [models.UniqueConstraint(fields=["user", "product"], name="basket_line_unique")]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.qty} x {self.product_id}"
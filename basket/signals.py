@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .basket import Basket
+
+
+@receiver(user_logged_in)
+def merge_anonymous_basket(sender, request, user, **kwargs):
+    """
+    Merge the basket built before logging in into the user's stored basket.
+    """
+    if request is None:
+        return
+    anonymous = import_string(settings.BASKET_ANONYMOUS_STORAGE)(request)
+    data = anonymous.load()
+    if not data:
+        return
+    request.__dict__.pop("_basket", None)
+    Basket(request).merge(data)
+    anonymous.clear()
@@ -0,0 +1,211 @@
+"""
+Where a Basket keeps its encoded data between requests.
+
+Authenticated users keep their basket in BasketLine rows, so it outlives
+the session. Anonymous users use the backend named by
+``BASKET_ANONYMOUS_STORAGE``; with ``CookieStorage`` their basket lives in a
+signed, compressed cookie so adding to it never writes a ``django_session``
+row.
+
+Backends implement ``load()``, ``save(data, changed)`` and ``clear()``, where
+``changed`` holds the ids of the products whose line was modified, and the
+async ``aload()`` and ``asave()`` used by the async views. ``save()`` may
+return the ids of changed products whose stock could not be held.
+
+Only DatabaseStorage holds stock: reservations belong to a user, and
+ordering needs one, so an anonymous basket's units are held when it is
+merged into the user's basket at login.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from store import stock
+
+from .encoding import encode
+from .models import BasketLine
+
+# Session key that held the running totals before they moved into the basket.
+_LEGACY_TOTALS_SESSION_ID = "basket_totals"
+
+
+class SessionStorage:
+    """
+    Keeps the basket in the user's session.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        return self.request.session.get(settings.BASKET_SESSION_ID)
+
+    async def aload(self):
+        return await self.request.session.aget(settings.BASKET_SESSION_ID)
+
+    def save(self, data, changed=()):
+        session = self.request.session
+        session[settings.BASKET_SESSION_ID] = data
+        session.pop(_LEGACY_TOTALS_SESSION_ID, None)
+        session.modified = True
+
+    async def asave(self, data, changed=()):
+        session = self.request.session
+        await session.aset(settings.BASKET_SESSION_ID, data)
+        await session.apop(_LEGACY_TOTALS_SESSION_ID, None)
+
+    def clear(self):
+        session = self.request.session
+        for key in (settings.BASKET_SESSION_ID, _LEGACY_TOTALS_SESSION_ID):
+            if key in session:
+                del session[key]
+
+
+class CookieStorage:
+    """
+    Keeps the basket in a signed, compressed cookie.
+
+    The cookie itself is written by BasketCookieMiddleware once the response
+    exists. A basket whose encoding would exceed ``BASKET_COOKIE_MAX_SIZE``
+    is moved to the session instead.
+    """
+
+    salt = "basket.storage.CookieStorage"
+
+    def __init__(self, request):
+        self.request = request
+
+    def _read_cookie(self):
+        value = self.request.COOKIES.get(settings.BASKET_COOKIE_NAME)
+        if value is None or getattr(self.request, "_basket_cookie", None) == "":
+            return None
+        try:
+            return signing.loads(value, salt=self.salt, max_age=settings.BASKET_COOKIE_AGE)
+        except signing.BadSignature:
+            return None
+
+    def _has_session(self):
+        return settings.SESSION_COOKIE_NAME in self.request.COOKIES
+
+    def load(self):
+        data = self._read_cookie()
+        if data is None and self._has_session():
+            data = SessionStorage(self.request).load()
+        return data
+
+    async def aload(self):
+        data = self._read_cookie()
+        if data is None and self._has_session():
+            data = await SessionStorage(self.request).aload()
+        return data
+
+    def save(self, data, changed=()):
+        value = signing.dumps(data, salt=self.salt, compress=True)
+        if len(value) > settings.BASKET_COOKIE_MAX_SIZE:
+            SessionStorage(self.request).save(data)
+            value = ""
+        elif self._has_session():
+            SessionStorage(self.request).clear()
+        self.request._basket_cookie = value
+
+    async def asave(self, data, changed=()):
+        value = signing.dumps(data, salt=self.salt, compress=True)
+        if len(value) > settings.BASKET_COOKIE_MAX_SIZE:
+            await SessionStorage(self.request).asave(data)
+            value = ""
+        elif self._has_session() and await self.request.session.ahas_key(settings.BASKET_SESSION_ID):
+            await self.request.session.apop(settings.BASKET_SESSION_ID)
+        self.request._basket_cookie = value
+
+    def clear(self):
+        if self._has_session():
+            SessionStorage(self.request).clear()
+        self.delete_cookie()
+
+    def delete_cookie(self):
+        self.request._basket_cookie = ""
+
+
+class DatabaseStorage:
+    """
+    Keeps the basket of an authenticated user in BasketLine rows.
+
+    Saving upserts or deletes only the changed lines, in one transaction,
+    holds stock for them (see store.stock) and returns the ids of the
+    products that could not be held in full.
+    Transactions are not available to async code, so ``asave()`` runs the
+    same writes in a worker thread.
+    """
+
+    def __init__(self, request, user=None):
+        self.user = user or request.user
+
+    def _lines(self):
+        return BasketLine.objects.filter(user=self.user).values_list("product_id", "qty", "cents")
+
+    @staticmethod
+    def _encode(lines):
+        ids, qtys, cents = [], [], []
+        for product_id, qty, price in lines:
+            ids.append(product_id)
+            qtys.append(qty)
+            cents.append(price)
+        return encode(ids, qtys, cents) if ids else None
+
+    def load(self):
+        return self._encode(self._lines())
+
+    async def aload(self):
+        return self._encode([line async for line in self._lines()])
+
+    @transaction.atomic
+    def save(self, data, changed=()):
+        positions = {product_id: position for position, product_id in enumerate(data["ids"])}
+        upserts = [
+            BasketLine(
+                user=self.user,
+                product_id=product_id,
+                qty=data["qty"][positions[product_id]],
+                cents=data["cents"][positions[product_id]],
+            )
+            for product_id in changed
+            if product_id in positions
+        ]
+        removed = [product_id for product_id in changed if product_id not in positions]
+        if upserts:
+            BasketLine.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=["user", "product"],
+                update_fields=["qty", "cents", "updated_at"],
+            )
+        if removed:
+            BasketLine.objects.filter(user=self.user, product_id__in=removed).delete()
+        if changed:
+            quantities = {product_id: 0 for product_id in removed}
+            quantities.update((line.product_id, line.qty) for line in upserts)
+            return stock.hold(self.user.pk, quantities)
+        return []
+
+    async def asave(self, data, changed=()):
+        return await sync_to_async(self.save)(data, changed)
+
+    @transaction.atomic
+    def clear(self):
+        BasketLine.objects.filter(user=self.user).delete()
+        stock.release(self.user.pk)
+
+
+def get_storage(request, user=None):
+    """
+    Return the basket storage for this request.
+
+    :param user: The request's user, if already resolved
+    """
+    user = user or getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return DatabaseStorage(request, user)
+    return import_string(settings.BASKET_ANONYMOUS_STORAGE)(request)
@@ -0,0 +1,383 @@
+from django.db import connection
+import importlib
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+
+import basket.urls
+import core.urls
+import store.urls
+from basket.basket import Basket, get_basket
+from basket.middleware import BasketCookieMiddleware
+from basket.models import BasketLine
+from store.models import Category, Product, ProductType
+
+
+class TestLazyBasket(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'django {n}', slug=f'django-{n}',
+                regular_price='20.00', discount_price='20.00',
+            )
+            for n in range(2)
+        ]
+
+    def add(self, product, qty):
+        return self.client.post(
+            reverse('basket:basket_add'), {'productid': product.id, 'productqty': qty, 'action': 'post'}, xhr=True)
+
+    def product_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if 'FROM "store_product"' in q['sql']]
+
+    def test_summary_resolves_products_once(self):
+        """
+        The summary page iterates the basket but queries products only once
+        (besides the "customers also bought" lookup).
+        """
+        self.add(self.products[0], 1)
+        self.add(self.products[1], 2)
+        sql = self.product_queries(reverse('basket:basket_summary'))
+        self.assertEqual(len([q for q in sql if 'store_productrecommendation' not in q]), 1)
+        self.assertEqual(len(sql), 2)
+
+    def test_header_count_needs_no_products(self):
+        """
+        Catalog pages show the basket count without resolving its products.
+        """
+        self.add(self.products[0], 3)
+        sql = self.product_queries(reverse('store:category_list', args=['django']))
+        self.assertFalse([q for q in sql if 'IN (' in q and 'LIMIT' not in q])
+        self.assertContains(self.client.get(reverse('basket:basket_summary')), 'django 0')
+
+    def test_empty_basket_not_stored(self):
+        """
+        Viewing pages does not write an empty basket into the session.
+        """
+        self.client.get(reverse('basket:basket_summary'))
+        self.assertNotIn('basket', self.client.session)
+
+    def test_get_basket_is_request_scoped(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        self.assertIs(get_basket(request), get_basket(request))
+
+
+@override_settings(BASKET_CHECK_TOTALS=True)
+class TestBasketTotals(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'django {n}', slug=f'django-{n}',
+                regular_price=price, discount_price=price,
+            )
+            for n, price in enumerate(['20.00', '9.99'])
+        ]
+        self.request = RequestFactory().get('/')
+        self.request.session = SessionStore()
+
+    def test_running_totals(self):
+        """
+        Totals follow every change and match a full recount.
+        """
+        basket = Basket(self.request)
+        basket.add(self.products[0], 1)
+        basket.add(self.products[1], 3)
+        basket.add(self.products[0], 2)
+        self.assertEqual((len(basket), str(basket.get_subtotal_price())), (5, '69.97'))
+        basket.update(self.products[1].id, 1)
+        basket.delete(self.products[0].id)
+        self.assertEqual((len(basket), str(basket.get_total_price())), (1, '21.49'))
+
+        basket = Basket(self.request)
+        self.assertEqual((basket.count, basket.subtotal), (1, 999))
+        basket.clear()
+        self.assertEqual((len(basket), basket.get_total_price()), (0, 0))
+
+    def test_unchanged_basket_is_not_saved(self):
+        """
+        Updating a missing product or re-adding the same quantity does not touch the session.
+        """
+        Basket(self.request).add(self.products[0], 2)
+        self.request.session.modified = False
+        basket = Basket(self.request)
+        basket.update(self.products[1].id, 5)
+        basket.add(self.products[0], 2)
+        basket.delete(self.products[1].id)
+        self.assertFalse(self.request.session.modified)
+
+    def test_legacy_session_is_migrated(self):
+        """
+        A basket stored in the old per-line dict format is converted on load.
+        """
+        product_id = self.products[0].id
+        self.request.session['basket'] = {str(product_id): {'price': '20.00', 'qty': 2}}
+        self.assertEqual(Basket(self.request).get_subtotal_price(), 40)
+        self.assertEqual(
+            self.request.session['basket'],
+            {'v': 2, 'ids': [product_id], 'qty': [2], 'cents': [2000], 'count': 2, 'subtotal': 4000},
+        )
+
+    def test_iteration_leaves_session_untouched(self):
+        """
+        Lines are yielded as BasketItem tuples without writing into the session.
+        """
+        Basket(self.request).add(self.products[1], 2)
+        stored = dict(self.request.session['basket'])
+        self.request.session.modified = False
+        line, = Basket(self.request)
+        self.assertEqual((line.product, str(line.price), line.qty, str(line.total_price)),
+                         (self.products[1], '9.99', 2, '19.98'))
+        self.assertEqual(self.request.session['basket'], stored)
+        self.assertFalse(self.request.session.modified)
+
+
+@override_settings(BASKET_ANONYMOUS_STORAGE='basket.storage.CookieStorage', BASKET_CHECK_TOTALS=True)
+class TestCookieBasket(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.product = Product.objects.create(
+            product_type=product_type, category=category, title='django', slug='django',
+            regular_price='20.00', discount_price='20.00',
+        )
+
+    def add(self, qty):
+        return self.client.post(
+            reverse('basket:basket_add'), {'productid': self.product.id, 'productqty': qty, 'action': 'post'}, xhr=True)
+
+    def test_anonymous_basket_writes_no_session(self):
+        """
+        Anonymous basket changes are stored in the cookie without touching django_session.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.add(2).json(), {'qty': 2})
+            self.assertEqual(self.add(3).json(), {'qty': 3})
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+        self.assertIn('basket', self.client.cookies)
+        self.assertNotIn('sessionid', self.client.cookies)
+        self.assertContains(self.client.get(reverse('basket:basket_summary')), '60.00')
+
+    def test_tampered_cookie_is_ignored(self):
+        self.add(1)
+        self.client.cookies['basket'] = self.client.cookies['basket'].value + 'x'
+        self.assertEqual(self.add(1).json(), {'qty': 1})
+
+    @override_settings(BASKET_COOKIE_MAX_SIZE=10)
+    def test_oversized_basket_falls_back_to_session(self):
+        self.add(2)
+        self.assertEqual(self.client.session['basket']['count'], 2)
+        self.assertFalse(self.client.cookies.get('basket') and self.client.cookies['basket'].value)
+
+    async def test_middleware_runs_async(self):
+        """
+        Under ASGI the cookie middleware awaits the view instead of being wrapped in sync_to_async.
+        """
+        async def view(request):
+            request._basket_cookie = 'value'
+            return HttpResponse()
+
+        middleware = BasketCookieMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/'))
+        self.assertEqual(response.cookies['basket'].value, 'value')
+
+    def test_login_moves_cookie_basket_to_user(self):
+        """
+        Logging in merges the cookie basket into the user's basket and drops the cookie.
+        """
+        get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.add(2)
+        self.client.post(reverse('account:login'), {'username': 'a@example.com', 'password': 'secret'})
+        self.assertEqual(list(BasketLine.objects.values_list('product_id', 'qty')), [(self.product.id, 2)])
+        self.assertEqual(self.client.cookies['basket'].value, '')
+        self.assertEqual(self.add(4).json(), {'qty': 4})
+
+
+@override_settings(BASKET_CHECK_TOTALS=True)
+class TestDatabaseBasket(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'django {n}', slug=f'django-{n}',
+                regular_price='20.00', discount_price='20.00',
+            )
+            for n in range(2)
+        ]
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+
+    def post(self, name, product, qty=None):
+        data = {'productid': product.id, 'action': 'post'}
+        if qty is not None:
+            data['productqty'] = qty
+        return self.client.post(reverse(name), data, xhr=True).json()
+
+    def lines(self):
+        return list(BasketLine.objects.filter(user=self.user).values_list('product_id', 'qty', 'cents'))
+
+    def test_changes_are_single_row_upserts(self):
+        """
+        Each change writes only its own line and never the session.
+        """
+        self.client.force_login(self.user)
+        self.post('basket:basket_add', self.products[0], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post('basket:basket_add', self.products[1], 2), {'qty': 3})
+        writes = [q['sql'] for q in queries if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+
+        self.assertEqual(self.post('basket:basket_update', self.products[0], 4), {'qty': 6, 'subtotal': '120.00'})
+        self.post('basket:basket_delete', self.products[1])
+        self.assertEqual(self.lines(), [(self.products[0].id, 4, 2000)])
+
+    def test_basket_survives_logout(self):
+        self.client.force_login(self.user)
+        self.post('basket:basket_add', self.products[0], 2)
+        self.client.logout()
+        self.assertNotContains(self.client.get(reverse('basket:basket_summary')), 'django 0')
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('basket:basket_summary')), 'django 0')
+
+    def test_login_merges_session_basket(self):
+        """
+        The anonymous session basket is merged into the stored one on login.
+        """
+        BasketLine.objects.create(user=self.user, product=self.products[0], qty=1, cents=2000)
+        self.post('basket:basket_add', self.products[0], 3)
+        self.post('basket:basket_add', self.products[1], 1)
+        self.client.post(reverse('account:login'), {'username': 'a@example.com', 'password': 'secret'})
+        self.assertEqual(self.lines(), [(self.products[0].id, 3, 2000), (self.products[1].id, 1, 2000)])
+        self.assertNotIn('basket', self.client.session)
+
+
+@override_settings(BASKET_CHECK_TOTALS=True)
+class TestBasketBatch(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'django {n}', slug=f'django-{n}',
+                regular_price='20.00', discount_price='20.00',
+            )
+            for n in range(3)
+        ]
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+
+    def batch(self, *operations):
+        return self.client.post(
+            reverse('basket:basket_batch'), {'operations': list(operations)}, content_type='application/json')
+
+    def test_batch_applies_all_operations(self):
+        """
+        Several operations are applied with one product query, one basket write
+        and one query for the products whose stock is held.
+        """
+        first, second, third = (product.id for product in self.products)
+        self.batch({'op': 'add', 'product': first, 'qty': 1}, {'op': 'add', 'product': third, 'qty': 1})
+        self.client.force_login(self.user)
+        self.batch({'op': 'add', 'product': third, 'qty': 1})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(
+                {'op': 'add', 'product': first, 'qty': 2},
+                {'op': 'add', 'product': second, 'qty': 1},
+                {'op': 'update', 'product': first, 'qty': 3},
+                {'op': 'delete', 'product': third},
+            )
+        self.assertEqual(response.json(), {'qty': 4, 'subtotal': '80.00', 'total': '91.50'})
+        self.assertEqual(len([q for q in queries if 'FROM "store_product"' in q['sql']]), 2)
+        self.assertEqual(len([q for q in queries if 'INTO "basket_basketline"' in q['sql']]), 1)
+        self.assertFalse([q for q in queries if 'UPDATE "store_product"' in q['sql']])
+        self.assertEqual(
+            list(BasketLine.objects.values_list('product_id', 'qty')), [(first, 3), (second, 1)])
+
+    def test_invalid_batch_changes_nothing(self):
+        response = self.batch(
+            {'op': 'add', 'product': self.products[0].id, 'qty': 1},
+            {'op': 'add', 'product': 999, 'qty': 1},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': ['Product 999 does not exist']})
+        self.assertEqual(self.batch({'op': 'add', 'product': 1, 'qty': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('basket:basket_batch')).status_code, 405)
+        self.assertNotIn('basket', self.client.session)
+
+
+def reload_urls():
+    for module in (store.urls, basket.urls, core.urls):
+        importlib.reload(module)
+    clear_url_caches()
+
+
+@override_settings(ASYNC_VIEWS=True, BASKET_CHECK_TOTALS=True)
+class TestAsyncBasketViews(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reload_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        reload_urls()
+
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'django {n}', slug=f'django-{n}',
+                regular_price='20.00', discount_price='20.00',
+            )
+            for n in range(2)
+        ]
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+
+    async def add(self, product, qty):
+        response = await self.async_client.post(
+            reverse('basket:basket_add'), {'productid': product.id, 'productqty': qty, 'action': 'post'})
+        return response.json()
+
+    async def test_anonymous_basket(self):
+        """
+        The async endpoints keep an anonymous basket in the session.
+        """
+        self.assertEqual(await self.add(self.products[0], 2), {'qty': 2})
+        self.assertEqual(await self.add(self.products[1], 1), {'qty': 3})
+        response = await self.async_client.post(
+            reverse('basket:basket_update'), {'productid': self.products[0].id, 'productqty': 1, 'action': 'post'})
+        self.assertEqual(response.json(), {'qty': 2, 'subtotal': '40.00'})
+        response = await self.async_client.get(reverse('basket:basket_summary'))
+        self.assertContains(response, 'django 1')
+        self.assertEqual((await self.async_client.session.aget('basket'))['count'], 2)
+
+    async def test_authenticated_basket(self):
+        """
+        The async endpoints write an authenticated user's basket lines.
+        """
+        await self.async_client.aforce_login(self.user)
+        await self.add(self.products[0], 2)
+        response = await self.async_client.post(
+            reverse('basket:basket_batch'),
+            {'operations': [{'op': 'add', 'product': self.products[1].id, 'qty': 1},
+                            {'op': 'delete', 'product': self.products[0].id}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'qty': 1, 'subtotal': '20.00', 'total': '31.50'})
+        lines = [line async for line in BasketLine.objects.values_list('product_id', 'qty')]
+        self.assertEqual(lines, [(self.products[1].id, 1)])
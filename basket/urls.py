@@ -1,11 +1,22 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
 app_name = 'basket'
-urlpatterns = [
-    path('', views.basket_summary, name="basket_summary"),
-    path('add/', views.basket_add, name='basket_add'),
-    path('delete/', views.basket_delete, name='basket_delete'),
-    path('update/', views.basket_update, name='basket_update'),
-]
+if settings.ASYNC_VIEWS:
+    urlpatterns = [
+        path('', views.abasket_summary, name="basket_summary"),
+        path('add/', views.abasket_add, name='basket_add'),
+        path('delete/', views.abasket_delete, name='basket_delete'),
+        path('update/', views.abasket_update, name='basket_update'),
+        path('batch/', views.abasket_batch, name='basket_batch'),
+    ]
+else:
+    urlpatterns = [
+        path('', views.basket_summary, name="basket_summary"),
+        path('add/', views.basket_add, name='basket_add'),
+        path('delete/', views.basket_delete, name='basket_delete'),
+        path('update/', views.basket_update, name='basket_update'),
+        path('batch/', views.basket_batch, name='basket_batch'),
+    ]
@@ -1,18 +1,35 @@
-from django.http import JsonResponse
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import require_POST
 
+from core.shortcuts import arender
 from store.models import Product
+from store.recommendations import also_bought
 
-from .basket import Basket
+from .basket import aget_basket, get_basket
 
 
 def basket_summary(request):
-    basket = Basket(request)
-    return render(request, 'basket/summary.html', {'basket': basket})
+    basket = get_basket(request)
+    recommended = also_bought(basket.ids, settings.STORE_RECOMMENDATIONS) if basket.ids else []
+    return render(request, 'basket/summary.html', {'basket': basket, 'also_bought': recommended})
+
+
+async def abasket_summary(request):
+    basket = await aget_basket(request)
+    await basket.aget_products()
+    recommended = []
+    if basket.ids:
+        recommended = [product async for product in also_bought(basket.ids, settings.STORE_RECOMMENDATIONS)]
+    return await arender(request, 'basket/summary.html', {'basket': basket, 'also_bought': recommended})
 
 
 def basket_add(request):
-    basket = Basket(request)
+    basket = get_basket(request)
     if request.POST.get('action') == 'post':
         product_id = int(request.POST.get('productid'))
         product_qty = int(request.POST.get('productqty'))
@@ -20,12 +37,27 @@ def basket_add(request):
         basket.add(product=product, qty=product_qty)
 
         basketqty = basket.__len__()
-        response = JsonResponse({'qty': basketqty})
+        response = _basket_response(basket, {'qty': basketqty})
         return response
 
 
+async def abasket_add(request):
+    basket = await aget_basket(request)
+    if request.POST.get('action') == 'post':
+        product_id = int(request.POST.get('productid'))
+        product_qty = int(request.POST.get('productqty'))
+        try:
+            product = await Product.objects.aget(id=product_id)
+        except Product.DoesNotExist:
+            raise Http404('No Product matches the given query.')
+        async with basket.abatch():
+            basket.add(product=product, qty=product_qty)
+
+        return _basket_response(basket, {'qty': len(basket)})
+
+
 def basket_delete(request):
-    basket = Basket(request)
+    basket = get_basket(request)
     if request.POST.get('action') == 'post':
         product_id = int(request.POST.get('productid'))
         basket.delete(product=product_id)
@@ -36,8 +68,18 @@ def basket_delete(request):
         return response
 
 
+async def abasket_delete(request):
+    basket = await aget_basket(request)
+    if request.POST.get('action') == 'post':
+        product_id = int(request.POST.get('productid'))
+        async with basket.abatch():
+            basket.delete(product=product_id)
+
+        return JsonResponse({'qty': len(basket), 'subtotal': basket.get_total_price()})
+
+
 def basket_update(request):
-    basket = Basket(request)
+    basket = get_basket(request)
     if request.POST.get('action') == 'post':
         product_id = int(request.POST.get('productid'))
         product_qty = int(request.POST.get('productqty'))
@@ -45,6 +87,123 @@ def basket_update(request):
 
         basketqty = basket.__len__()
         basketsubtotal = basket.get_subtotal_price()
-        response = JsonResponse({'qty': basketqty, 'subtotal': basketsubtotal})
+        response = _basket_response(basket, {'qty': basketqty, 'subtotal': basketsubtotal})
         return response
 
+
+async def abasket_update(request):
+    basket = await aget_basket(request)
+    if request.POST.get('action') == 'post':
+        product_id = int(request.POST.get('productid'))
+        product_qty = int(request.POST.get('productqty'))
+        async with basket.abatch():
+            basket.update(product=product_id, qty=product_qty)
+
+        return _basket_response(basket, {'qty': len(basket), 'subtotal': basket.get_subtotal_price()})
+
+
+BATCH_OPERATIONS = {'add', 'update', 'delete'}
+MAX_BATCH_SIZE = 100
+
+
+def _parse_operations(body):
+    """
+    Validate a batch request body.
+
+    :return: Tuple of the operations as (op, product_id, qty) and a list of errors
+    """
+    try:
+        operations = json.loads(body)['operations']
+    except (ValueError, KeyError, TypeError):
+        return [], ['Expected a JSON object with an "operations" list']
+    if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH_SIZE:
+        return [], [f'"operations" must be a list of 1 to {MAX_BATCH_SIZE} items']
+
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            errors.append(f'Operation {index} is not an object')
+            continue
+        op, product_id, qty = operation.get('op'), operation.get('product'), operation.get('qty')
+        if op not in BATCH_OPERATIONS:
+            errors.append(f'Operation {index} has an unknown op')
+        elif type(product_id) is not int:
+            errors.append(f'Operation {index} needs an integer product')
+        elif op != 'delete' and (type(qty) is not int or qty < 1):
+            errors.append(f'Operation {index} needs a positive integer qty')
+        else:
+            parsed.append((op, product_id, qty))
+    return parsed, errors
+
+
+@require_POST
+def basket_batch(request):
+    """
+    Apply a list of basket operations in one request.
+
+    The body is JSON such as ``{"operations": [{"op": "add", "product": 1, "qty": 2},
+    {"op": "delete", "product": 3}]}``. Every product is validated up front;
+    if anything is invalid, nothing is applied.
+    """
+    operations, errors = _parse_operations(request.body)
+    if not errors:
+        products = Product.objects.in_bulk({product_id for op, product_id, qty in operations})
+        errors = _missing_products(operations, products)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    basket = get_basket(request)
+    with transaction.atomic(), basket.batch():
+        _apply_operations(basket, operations, products)
+    return _totals_response(basket)
+
+
+@require_POST
+async def abasket_batch(request):
+    operations, errors = _parse_operations(request.body)
+    if not errors:
+        products = await Product.objects.ain_bulk({product_id for op, product_id, qty in operations})
+        errors = _missing_products(operations, products)
+    if errors:
+        return JsonResponse({'errors': errors}, status=400)
+
+    basket = await aget_basket(request)
+    async with basket.abatch():
+        _apply_operations(basket, operations, products)
+    return _totals_response(basket)
+
+
+def _missing_products(operations, products):
+    return [
+        f'Product {product_id} does not exist'
+        for product_id in dict.fromkeys(product_id for op, product_id, qty in operations)
+        if product_id not in products
+    ]
+
+
+def _apply_operations(basket, operations, products):
+    for op, product_id, qty in operations:
+        if op == 'add':
+            basket.add(product=products[product_id], qty=qty)
+        elif op == 'update':
+            basket.update(product=product_id, qty=qty)
+        else:
+            basket.delete(product=product_id)
+
+
+def _totals_response(basket):
+    return _basket_response(basket, {
+        'qty': len(basket),
+        'subtotal': basket.get_subtotal_price(),
+        'total': basket.get_total_price(),
+    })
+
+
+def _basket_response(basket, data):
+    """
+    Respond with the basket data, listing under ``unavailable`` the products
+    whose quantity could not be held in stock.
+    """
+    if basket.unavailable:
+        data['unavailable'] = sorted(basket.unavailable)
+    return JsonResponse(data)
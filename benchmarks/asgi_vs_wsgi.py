@@ -0,0 +1,156 @@
+"""
+Compare concurrent request throughput of the ASGI and WSGI deployments.
+
+Starts the project under uvicorn (``core.asgi``, async views enabled) and
+under gunicorn (``core.wsgi``, sync views), fires the same GET requests at
+each with a fixed number of concurrent connections and prints throughput
+and latency percentiles.
+
+Run from the project root, against a database that has some products:
+
+    python benchmarks/asgi_vs_wsgi.py --path / --path /shop/books/ --concurrency 64
+
+Both servers get the same number of worker processes. gunicorn uses the
+threaded worker with ``--threads`` threads per process, which is the usual
+way to serve concurrent requests from sync Django.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def server_commands(args, port):
+    return {
+        "uvicorn": (
+            [
+                sys.executable, "-m", "uvicorn", "core.asgi:application",
+                "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+            ],
+            {"DJANGO_ASYNC_VIEWS": "1"},
+        ),
+        "gunicorn": (
+            [
+                sys.executable, "-m", "gunicorn", "core.wsgi:application",
+                "--bind", f"127.0.0.1:{port}",
+                "--workers", str(args.workers), "--threads", str(args.threads),
+                "--worker-class", "gthread", "--log-level", "warning",
+            ],
+            {"DJANGO_ASYNC_VIEWS": "0"},
+        ),
+    }
+
+
+async def fetch(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1])
+
+
+async def wait_until_ready(host, port, path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await fetch(host, port, path)
+            return
+        except (OSError, IndexError, ValueError):
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+async def run_load(host, port, paths, total, concurrency):
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for number in counter:
+            started = time.perf_counter()
+            try:
+                status = await fetch(host, port, paths[number % len(paths)])
+            except OSError:
+                status = 0
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, fraction):
+    return statistics.quantiles(values, n=100)[int(fraction * 100) - 1] if len(values) > 1 else values[0]
+
+
+def benchmark(name, command, extra_env, args, port):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=args.settings, **extra_env)
+    process = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        asyncio.run(wait_until_ready("127.0.0.1", port, args.paths[0]))
+        asyncio.run(run_load("127.0.0.1", port, args.paths, args.warmup, args.concurrency))
+        elapsed, latencies, errors = asyncio.run(
+            run_load("127.0.0.1", port, args.paths, args.requests, args.concurrency)
+        )
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {
+        "server": name,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", default="core.settings.dev-debug", help="DJANGO_SETTINGS_MODULE for both servers")
+    parser.add_argument("--path", dest="paths", action="append", help="Path to request (repeatable, default /)")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per server")
+    parser.add_argument("--warmup", type=int, default=200, help="Unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent connections")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes per server")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker")
+    parser.add_argument("--port", type=int, default=8701, help="First port to listen on")
+    parser.add_argument("--only", choices=["uvicorn", "gunicorn"], help="Benchmark a single server")
+    args = parser.parse_args()
+    args.paths = [urlsplit(path).path or "/" for path in (args.paths or ["/"])]
+
+    results = []
+    for offset, name in enumerate(["uvicorn", "gunicorn"]):
+        if args.only and name != args.only:
+            continue
+        if subprocess.call([sys.executable, "-c", f"import {name}"], stderr=subprocess.DEVNULL) != 0:
+            sys.exit(f"{name} is not installed (pip install -r requirements.txt)")
+        port = args.port + offset
+        command, extra_env = server_commands(args, port)[name]
+        results.append(benchmark(name, command, extra_env, args, port))
+
+    print(f"{args.requests} requests, {args.concurrency} connections, paths: {' '.join(args.paths)}")
+    print(f"{'server':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for row in results:
+        print(
+            f"{row['server']:<10} {row['rps']:>9.1f} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+            f"{row['p99']:>8.1f} {row['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Hammer one short-lived cache key from many threads and count recomputations.
+
+Every thread reads the key through ``core.cache.get_or_compute`` in a loop
+for ``--duration`` seconds. The value takes ``--cost`` seconds to compute
+and expires after ``--ttl`` seconds, so it expires many times during the
+run. Prints lookup throughput and latency, the hit ratio and how often the
+value was recomputed: with single flight and early expiry that stays close
+to one recomputation per TTL, while ``--naive`` (a plain get, compute and
+set) recomputes once per thread that misses.
+
+Run from the project root, against the file backend in a temporary
+directory by default, or against Redis or a Redis-compatible server:
+
+    python benchmarks/cache_stampede.py --threads 32 --duration 10
+    DJANGO_REDIS_URL=redis://127.0.0.1:6379/15 python benchmarks/cache_stampede.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.dev-debug")
+    if not os.environ.get("DJANGO_REDIS_URL"):
+        os.environ.setdefault("DJANGO_CACHE_DIR", tempfile.mkdtemp())
+    import django
+
+    django.setup()
+
+
+def naive_get_or_compute(namespace, *parts, compute, timeout):
+    from django.core.cache import cache
+
+    from core.cache import stats, versioned_key
+
+    key = versioned_key(namespace, *parts)
+    value = cache.get(key)
+    if value is not None:
+        stats.record(namespace, "hits")
+        return value
+    stats.record(namespace, "misses")
+    value = compute()
+    cache.set(key, value, timeout)
+    stats.record(namespace, "computes")
+    return value
+
+
+def lookup_loop(fetch, compute, args, deadline, latencies):
+    from django.core.cache import caches
+
+    timings = []
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            fetch("benchmark", "hot", compute=compute, timeout=args.ttl)
+            timings.append(time.perf_counter() - started)
+    finally:
+        caches["default"].close()
+    latencies.extend(timings)
+
+
+def run(args):
+    from django.core.cache import caches
+
+    from core.cache import bump_generation, cache_stats, get_or_compute, stats
+
+    def compute():
+        time.sleep(args.cost)
+        return "x" * args.size
+
+    fetch = naive_get_or_compute if args.naive else get_or_compute
+    bump_generation("benchmark")
+    stats.reset()
+    latencies = []
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=lookup_loop, args=(fetch, compute, args, deadline, latencies))
+        for _ in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    counts = cache_stats()["benchmark"]
+    expiries = max(1, int(args.duration / args.ttl))
+    print(f"backend:    {type(caches['default']).__name__}")
+    print(f"mode:       {'naive' if args.naive else 'single flight + early expiry'}")
+    print(f"threads:    {args.threads}")
+    print(f"lookups:    {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s)")
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(sorted(latencies), n=100)
+        print(f"latency:    p50={cuts[49] * 1000:.2f}ms p99={cuts[98] * 1000:.2f}ms")
+    print(f"hits:       {counts['hits']} ({counts['ratio']:.1%}), misses: {counts['misses']}, waits: {counts['waits']}")
+    print(f"computes:   {counts['computes']} ({counts['early']} early) for ~{expiries} expiries")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent readers")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to run")
+    parser.add_argument("--ttl", type=float, default=1.0, help="Seconds the value is cached for")
+    parser.add_argument("--cost", type=float, default=0.1, help="Seconds one computation takes")
+    parser.add_argument("--size", type=int, default=10_000, help="Bytes of the cached value")
+    parser.add_argument("--naive", action="store_true", help="Use a plain get, compute and set")
+    args = parser.parse_args()
+
+    setup_django()
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
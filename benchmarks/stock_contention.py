@@ -0,0 +1,152 @@
+"""
+Hammer one product with concurrent checkouts and check that it never oversells.
+
+Creates a throwaway test database, a product with ``--stock`` units and
+``--threads`` users, then has every thread place single-line orders for
+that product through ``orders.checkout.place_order`` as fast as it can
+until the stock runs out. Prints checkout throughput and latency, how
+many attempts had to be retried because the database was busy, and the
+oversell count, which must be 0.
+
+Run from the project root:
+
+    python benchmarks/stock_contention.py --threads 32 --stock 2000 --qty 1
+
+On SQLite, writers serialise on the database lock, so this mostly measures
+lock hand-off; point ``DJANGO_SETTINGS_MODULE`` at a PostgreSQL settings
+module to measure row-level contention.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings.dev-debug")
+    import django
+    from django.conf import settings
+
+    database = settings.DATABASES["default"]
+    if database["ENGINE"].endswith("sqlite3"):
+        # A file, not the in-memory test database, so every thread shares it.
+        database["TEST"] = {"NAME": os.path.join(tempfile.mkdtemp(), "stock_contention.sqlite3")}
+        database.setdefault("OPTIONS", {})["timeout"] = 30
+    django.setup()
+
+
+def create_fixtures(stock, threads):
+    from django.contrib.auth import get_user_model
+
+    from store.models import Category, Product, ProductType
+
+    product = Product.objects.create(
+        product_type=ProductType.objects.create(name="benchmark"),
+        category=Category.objects.create(name="benchmark", slug="benchmark"),
+        title="Hot SKU",
+        slug="hot-sku",
+        regular_price="9.99",
+        discount_price="9.99",
+        stock=stock,
+    )
+    User = get_user_model()
+    users = [User.objects.create_user(f"buyer{n}@example.com", f"buyer{n}", "secret") for n in range(threads)]
+    return product, users
+
+
+def checkout_loop(worker, user, product, qty, results):
+    from django.db import OperationalError, close_old_connections
+
+    from orders.checkout import place_order
+    from store.stock import OutOfStock
+
+    placed = refused = retries = 0
+    latencies = []
+    attempt = 0
+    try:
+        while True:
+            attempt += 1
+            started = time.perf_counter()
+            try:
+                place_order(user.id, f"{worker}-{attempt}", [(product.id, qty)])
+            except OutOfStock:
+                refused += 1
+                break
+            except OperationalError:
+                retries += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            placed += 1
+    finally:
+        close_old_connections()
+    results[worker] = (placed, refused, retries, latencies)
+
+
+def run(args):
+    from django.db import connection
+
+    from orders.models import OrderItem
+    from store.models import Product
+
+    product, users = create_fixtures(args.stock, args.threads)
+    results = {}
+    threads = [
+        threading.Thread(target=checkout_loop, args=(worker, user, product, args.qty, results))
+        for worker, user in enumerate(users)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    placed = sum(result[0] for result in results.values())
+    retries = sum(result[2] for result in results.values())
+    latencies = sorted(latency for result in results.values() for latency in result[3])
+    sold = sum(OrderItem.objects.filter(product=product).values_list("quantity", flat=True))
+    remaining = Product.objects.values_list("stock", flat=True).get(pk=product.pk)
+    oversold = max(0, sold - args.stock)
+
+    print(f"database:   {connection.vendor}")
+    print(f"threads:    {args.threads}")
+    print(f"checkouts:  {placed} in {elapsed:.2f}s ({placed / elapsed:.0f}/s)")
+    if len(latencies) > 1:
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"latency:    p50={cuts[49] * 1000:.1f}ms p99={cuts[98] * 1000:.1f}ms")
+    print(f"busy retries: {retries}")
+    print(f"units sold: {sold} of {args.stock}, {remaining} left")
+    print(f"oversold:   {oversold}")
+    return 0 if oversold == 0 and sold + remaining == args.stock else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent buyers")
+    parser.add_argument("--stock", type=int, default=1000, help="Units of the hot product")
+    parser.add_argument("--qty", type=int, default=1, help="Units per order")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        return run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Shared caching helpers.
+
+Cached data is stored under keys that embed the current generation of its
+namespace. Invalidating a namespace is a single increment of the counter,
+after which every process builds keys for the new generation and the stale
+entries simply age out of the cache. Model signals bump the generations
+(see the ``signals`` modules of the apps).
+
+get_or_compute() reads such a key and, on a miss, recomputes the value
+under a lock so that only one process at a time rebuilds it while the
+others wait for its result (single flight). Values are also refreshed a
+little before they expire, with a probability that rises as expiry nears
+and with the cost of the computation ("XFetch"), so a hot key is usually
+rebuilt by one early caller instead of by a crowd at the moment it expires.
+
+Hits, misses and recomputations are counted per process; see cache_stats().
+"""
+
+import fcntl
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import transaction
+
+# Weight of the early refresh: above 1 refreshes earlier, 0 disables it.
+XFETCH_BETA = 1.0
+# Seconds a recomputation may hold its lock before others may take over
+# (file backend locks are held until their holder exits instead).
+LOCK_TIMEOUT = 30
+# Seconds a caller waits for another process's recomputation before doing its own.
+LOCK_WAIT = 5
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _generation_key(namespace):
+    return f"generation:{namespace}"
+
+
+def get_generation(namespace):
+    """
+    Return the current generation of a cache namespace.
+
+    A missing counter (first use, or evicted) is seeded from the clock so
+    it can never go back to a generation that was already handed out.
+    """
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        generation = _seed_generation(key)
+    if generation is None:
+        # The backend does not store anything (DummyCache): never reuse.
+        return time.time_ns()
+    return generation
+
+
+def bump_generation(namespace):
+    """
+    Invalidate everything cached under a namespace.
+    """
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return _seed_generation(key) or time.time_ns()
+
+
+def _seed_generation(key):
+    """
+    Seed a missing generation counter from the clock and return it.
+
+    The file backend's ``add()`` is not atomic, so callers seeding the same
+    counter at once take turns under cache_lock() rather than each reading
+    back a different value.
+    """
+    deadline = time.monotonic() + LOCK_WAIT
+    while True:
+        with cache_lock(key) as acquired:
+            if acquired or time.monotonic() >= deadline:
+                cache.add(key, time.time_ns(), timeout=None)
+                return cache.get(key)
+        time.sleep(LOCK_POLL_INTERVAL)
+
+
+def bump_generation_on_commit(namespace):
+    """
+    Invalidate a namespace now and again once the current transaction commits.
+
+    The immediate bump keeps the writing process consistent with its own
+    uncommitted changes; the second one stops another process that rebuilt
+    from the pre-commit rows in the meantime from keeping that copy.
+    """
+    bump_generation(namespace)
+    transaction.on_commit(lambda: bump_generation(namespace))
+
+
+def versioned_key(namespace, *parts, generation=None):
+    """
+    Build a cache key bound to the current generation of a namespace.
+
+    :param generation: Generation to use, if the caller has already read it
+    """
+    if generation is None:
+        generation = get_generation(namespace)
+    return ":".join(str(part) for part in (namespace, generation, *parts))
+
+
+class CacheStats:
+    """
+    Thread-safe per-process counters of get_or_compute() outcomes by name.
+
+    ``hits`` were served from the cache, ``misses`` found nothing there,
+    ``early`` refreshed a value ahead of expiry, ``waits`` got their value
+    from another caller's recomputation and ``computes`` ran the function.
+    """
+
+    FIELDS = ("hits", "misses", "early", "waits", "computes")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(Counter)
+
+    def record(self, name, outcome):
+        with self._lock:
+            self._counts[name][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {name: {field: counts[field] for field in self.FIELDS} for name, counts in self._counts.items()}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def cache_stats():
+    """
+    Return the counters of this process as ``{name: {"hits": ..., ...}}``,
+    with the hit ratio of each name under ``"ratio"``.
+    """
+    snapshot = stats.snapshot()
+    for counts in snapshot.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["ratio"] = counts["hits"] / lookups if lookups else 0.0
+    return snapshot
+
+
+@contextmanager
+def cache_lock(key, timeout=LOCK_TIMEOUT):
+    """
+    Try to take a short-lived lock shared by every process using the cache.
+
+    Yields True if this caller holds the lock. The lock is ``cache.add()``
+    of a token, which is atomic on the memory, Memcached and Redis backends,
+    and is only deleted while it still holds that token. The file backend's
+    ``add()`` is not atomic, so there it is an flock() on a file next to the
+    cache entries instead, which the system releases if its holder dies.
+
+    Releasing a cache lock is a ``get()`` then a ``delete()``, which the
+    cache API cannot make atomic: if a holder overran ``timeout`` and another
+    caller took the lock in between, that caller's lock is dropped. At worst
+    this lets one more recomputation run concurrently, so holders should
+    finish well within ``timeout``.
+    """
+    if isinstance(caches[DEFAULT_CACHE_ALIAS], FileBasedCache):
+        location = settings.CACHES[DEFAULT_CACHE_ALIAS]["LOCATION"]
+        with _file_lock(os.path.join(location, "locks", hashlib.md5(key.encode()).hexdigest())) as acquired:
+            yield acquired
+        return
+
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    acquired = cache.add(lock_key, token, timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+@contextmanager
+def _file_lock(path):
+    descriptor = _lock_file(path)
+    try:
+        yield descriptor is not None
+    finally:
+        if descriptor is not None:
+            if _is_file(path, descriptor):
+                _remove(path)
+            os.close(descriptor)
+
+
+def _lock_file(path):
+    """
+    Open and flock() ``path``, returning the descriptor, or None if another
+    process holds it.
+    """
+    for attempt in range(3):
+        try:
+            descriptor = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            continue
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(descriptor)
+            return None
+        if _is_file(path, descriptor):
+            return descriptor
+        # The previous holder removed the file between our open and flock().
+        os.close(descriptor)
+    return None
+
+
+def _is_file(path, descriptor):
+    try:
+        return os.stat(path).st_ino == os.fstat(descriptor).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _expires_early(delta, expires_at, beta):
+    """
+    Decide whether to refresh a value now: true with a probability that
+    grows as ``expires_at`` approaches and with ``delta``, the seconds its
+    computation took.
+    """
+    if expires_at is None or not beta:
+        return False
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _compute_and_store(key, compute, timeout, name):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    expires_at = None if timeout is None else time.time() + timeout
+    cache.set(key, (value, delta, expires_at), timeout)
+    stats.record(name, "computes")
+    return value
+
+
+def get_or_compute(namespace, *parts, compute, timeout, generation=None, name=None, beta=XFETCH_BETA):
+    """
+    Return the value cached under a versioned key, computing it on a miss.
+
+    Only one caller at a time recomputes a key; the others wait up to
+    LOCK_WAIT seconds for its result, or keep serving the current value if
+    it is only being refreshed early.
+
+    :param namespace: Namespace whose generation the key is bound to
+    :param parts: Further key parts
+    :param compute: Function returning the value
+    :param timeout: Seconds to cache the value, or None for no expiry
+    :param generation: Generation of the namespace, if already read
+    :param name: Label of the stats counters (default: the namespace)
+    :param beta: XFetch weight; 0 disables refreshing early
+    """
+    key = versioned_key(namespace, *parts, generation=generation)
+    name = name or namespace
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not _expires_early(delta, expires_at, beta):
+            stats.record(name, "hits")
+            return value
+        with cache_lock(key) as acquired:
+            if not acquired:
+                stats.record(name, "hits")
+                return value
+            stats.record(name, "early")
+            return _compute_and_store(key, compute, timeout, name)
+
+    stats.record(name, "misses")
+    with cache_lock(key) as acquired:
+        if acquired:
+            entry = cache.get(key)
+            if entry is not None:
+                # Stored by the previous lock holder since our read.
+                stats.record(name, "waits")
+                return entry[0]
+            return _compute_and_store(key, compute, timeout, name)
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            stats.record(name, "waits")
+            return entry[0]
+    return _compute_and_store(key, compute, timeout, name)
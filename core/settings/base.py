@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "account",
     "orders",
     "payments",
+    "analytics",
     "mptt",
 ]
 
@@ -52,6 +53,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "basket.middleware.BasketCookieMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -90,6 +92,29 @@ DATABASES = {
 }
 
 
+# Cache shared by every process (see core/cache.py). Set DJANGO_REDIS_URL,
+# e.g. "redis://127.0.0.1:6379/0", to use Redis or a Redis-compatible server
+# (requires redis-py); otherwise entries are files under DJANGO_CACHE_DIR.
+if os.environ.get("DJANGO_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["DJANGO_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("DJANGO_CACHE_DIR", BASE_DIR / "var" / "cache"),
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Test runs use a local memory cache instead (see core/test_runner.py)
+TEST_RUNNER = "core.test_runner.TestRunner"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -135,9 +160,54 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
+# Number of products per catalog page
+STORE_PAGE_SIZE = 20
+
+# Products shown in the home page "Popular" row, and the half-life in days
+# of an order's weight in their popularity scores
+STORE_POPULAR_COUNT = 5
+STORE_POPULARITY_HALF_LIFE_DAYS = 7
+
+# Seconds the stock for an authenticated user's basket stays held after it changes
+STORE_STOCK_RESERVATION_SECONDS = 60 * 15
+
+# Seconds an order may stay unpaid before its units are returned to stock
+STORE_UNPAID_ORDER_SECONDS = 60 * 60 * 2
+
+# "Customers also bought" products shown, and neighbours kept per product
+STORE_RECOMMENDATIONS = 5
+STORE_RECOMMENDATION_NEIGHBOURS = 20
+
+# Seconds product pages are cached for anonymous visitors (0 disables)
+STORE_PRODUCT_PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Resized copies generated for every product image, and the number of
+# background threads generating them after an upload
+STORE_IMAGE_WIDTHS = (100, 200, 400, 800)
+STORE_IMAGE_FORMATS = ("webp", "jpeg")
+STORE_IMAGE_WORKERS = 2
+
+# Serve the catalog and basket pages with async views (for ASGI deployments)
+ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "") == "1"
+
 # Basket session ID
 BASKET_SESSION_ID = 'basket'
 
+# Where anonymous baskets are kept; "basket.storage.CookieStorage" keeps them
+# in a signed cookie so anonymous shoppers cause no session writes
+BASKET_ANONYMOUS_STORAGE = 'basket.storage.SessionStorage'
+
+# Basket cookie used by CookieStorage; larger baskets fall back to the session
+BASKET_COOKIE_NAME = 'basket'
+BASKET_COOKIE_AGE = 60 * 60 * 24 * 14
+BASKET_COOKIE_MAX_SIZE = 3072
+
+# Recompute basket totals from the lines on every change and fail on drift
+BASKET_CHECK_TOTALS = False
+
+# Number of orders per page of the account dashboard
+ORDER_HISTORY_PAGE_SIZE = 10
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
@@ -0,0 +1,29 @@
+"""
+Helpers for async views.
+
+Templates read the user, the category tree and the basket through context
+processors, which are synchronous. Loading those up front with async calls
+lets an async view render without any blocking database access.
+"""
+
+from django.shortcuts import render
+
+from basket.basket import aget_basket
+from store.category_tree import aget_category_tree
+
+
+async def aprepare(request):
+    """
+    Resolve the user, category tree and basket of this request asynchronously.
+    """
+    request.user = await request.auser()
+    await aget_category_tree()
+    return await aget_basket(request)
+
+
+async def arender(request, template_name, context=None, **kwargs):
+    """
+    Async counterpart of django.shortcuts.render().
+    """
+    await aprepare(request)
+    return render(request, template_name, context, **kwargs)
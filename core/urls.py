@@ -28,6 +28,7 @@ urlpatterns = [
     path('payment/', include('payments.urls', namespace='payments')),
     path('account/', include('account.urls', namespace='account')),
     path('orders/', include('orders.urls', namespace='orders')),
+    path('analytics/', include('analytics.urls', namespace='analytics')),
     path("__debug__/", include(debug_toolbar.urls)),
     
 ]
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from django.db import transaction
+
+from basket.basket import SHIPPING_CENTS
+from basket.encoding import from_cents
+from store import stock
+from store.models import Product
+
+from . import outbox
+from .models import Order, OrderItem
+
+
+class OrderKeyInUse(Exception):
+    """
+    Raised when an order key was already used by another user.
+    """
+
+
+def place_order(user_id, order_key, lines, **details):
+    """
+    Create an order and its items in one transaction, or return the existing
+    order with the same order key.
+
+    Prices are read from the product rows in a single query and all items
+    are inserted with one bulk_create, so the number of queries does not grow
+    with the size of the basket. The confirmation email is left to the
+    outbox worker. The unique constraint on ``order_key`` makes
+    a repeated or concurrent submit return the first order instead of
+    creating a second one.
+
+    Stock is taken in the same transaction (see store.stock.take), so an
+    order that cannot be fulfilled is not created at all. If the order is
+    never paid, store.stock.restock_unpaid() returns the units later.
+
+    Args:
+        user_id (int): The user placing the order.
+        order_key (str): Client-generated key identifying this checkout.
+        lines (Iterable[tuple[int, int]]): (product id, quantity) pairs.
+        **details: Other Order fields, such as the address.
+
+    Returns:
+        tuple[Order, bool]: The order and whether it was created now.
+
+    Raises:
+        OutOfStock: If a product has fewer free units than ordered.
+        OrderKeyInUse: If another user's order has this order key.
+    """
+    lines = [(product_id, qty) for product_id, qty in lines if qty > 0]
+    products = Product.objects.filter(id__in=[product_id for product_id, qty in lines])
+    prices = dict(products.values_list("id", "regular_price"))
+    lines = [(product_id, qty) for product_id, qty in lines if product_id in prices]
+
+    subtotal = sum((prices[product_id] * qty for product_id, qty in lines), Decimal("0.00"))
+    shipping = from_cents(SHIPPING_CENTS) if subtotal else Decimal("0.00")
+
+    with transaction.atomic():
+        order, created = Order.objects.get_or_create(
+            order_key=order_key,
+            defaults={"user_id": user_id, "total_paid": subtotal + shipping, **details},
+        )
+        if order.user_id != user_id:
+            raise OrderKeyInUse(order_key)
+        if created:
+            stock.take(user_id, lines)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product_id=product_id, price=prices[product_id], quantity=qty)
+                for product_id, qty in lines
+            )
+            outbox.enqueue('order.placed', order_id=order.pk)
+    return order, created
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .models import Order
+from .outbox import register
+
+
+@register('order.placed')
+def send_order_confirmation(order_id):
+    """
+    Email the customer that their order was received.
+
+    Args:
+        order_id (int): The placed order.
+    """
+    order = Order.objects.select_related('user').get(pk=order_id)
+    send_mail(
+        f'Order {order.order_key} received',
+        f'Thank you for your order. Total: {order.total_paid}',
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+    )
+
+
+@register('order.paid')
+def send_payment_receipt(order_id):
+    """
+    Email the customer a receipt once payment is confirmed.
+
+    Args:
+        order_id (int): The paid order.
+    """
+    order = Order.objects.select_related('user').get(pk=order_id)
+    send_mail(
+        f'Payment received for order {order.order_key}',
+        f'We have received your payment of {order.total_paid}.',
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+    )
@@ -0,0 +1,88 @@
+"""
+Order history for the account dashboard.
+
+The dashboard lists a user's paid orders a page at a time, newest first,
+with keyset pagination over ``(created, id)`` so deep pages cost the same
+as the first one. The items and products of a page are fetched with two
+prefetch queries whatever the number of orders on it.
+
+The per-user summary (order count and lifetime spend) is cached under a
+per-user generation that is bumped whenever one of the user's orders changes.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Prefetch, Sum
+
+from core.cache import bump_generation_on_commit, get_or_compute
+from store.models import Product
+
+from .models import Order, OrderItem
+
+ORDER_HISTORY_ORDERING = ('-created', '-id')
+ORDER_SUMMARY_TIMEOUT = 60 * 60 * 24
+
+ORDER_FIELDS = ('id', 'user_id', 'full_name', 'address1', 'address2', 'post_code', 'created', 'total_paid')
+ITEM_FIELDS = ('id', 'order_id', 'product_id', 'price', 'quantity')
+PRODUCT_FIELDS = ('id', 'title', 'slug', 'feature_image')
+
+
+def paid_orders(user_id):
+    """
+    Build the queryset of a user's paid orders for the dashboard.
+
+    Only the columns the dashboard renders are loaded, and items are
+    prefetched together with their products and feature images.
+
+    Args:
+        user_id (int): The customer.
+
+    Returns:
+        QuerySet: Paid orders of the user, newest first.
+    """
+    products = Product.objects.only(*PRODUCT_FIELDS).with_feature_image()
+    items = OrderItem.objects.only(*ITEM_FIELDS).prefetch_related(Prefetch('product', queryset=products))
+    return (
+        Order.objects.filter(user_id=user_id, billing_status=True)
+        .only(*ORDER_FIELDS)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .order_by(*ORDER_HISTORY_ORDERING)
+    )
+
+
+def summary_namespace(user_id):
+    return f'orders:{user_id}'
+
+
+def order_summary(user_id):
+    """
+    Return the number of paid orders of a user and their lifetime spend.
+
+    Args:
+        user_id (int): The customer.
+
+    Returns:
+        dict: ``count`` (int) and ``total`` (Decimal).
+    """
+    return get_or_compute(
+        summary_namespace(user_id),
+        'summary',
+        compute=lambda: _compute_summary(user_id),
+        timeout=ORDER_SUMMARY_TIMEOUT,
+        name='orders:summary',
+    )
+
+
+def _compute_summary(user_id):
+    summary = Order.objects.filter(user_id=user_id, billing_status=True).aggregate(
+        count=Count('id'), total=Sum('total_paid')
+    )
+    summary['total'] = summary['total'] or Decimal('0.00')
+    return summary
+
+
+def invalidate_summary(user_id):
+    """
+    Drop the cached summary of a user, now and when the transaction commits.
+    """
+    bump_generation_on_commit(summary_namespace(user_id))
@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import MAX_ATTEMPTS, OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox messages (order emails and other post-order side effects)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="Handlers run concurrently")
+        parser.add_argument("--batch-size", type=int, default=50, help="Messages claimed per round")
+        parser.add_argument("--lease", type=int, default=60, help="Seconds a claimed message is held")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when nothing is due")
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="Failures before a message is dead")
+        parser.add_argument("--report-every", type=int, default=60, help="Seconds between metrics reports")
+        parser.add_argument("--once", action="store_true", help="Exit once nothing is due")
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(
+            threads=options["threads"],
+            batch_size=options["batch_size"],
+            lease=options["lease"],
+            max_attempts=options["max_attempts"],
+        )
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            worker.run(
+                poll_interval=options["poll_interval"],
+                stop=stop,
+                drain=options["once"],
+                report=self.stdout.write,
+                report_every=options["report_every"],
+            )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.close()
+        self.stdout.write(self.style.SUCCESS(worker.metrics.summary()))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0002_outbox_message"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "billing_status", "-created"],
+                name="orders_user_paid_created",
+            ),
+        ),
+    ]
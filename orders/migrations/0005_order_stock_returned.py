@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_order_updated_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="stock_returned",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("billing_status", False), ("stock_returned", False)),
+                fields=["created"],
+                name="orders_unpaid_stock_held",
+            ),
+        ),
+    ]
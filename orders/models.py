@@ -2,6 +2,7 @@ from decimal import Decimal
 
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 from store.models import Product
 
@@ -23,9 +24,13 @@ class Order(models.Model):
         total_paid (DecimalField): Total amount paid for the order.
         order_key (CharField): Unique identifier for the order.
         billing_status (BooleanField): Payment status (True if paid).
+        stock_returned (BooleanField): Whether the units of this unpaid order
+            have been returned to stock (see store.stock.restock_unpaid).
 
     Meta:
         ordering (tuple): Orders are sorted by most recent creation date first.
+        indexes (list): Serve a user's paid order history, newest first, and
+            the scan for orders changed since a point in time.
     """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='order_user')
     full_name = models.CharField(max_length=50)
@@ -37,11 +42,21 @@ class Order(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     total_paid = models.DecimalField(max_digits=5, decimal_places=2)
-    order_key = models.CharField(max_length=200)
+    order_key = models.CharField(max_length=200, unique=True)
     billing_status = models.BooleanField(default=False)
+    stock_returned = models.BooleanField(default=False)
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['user', 'billing_status', '-created'], name='orders_user_paid_created'),
+            models.Index(fields=['updated'], name='orders_updated'),
+            models.Index(
+                fields=['created'],
+                condition=models.Q(billing_status=False, stock_returned=False),
+                name='orders_unpaid_stock_held',
+            ),
+        ]
 
     def __str__(self):
         """
@@ -70,3 +85,52 @@ class OrderItem(models.Model):
         String representation of the OrderItem showing its ID.
         """
         return str(self.id)
+
+
+class OutboxMessage(models.Model):
+    """
+    A side effect to run after the transaction that recorded it commits.
+
+    Messages are inserted in the same transaction as the change that causes
+    them (see orders.outbox.enqueue) and processed by the run_outbox_worker
+    command, so a request never waits on emails or other slow work, and a
+    rolled back order never sends anything.
+
+    Attributes:
+        topic (CharField): Name of the registered handler to run.
+        payload (JSONField): Arguments passed to the handler.
+        status (CharField): Pending, done, or dead after too many failures.
+        attempts (PositiveIntegerField): Number of failed attempts so far.
+        available_at (DateTimeField): Earliest time of the next attempt.
+        locked_by (CharField): Lease token of the worker processing it.
+        locked_until (DateTimeField): When that lease expires.
+        last_error (TextField): Error of the last failed attempt.
+        created (DateTimeField): When the message was recorded.
+        processed (DateTimeField): When the handler succeeded.
+    """
+    PENDING = 'pending'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (DEAD, 'Dead')]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=['available_at', 'id'], condition=models.Q(status='pending'), name='orders_outbox_pending'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
@@ -0,0 +1,233 @@
+"""
+Transactional outbox.
+
+``enqueue()`` records a message in the caller's transaction. OutboxWorker
+claims pending messages in batches under a time-limited lease, runs their
+handlers on a thread pool and records the outcome. Claiming is a single
+conditional UPDATE, so it is safe on SQLite (which has no row locks) as
+well as on databases with ``SELECT ... FOR UPDATE SKIP LOCKED``.
+
+Delivery is at least once: a handler that outlives its lease may be run
+again by another worker, so handlers must be idempotent.
+"""
+
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from statistics import quantiles
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5
+BACKOFF_MAX = 60 * 60
+
+
+def register(topic):
+    """
+    Register the decorated function as the handler of a topic.
+
+    Args:
+        topic (str): Topic name used with enqueue().
+    """
+
+    def decorator(handler):
+        HANDLERS[topic] = handler
+        return handler
+
+    return decorator
+
+
+def enqueue(topic, **payload):
+    """
+    Record a message to be handled once the current transaction commits.
+
+    Args:
+        topic (str): Name of a registered handler.
+        **payload: JSON-serialisable arguments for the handler.
+
+    Returns:
+        OutboxMessage: The stored message.
+    """
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+
+def backoff(attempts):
+    """
+    Return the delay before retrying after the given number of failures:
+    exponential with full jitter, capped at BACKOFF_MAX seconds.
+    """
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1)))
+
+
+class OutboxMetrics:
+    """
+    Thread-safe counters and recent latency samples of a worker.
+
+    ``lag`` is the time from a message being recorded to its handler
+    finishing; ``duration`` is the time spent in the handler.
+    """
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.lag = deque(maxlen=samples)
+        self.duration = deque(maxlen=samples)
+
+    def record(self, outcome, lag=None, duration=None):
+        with self._lock:
+            self.counts[outcome] += 1
+            if lag is not None:
+                self.lag.append(lag)
+            if duration is not None:
+                self.duration.append(duration)
+
+    @staticmethod
+    def _percentiles(samples):
+        if len(samples) < 2:
+            value = samples[0] * 1000 if samples else 0.0
+            return value, value
+        cuts = quantiles(samples, n=20)
+        return cuts[9] * 1000, cuts[18] * 1000
+
+    def summary(self):
+        with self._lock:
+            lag, duration = list(self.lag), list(self.duration)
+            counts = dict(self.counts)
+        lag_p50, lag_p95 = self._percentiles(lag)
+        duration_p50, duration_p95 = self._percentiles(duration)
+        return (
+            f"done={counts.get('done', 0)} retried={counts.get('retried', 0)} dead={counts.get('dead', 0)} "
+            f"lag p50={lag_p50:.0f}ms p95={lag_p95:.0f}ms "
+            f"handler p50={duration_p50:.0f}ms p95={duration_p95:.0f}ms"
+        )
+
+
+class OutboxWorker:
+    """
+    Claims and processes outbox messages.
+
+    Args:
+        threads (int): Handlers run concurrently; 1 runs them inline.
+        batch_size (int): Messages claimed per round.
+        lease (int): Seconds a claim is held before other workers may retry it.
+        max_attempts (int): Failures after which a message is marked dead.
+    """
+
+    def __init__(self, threads=4, batch_size=50, lease=60, max_attempts=MAX_ATTEMPTS):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.metrics = OutboxMetrics()
+        self._executor = ThreadPoolExecutor(threads, thread_name_prefix="outbox") if threads > 1 else None
+
+    def claim(self):
+        """
+        Lease up to ``batch_size`` due messages to this worker.
+
+        Returns:
+            list[OutboxMessage]: The claimed messages.
+        """
+        now = timezone.now()
+        claimable = Q(status=OutboxMessage.PENDING, available_at__lte=now) & (
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+        )
+        due = OutboxMessage.objects.filter(claimable).order_by("available_at", "id")
+        ids = list(due.values_list("id", flat=True)[: self.batch_size])
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        # Re-checking the lease in the UPDATE makes concurrent claims of the same row exclusive.
+        OutboxMessage.objects.filter(claimable, id__in=ids).update(
+            locked_by=token, locked_until=now + timedelta(seconds=self.lease)
+        )
+        return list(OutboxMessage.objects.filter(locked_by=token))
+
+    def process(self, message):
+        """
+        Run the handler of one claimed message and record the outcome.
+        """
+        started = time.monotonic()
+        try:
+            HANDLERS[message.topic](**message.payload)
+        except Exception as error:
+            self._failed(message, error)
+        else:
+            now = timezone.now()
+            OutboxMessage.objects.filter(pk=message.pk, locked_by=message.locked_by).update(
+                status=OutboxMessage.DONE, processed=now, locked_by="", locked_until=None
+            )
+            self.metrics.record(
+                "done", lag=(now - message.created).total_seconds(), duration=time.monotonic() - started
+            )
+
+    def _failed(self, message, error):
+        attempts = message.attempts + 1
+        update = {"attempts": attempts, "last_error": repr(error), "locked_by": "", "locked_until": None}
+        if attempts >= self.max_attempts:
+            update["status"] = OutboxMessage.DEAD
+            outcome = "dead"
+            logger.error("Outbox message %s (%s) failed for good: %r", message.pk, message.topic, error)
+        else:
+            update["available_at"] = timezone.now() + timedelta(seconds=backoff(attempts))
+            outcome = "retried"
+            logger.warning("Outbox message %s (%s) failed, will retry: %r", message.pk, message.topic, error)
+        OutboxMessage.objects.filter(pk=message.pk, locked_by=message.locked_by).update(**update)
+        self.metrics.record(outcome)
+
+    def _run_in_thread(self, message):
+        try:
+            self.process(message)
+        finally:
+            close_old_connections()
+
+    def run_once(self):
+        """
+        Claim one batch and wait until all of it is processed.
+
+        Returns:
+            int: Number of messages processed.
+        """
+        messages = self.claim()
+        if self._executor is None:
+            for message in messages:
+                self.process(message)
+        else:
+            list(self._executor.map(self._run_in_thread, messages))
+        return len(messages)
+
+    def run(self, poll_interval=1.0, stop=None, drain=False, report=None, report_every=60):
+        """
+        Process batches until ``stop`` is set, or until nothing is due when ``drain`` is true.
+
+        Args:
+            report (callable): Called with a metrics summary every ``report_every`` seconds.
+        """
+        last_report = time.monotonic()
+        while stop is None or not stop.is_set():
+            processed = self.run_once()
+            if report and time.monotonic() - last_report >= report_every:
+                report(self.metrics.summary())
+                last_report = time.monotonic()
+            if not processed:
+                if drain:
+                    break
+                time.sleep(poll_interval)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
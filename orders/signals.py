@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .history import invalidate_summary
+from .models import Order
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_summary(instance.user_id)
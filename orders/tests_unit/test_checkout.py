@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.checkout import OrderKeyInUse, place_order
+from orders.models import Order, OrderItem
+from store.models import Category, Product, ProductType
+
+
+class TestPlaceOrder(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = Product.objects.bulk_create(
+            Product(
+                product_type=product_type, category=category, title=f'book {n}', slug=f'book-{n}',
+                regular_price='2.50', discount_price='2.50',
+            )
+            for n in range(40)
+        )
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+
+    def place(self, order_key, products):
+        with CaptureQueriesContext(connection) as queries:
+            order, created = place_order(self.user.id, order_key, [(product.id, 2) for product in products])
+        return order, created, len(queries)
+
+    def test_query_count_does_not_grow_with_basket(self):
+        """
+        A 40-line order costs as many queries as a 1-line order.
+        """
+        small, created, small_queries = self.place('small', self.products[:1])
+        large, created, large_queries = self.place('large', self.products)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(large.items.count(), 40)
+        self.assertEqual(large.total_paid, Decimal('211.50'))
+        self.assertEqual(OrderItem.objects.filter(order=large, price=Decimal('2.50'), quantity=2).count(), 40)
+
+    def test_repeated_order_key_returns_existing_order(self):
+        first, created, queries = self.place('key', self.products[:3])
+        self.assertTrue(created)
+        second, created, queries = self.place('key', self.products)
+        self.assertFalse(created)
+        self.assertEqual(second, first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(first.items.count(), 3)
+
+    def test_order_key_of_another_user_is_rejected(self):
+        first, created, queries = self.place('key', self.products[:3])
+        rival = get_user_model().objects.create_user('b@example.com', 'b', 'secret', is_active=True)
+        with self.assertRaises(OrderKeyInUse):
+            place_order(rival.id, 'key', [(self.products[0].id, 1)])
+        self.assertEqual(Order.objects.get().user, self.user)
+
+    def test_add_view(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('basket:basket_batch'),
+            {'operations': [{'op': 'add', 'product': self.products[0].id, 'qty': 3}]},
+            content_type='application/json',
+        )
+        data = {'order_key': 'abc', 'action': 'post'}
+        self.assertEqual(self.client.post(reverse('orders:add'), data).status_code, 200)
+        self.assertEqual(self.client.post(reverse('orders:add'), data).status_code, 200)
+        order = Order.objects.get()
+        self.assertEqual((order.user, order.total_paid), (self.user, Decimal('19.00')))
+        self.assertEqual(list(order.items.values_list('quantity', flat=True)), [3])
+        self.assertEqual(self.client.post(reverse('orders:add'), {'action': 'post'}).status_code, 400)
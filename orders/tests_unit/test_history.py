@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.history import order_summary
+from orders.models import Order, OrderItem
+from orders.views import payment_confirmation
+from store.models import Category, Product, ProductType
+
+
+@override_settings(ORDER_HISTORY_PAGE_SIZE=5)
+class TestOrderHistory(TestCase):
+    def setUp(self):
+        cache.clear()
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = Product.objects.bulk_create(
+            Product(
+                product_type=product_type, category=category, title=f'book {n}', slug=f'book-{n}',
+                regular_price='10.00', discount_price='10.00',
+            )
+            for n in range(3)
+        )
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.client.force_login(self.user)
+
+    def create_orders(self, count, paid=True):
+        now = timezone.now()
+        orders = Order.objects.bulk_create(
+            Order(
+                user=self.user, full_name='name', address1='add1', address2='add2', city='', phone='',
+                post_code='', total_paid='30.00', order_key=f'key-{paid}-{n}', billing_status=paid,
+            )
+            for n in range(count)
+        )
+        # auto_now_add ignores the given value, so spread the timestamps out afterwards.
+        for n, order in enumerate(orders):
+            Order.objects.filter(pk=order.pk).update(created=now - timedelta(minutes=n))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price='10.00', quantity=1)
+            for order in orders
+            for product in self.products
+        )
+        return orders
+
+    def dashboard_queries(self, **params):
+        self.client.get(reverse('account:dashboard'), params)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('account:dashboard'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_dashboard_queries_do_not_grow_with_orders(self):
+        self.create_orders(1)
+        response, small = self.dashboard_queries()
+        Order.objects.all().delete()
+        self.create_orders(5)
+        response, large = self.dashboard_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['orders']), 5)
+        self.assertContains(response, self.products[0].get_absolute_url(), count=5)
+
+    def test_dashboard_pages_through_paid_orders(self):
+        orders = self.create_orders(7)
+        self.create_orders(2, paid=False)
+        first = self.client.get(reverse('account:dashboard')).context['page']
+        self.assertEqual([order.pk for order in first], [order.pk for order in orders[:5]])
+        second = self.client.get(reverse('account:dashboard'), {'cursor': first.next_cursor}).context['page']
+        self.assertEqual([order.pk for order in second], [order.pk for order in orders[5:]])
+        self.assertFalse(second.has_next)
+
+        response = self.client.get(reverse('account:dashboard'), {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_summary_is_cached_and_invalidated(self):
+        self.create_orders(2)
+        self.assertEqual(order_summary(self.user.id), {'count': 2, 'total': Decimal('60.00')})
+        with self.assertNumQueries(0):
+            order_summary(self.user.id)
+
+        unpaid = self.create_orders(1, paid=False)[0]
+        payment_confirmation(unpaid.order_key)
+        self.assertEqual(order_summary(self.user.id), {'count': 3, 'total': Decimal('90.00')})
+
+        Order.objects.get(pk=unpaid.pk).delete()
+        self.assertEqual(order_summary(self.user.id)['count'], 2)
+
+    def test_summary_without_orders(self):
+        self.assertEqual(order_summary(self.user.id), {'count': 0, 'total': Decimal('0.00')})
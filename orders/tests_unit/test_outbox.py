@@ -0,0 +1,93 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from orders import outbox
+from orders.checkout import place_order
+from orders.models import Order, OutboxMessage
+from orders.views import payment_confirmation
+from store.models import Category, Product, ProductType
+
+
+class TestOutbox(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.product = Product.objects.create(
+            product_type=product_type, category=category, title='book', slug='book',
+            regular_price='20.00', discount_price='20.00',
+        )
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.worker = outbox.OutboxWorker(threads=1)
+
+    def place(self, order_key='key'):
+        return place_order(self.user.id, order_key, [(self.product.id, 1)])[0]
+
+    def test_placing_an_order_enqueues_confirmation(self):
+        order = self.place()
+        self.place()
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.topic, message.payload), ('order.placed', {'order_id': order.id}))
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(self.worker.run_once(), 1)
+        self.assertEqual(mail.outbox[0].to, ['a@example.com'])
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.DONE)
+        self.assertIsNotNone(message.processed)
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_payment_confirmation_enqueues_receipt_once(self):
+        order = self.place()
+        payment_confirmation(order.order_key)
+        payment_confirmation(order.order_key)
+        self.assertTrue(Order.objects.get().billing_status)
+        self.assertEqual(OutboxMessage.objects.filter(topic='order.paid').count(), 1)
+
+    def test_claimed_messages_are_leased(self):
+        self.place()
+        claimed = self.worker.claim()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(outbox.OutboxWorker(threads=1).claim(), [])
+
+        OutboxMessage.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(outbox.OutboxWorker(threads=1).claim()), 1)
+
+    def test_failures_are_retried_then_dead(self):
+        def fail(**payload):
+            raise RuntimeError('smtp down')
+
+        outbox.HANDLERS['test.fail'] = fail
+        self.addCleanup(outbox.HANDLERS.pop, 'test.fail')
+        message = outbox.enqueue('test.fail')
+        worker = outbox.OutboxWorker(threads=1, max_attempts=2)
+
+        worker.run_once()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.PENDING, 1))
+        self.assertIn('smtp down', message.last_error)
+        self.assertEqual(message.locked_by, '')
+
+        OutboxMessage.objects.update(available_at=timezone.now())
+        worker.run_once()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.DEAD, 2))
+        self.assertEqual(worker.metrics.counts, {'retried': 1, 'dead': 1})
+
+    def test_backoff_is_capped(self):
+        for attempts in range(1, 30):
+            self.assertLessEqual(outbox.backoff(attempts), outbox.BACKOFF_MAX)
+
+    def test_command_drains_once(self):
+        self.place('one')
+        self.place('two')
+        out = StringIO()
+        call_command('run_outbox_worker', '--once', '--threads', '1', stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('done=2', out.getvalue())
+        self.assertFalse(OutboxMessage.objects.filter(status=OutboxMessage.PENDING).exists())
@@ -1,47 +1,49 @@
 # Create your views here.
+import logging
+
+from django.db import transaction
 from django.http.response import JsonResponse
 from django.shortcuts import render
+from django.utils import timezone
+
+from basket.basket import get_basket
+from store.stock import OutOfStock, take_paid
 
-from basket.basket import Basket
+from . import outbox
+from .checkout import OrderKeyInUse, place_order
+from .history import invalidate_summary, paid_orders
+from .models import Order
 
-from .models import Order, OrderItem
+logger = logging.getLogger(__name__)
 
 
 def add(request):
     """
-    Create a new order and associated order items based on the current user's basket.
+    Create a new order and its items from the current user's basket.
 
-    If an order with the same order key already exists, no new order is created.
-    Responds with a JSON success message after processing the order.
+    Placing the same order key twice returns the existing order instead of
+    creating a new one. Responds with a JSON success message, or 409 listing
+    the products that are out of stock.
     """
-    basket = Basket(request)
+    basket = get_basket(request)
     if request.POST.get('action') == 'post':
-
         order_key = request.POST.get('order_key')
-        user_id = request.user.id
-        baskettotal = basket.get_total_price()
+        if not order_key or not len(basket):
+            return JsonResponse({'error': 'Nothing to order'}, status=400)
 
-        # Check if order exists
-        if Order.objects.filter(order_key=order_key).exists():
-            pass
-        else:
-            order = Order.objects.create(
-                user_id=user_id,
+        try:
+            place_order(
+                request.user.id,
+                order_key,
+                zip(basket.ids, basket.qtys),
                 full_name='name',
                 address1='add1',
                 address2='add2',
-                total_paid=baskettotal,
-                order_key=order_key
             )
-            order_id = order.pk
-
-            for item in basket:
-                OrderItem.objects.create(
-                    order_id=order_id,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['qty']
-                )
+        except OutOfStock as error:
+            return JsonResponse({'error': 'Out of stock', 'products': error.product_ids}, status=409)
+        except OrderKeyInUse:
+            return JsonResponse({'error': 'Order key already used'}, status=409)
 
         response = JsonResponse({'success': 'Return something'})
         return response
@@ -50,20 +52,39 @@ def add(request):
 def payment_confirmation(data):
     """
     Update the billing status of an order to True after payment confirmation.
+    The receipt email is sent by the outbox worker. If the order stayed
+    unpaid long enough for its units to be returned to stock, they are
+    taken again.
 
     Args:
         data (str): The order key of the order to be updated.
     """
-    Order.objects.filter(order_key=data).update(billing_status=True)
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(order_key=data, billing_status=False)
+            .values_list('id', 'user_id', 'stock_returned')
+        )
+        Order.objects.filter(id__in=[order_id for order_id, user_id, returned in orders]).update(
+            billing_status=True, stock_returned=False, updated=timezone.now()
+        )
+        restocked = [order_id for order_id, user_id, returned in orders if returned]
+        if restocked:
+            short = take_paid(restocked)
+            if short:
+                logger.warning('Orders %s were paid after their stock was returned; short of products %s',
+                               restocked, short)
+        for order_id, user_id, returned in orders:
+            outbox.enqueue('order.paid', order_id=order_id)
+            invalidate_summary(user_id)
 
 
 def user_orders(request):
     """
-    Retrieve all completed (paid) orders for the current logged-in user.
+    Retrieve all completed (paid) orders for the current logged-in user,
+    newest first, with their items and products prefetched.
 
     Returns:
         QuerySet: A queryset of orders where billing_status is True.
     """
-    user_id = request.user.id
-    orders = Order.objects.filter(user_id=user_id).filter(billing_status=True)
-    return orders
+    return paid_orders(request.user.id)
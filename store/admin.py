@@ -38,4 +38,12 @@ class ProductAdmin(admin.ModelAdmin):
     inlines = [
         ProductSpecificationValueInline,
         ProductImageInline,
-    ]
\ No newline at end of file
+    ]
+
+    def save_model(self, request, obj, form, change):
+        if change and "stock" not in form.changed_data:
+            # Checkouts change stock concurrently; only write it when it was edited here.
+            fields = [field.name for field in obj._meta.concrete_fields if not field.primary_key]
+            obj.save(update_fields=[name for name in fields if name != "stock"])
+        else:
+            super().save_model(request, obj, form, change)
\ No newline at end of file
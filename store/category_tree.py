@@ -0,0 +1,117 @@
+from bisect import bisect_left
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+
+from core.cache import get_generation, get_or_compute
+
+from .models import Category
+
+CATEGORY_TREE_NAMESPACE = "store:category_tree"
+CATEGORY_TREE_TIMEOUT = 60 * 60 * 24
+
+
+class CategoryNode(NamedTuple):
+    """
+    Lightweight, immutable stand-in for a Category row.
+    """
+
+    id: int
+    name: str
+    slug: str
+    parent_id: Optional[int]
+    level: int
+    tree_id: int
+    lft: int
+    rght: int
+    is_active: bool
+
+    def get_absolute_url(self):
+        return reverse("store:category_list", args=[self.slug])
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryTree:
+    """
+    The whole category tree in MPTT (tree_id, lft) order.
+    """
+
+    __slots__ = ("generation", "nodes", "by_slug", "_positions", "_descendants")
+
+    def __init__(self, generation, nodes):
+        self.generation = generation
+        self.nodes = nodes
+        self.by_slug = MappingProxyType({node.slug: node for node in nodes})
+        self._positions = [(node.tree_id, node.lft) for node in nodes]
+        self._descendants = {}
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, slug):
+        return self.by_slug.get(slug)
+
+    def descendant_ids(self, node):
+        """
+        Return the ids of a node and all of its descendants.
+
+        Descendants are the nodes of the same tree whose ``lft`` lies inside
+        the node's ``(lft, rght)`` range, which in tree order is one
+        contiguous run. The result is memoised for the life of this tree.
+        """
+        ids = self._descendants.get(node.id)
+        if ids is None:
+            start = bisect_left(self._positions, (node.tree_id, node.lft))
+            end = bisect_left(self._positions, (node.tree_id, node.rght), lo=start)
+            ids = self._descendants[node.id] = frozenset(n.id for n in self.nodes[start:end])
+        return ids
+
+
+_local_tree = None
+
+
+def _load_rows():
+    return tuple(Category.objects.order_by("tree_id", "lft").values_list(*CategoryNode._fields))
+
+
+def get_category_tree():
+    """
+    Return the current CategoryTree.
+
+    The tree is kept per process and rebuilt only when the category
+    generation moves on. A process that has not seen the new generation yet
+    first tries the copy another process stored in the shared cache, and
+    only queries the database if there is none.
+    """
+    global _local_tree
+
+    generation = get_generation(CATEGORY_TREE_NAMESPACE)
+    tree = _local_tree
+    if tree is not None and tree.generation == generation:
+        return tree
+
+    rows = get_or_compute(
+        CATEGORY_TREE_NAMESPACE, compute=_load_rows, timeout=CATEGORY_TREE_TIMEOUT, generation=generation
+    )
+
+    tree = CategoryTree(generation, tuple(CategoryNode(*row) for row in rows))
+    _local_tree = tree
+    return tree
+
+
+async def aget_category_tree():
+    """
+    Async version of get_category_tree(). Only a stale tree costs a trip to
+    a worker thread; the current one is returned directly.
+    """
+    tree = _local_tree
+    if tree is not None and tree.generation == get_generation(CATEGORY_TREE_NAMESPACE):
+        return tree
+    return await sync_to_async(get_category_tree)()
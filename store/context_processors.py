@@ -1,7 +1,7 @@
-from .models import Category
+from .category_tree import get_category_tree
 
 
 def categories(request):
     return {
-        "categories": Category.objects.all()
+        "categories": get_category_tree()
     }
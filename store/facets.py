@@ -0,0 +1,368 @@
+"""
+Faceted filtering over product specification values.
+
+Every (specification, value) pair has a posting list: the sorted ids of the
+products carrying it, stored packed in FacetPosting. Filtering is a merge of
+posting lists instead of one join per selected facet, and facet counts are
+the sizes of each posting list intersected with the current result set.
+
+A specification value change is appended to FacetPostingChange rather than
+rewriting its posting list; loading the index replays the pending changes
+over the stored lists, and compact() folds them in once COMPACT_AFTER
+changes are pending. A category page counts only the facets of the product types it
+lists, and its match and counts are cached per selection until the facets,
+the category tree or a product change.
+"""
+
+import hashlib
+import json
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from core.cache import bump_generation_on_commit, get_generation, get_or_compute
+
+from .models import FacetPosting, FacetPostingChange, ProductSpecification, ProductSpecificationValue
+
+FACET_NAMESPACE = "store:facets"
+# Bumped by product saves, which can move products in or out of a category.
+FACET_COUNTS_NAMESPACE = "store:facet_counts"
+FACET_COUNTS_TIMEOUT = 60 * 60
+# Logged changes that trigger folding them into the posting lists.
+COMPACT_AFTER = 500
+
+# Above this many ids a filter is passed to SQLite as one JSON parameter
+# rather than one bound parameter per id.
+_MAX_INLINE_IDS = 500
+
+
+def unpack(blob):
+    ids = array("q")
+    ids.frombytes(bytes(blob))
+    return ids
+
+
+def pack(ids):
+    return array("q", ids).tobytes()
+
+
+def intersect(left, right):
+    """
+    Intersect two sorted id arrays by probing the longer with the shorter.
+    """
+    if len(left) > len(right):
+        left, right = right, left
+    result = array("q")
+    position = 0
+    for product_id in left:
+        position = bisect_left(right, product_id, position)
+        if position == len(right):
+            break
+        if right[position] == product_id:
+            result.append(product_id)
+    return result
+
+
+def union(postings):
+    return array("q", sorted(set().union(*postings)))
+
+
+def apply_changes(ids, changes):
+    """
+    Apply (product id, added) changes, oldest first, to a sorted id array.
+
+    Each change only states whether the product is in the list, so
+    replaying changes that are already reflected leaves the list as is.
+    """
+    for product_id, added in changes:
+        position = bisect_left(ids, product_id)
+        present = position < len(ids) and ids[position] == product_id
+        if added and not present:
+            insort(ids, product_id)
+        elif present and not added:
+            del ids[position]
+    return ids
+
+
+class FacetIndex:
+    """
+    In-memory view of all posting lists, grouped by specification name so
+    that same-named specifications of different product types share facets.
+    """
+
+    __slots__ = ("generation", "postings", "names_by_type")
+
+    def __init__(self, generation, postings, names_by_type=None):
+        self.generation = generation
+        self.postings = postings
+        self.names_by_type = names_by_type or {}
+
+    def selection(self, query_dict):
+        """
+        Pick the facet selections out of the request's query parameters,
+        keeping only known values, in a canonical order.
+        """
+        selected = selected_facets(query_dict, self.postings)
+        return {
+            name: sorted(value for value in set(values) if value in self.postings[name])
+            for name, values in sorted(selected.items())
+        }
+
+    def match(self, selected):
+        """
+        Return the sorted ids matching every selected facet.
+
+        Values of the same facet are alternatives (OR); different facets
+        must all match (AND).
+
+        :param selected: Mapping of facet name to a list of values
+        :return: array of product ids, or None when nothing is selected
+        """
+        result = None
+        for name, values in selected.items():
+            postings = [self.postings[name][value] for value in values if value in self.postings.get(name, {})]
+            ids = union(postings) if len(postings) > 1 else (postings[0] if postings else array("q"))
+            result = ids if result is None else intersect(result, ids)
+        return result
+
+    def counts(self, result_ids, names=None):
+        """
+        Count, for every facet value, how many of the given products carry it.
+
+        :param result_ids: Sorted array of the products currently listed
+        :param names: Facets to count, default all
+        :return: {name: {value: count}} without zero counts
+        """
+        counts = {}
+        for name in self.postings if names is None else names:
+            for value, ids in self.postings.get(name, {}).items():
+                count = len(intersect(ids, result_ids))
+                if count:
+                    counts.setdefault(name, {})[value] = count
+        return counts
+
+
+_local_index = None
+
+
+def get_facet_index():
+    """
+    Return the FacetIndex for the current facet generation, reloading the
+    posting lists only after they have changed.
+    """
+    global _local_index
+
+    generation = get_generation(FACET_NAMESPACE)
+    index = _local_index
+    if index is not None and index.generation == generation:
+        return index
+
+    # Changes first: a compaction between the two reads then only means
+    # replaying changes the posting lists already contain.
+    changes = defaultdict(list)
+    for specification_id, value, product_id, added in FacetPostingChange.objects.order_by("id").values_list(
+        "specification_id", "value", "product_id", "added"
+    ):
+        changes[(specification_id, value)].append((product_id, added))
+    lists = {}
+    names = {}
+    rows = FacetPosting.objects.values_list(
+        "specification_id", "specification__name", "specification__product_type_id", "value", "product_ids"
+    )
+    for specification_id, name, product_type_id, value, blob in rows.iterator():
+        lists[(specification_id, value)] = unpack(blob)
+        names[specification_id] = (name, product_type_id)
+    if changes:
+        names.update(
+            (specification_id, (name, product_type_id))
+            for specification_id, name, product_type_id in ProductSpecification.objects.filter(
+                pk__in={specification_id for specification_id, value in changes}
+            ).values_list("id", "name", "product_type_id")
+        )
+
+    postings = {}
+    names_by_type = defaultdict(set)
+    for key in lists.keys() | changes.keys():
+        ids = apply_changes(lists.get(key, array("q")), changes.get(key, ()))
+        if not ids or key[0] not in names:
+            continue
+        name, product_type_id = names[key[0]]
+        names_by_type[product_type_id].add(name)
+        existing = postings.setdefault(name, {}).get(key[1])
+        postings[name][key[1]] = union([existing, ids]) if existing else ids
+    index = _local_index = FacetIndex(generation, postings, dict(names_by_type))
+    return index
+
+
+def category_facets(index, category_generation, category, products, selected):
+    """
+    Match a category's products against the selected facets and count the
+    facets of the product types it lists, cached per selection.
+
+    :param index: Current FacetIndex
+    :param category_generation: Generation of the category tree
+    :param category: CategoryNode (or Category) listed
+    :param products: Queryset of the category's products
+    :param selected: Canonical selection, from FacetIndex.selection()
+    :return: (sorted ids matching the selection, or None if nothing is selected, counts)
+    """
+    digest = hashlib.md5(json.dumps(selected).encode()).hexdigest()
+
+    def compute():
+        category_ids, product_types = array("q"), set()
+        for product_id, product_type_id in products.order_by("id").values_list("id", "product_type_id"):
+            category_ids.append(product_id)
+            product_types.add(product_type_id)
+        names = set().union(*(index.names_by_type.get(product_type_id, ()) for product_type_id in product_types))
+        matched = index.match(selected)
+        result_ids = category_ids if matched is None else intersect(category_ids, matched)
+        counts = index.counts(result_ids, sorted(names))
+        return (None if matched is None else result_ids.tobytes()), counts
+
+    blob, counts = get_or_compute(
+        FACET_COUNTS_NAMESPACE,
+        index.generation,
+        category_generation,
+        category.id,
+        digest,
+        compute=compute,
+        timeout=FACET_COUNTS_TIMEOUT,
+    )
+    return (None if blob is None else unpack(blob)), counts
+
+
+def filter_ids(queryset, ids):
+    """
+    Restrict a queryset to the given product ids.
+    """
+    if connection.vendor == "sqlite" and len(ids) > _MAX_INLINE_IDS:
+        return queryset.filter(id__in=RawSQL("SELECT value FROM json_each(%s)", [json.dumps(ids.tolist())]))
+    return queryset.filter(id__in=ids.tolist())
+
+
+def selected_facets(query_dict, names):
+    """
+    Pick the facet selections out of the request's query parameters.
+    """
+    return {name: query_dict.getlist(name) for name in names if query_dict.getlist(name)}
+
+
+def facet_groups(counts, query_dict):
+    """
+    Shape facet counts for templates, with a link toggling each value.
+    """
+    groups = []
+    for name in sorted(counts):
+        values = []
+        for value, count in sorted(counts[name].items()):
+            params = query_dict.copy()
+            params.pop("cursor", None)
+            chosen = params.getlist(name)
+            is_selected = value in chosen
+            params.setlist(name, [v for v in chosen if v != value] if is_selected else chosen + [value])
+            values.append({"value": value, "count": count, "selected": is_selected, "query": params.urlencode()})
+        groups.append({"name": name, "values": values})
+    return groups
+
+
+def _log_change(specification_id, value, product_id, added):
+    FacetPostingChange.objects.create(
+        specification_id=specification_id, value=value, product_id=product_id, added=added
+    )
+    bump_generation_on_commit(FACET_NAMESPACE)
+    if FacetPostingChange.objects.count() >= COMPACT_AFTER:
+        transaction.on_commit(_compact_if_due)
+
+
+def _compact_if_due():
+    # Several writes in one transaction may each have scheduled this.
+    if FacetPostingChange.objects.count() >= COMPACT_AFTER:
+        compact()
+
+
+def add_product(specification_id, value, product_id):
+    _log_change(specification_id, value, product_id, added=True)
+
+
+def remove_product(specification_id, value, product_id):
+    _log_change(specification_id, value, product_id, added=False)
+
+
+@transaction.atomic
+def compact():
+    """
+    Fold the logged changes into their posting lists, rewriting each
+    affected list once.
+
+    :return: Number of changes folded
+    """
+    changes = list(
+        FacetPostingChange.objects.select_for_update()
+        .order_by("id")
+        .values_list("id", "specification_id", "value", "product_id", "added")
+    )
+    if not changes:
+        return 0
+    pending = defaultdict(list)
+    for change_id, specification_id, value, product_id, added in changes:
+        pending[(specification_id, value)].append((product_id, added))
+
+    stored = {
+        (posting.specification_id, posting.value): posting
+        for posting in FacetPosting.objects.select_for_update().filter(
+            specification_id__in={specification_id for specification_id, value in pending},
+            value__in={value for specification_id, value in pending},
+        )
+    }
+    written, emptied = [], []
+    for key, key_changes in pending.items():
+        posting = stored.get(key) or FacetPosting(specification_id=key[0], value=key[1])
+        ids = apply_changes(unpack(posting.product_ids), key_changes)
+        if ids:
+            posting.product_ids = ids.tobytes()
+            written.append(posting)
+        elif posting.pk:
+            emptied.append(posting.pk)
+    FacetPosting.objects.bulk_create(
+        written, update_conflicts=True, unique_fields=["specification", "value"], update_fields=["product_ids"]
+    )
+    FacetPosting.objects.filter(pk__in=emptied).delete()
+    FacetPostingChange.objects.filter(id__lte=changes[-1][0]).delete()
+    return len(changes)
+
+
+def rebuild(batch_size=1000):
+    """
+    Rebuild every posting list from ProductSpecificationValue.
+
+    :return: Number of posting lists written
+    """
+    written = 0
+    with transaction.atomic():
+        FacetPostingChange.objects.all().delete()
+        FacetPosting.objects.all().delete()
+        rows = ProductSpecificationValue.objects.order_by("specification_id", "value", "product_id").values_list(
+            "specification_id", "value", "product_id"
+        )
+        batch = []
+        key, ids = None, array("q")
+        for specification_id, value, product_id in rows.iterator(chunk_size=batch_size * 10):
+            if (specification_id, value) != key:
+                if key is not None:
+                    batch.append(FacetPosting(specification_id=key[0], value=key[1], product_ids=ids.tobytes()))
+                key, ids = (specification_id, value), array("q")
+            if not ids or ids[-1] != product_id:
+                ids.append(product_id)
+            if len(batch) >= batch_size:
+                FacetPosting.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if key is not None:
+            batch.append(FacetPosting(specification_id=key[0], value=key[1], product_ids=ids.tobytes()))
+        FacetPosting.objects.bulk_create(batch)
+        written += len(batch)
+    bump_generation_on_commit(FACET_NAMESPACE)
+    return written
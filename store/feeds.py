@@ -0,0 +1,170 @@
+"""
+Streaming product feeds for partners.
+
+Feeds are generators of text chunks over a ``values()`` projection read with
+``QuerySet.iterator()``, so only one database chunk of rows is held at a
+time and the first bytes go out before the last row is read. Category paths
+come from the cached category tree rather than a join per row.
+"""
+
+import csv
+import json
+from datetime import datetime, time
+from xml.sax.saxutils import escape
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .category_tree import get_category_tree
+from .models import Product
+
+FIELDS = [
+    "id",
+    "slug",
+    "title",
+    "description",
+    "link",
+    "image_link",
+    "category",
+    "regular_price",
+    "price",
+    "availability",
+    "updated_at",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "xml": "application/xml; charset=utf-8",
+}
+
+_COLUMNS = (
+    "id",
+    "slug",
+    "title",
+    "description",
+    "category_id",
+    "regular_price",
+    "discount_price",
+    "is_active",
+    "stock",
+    "updated_at",
+    "feature_image__image",
+)
+
+
+def parse_since(value):
+    """
+    Parse a ``since`` parameter given as an ISO date or datetime.
+
+    :return: An aware datetime, or None if the value is not a valid date
+    """
+    try:
+        since = parse_datetime(value)
+        if since is None:
+            date = parse_date(value)
+            since = date and datetime.combine(date, time.min)
+    except ValueError:
+        return None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def _category_paths():
+    tree = get_category_tree()
+    by_id = {node.id: node for node in tree}
+    paths = {}
+    for node in tree:
+        names = []
+        current = node
+        while current is not None:
+            names.append(current.name)
+            current = by_id.get(current.parent_id)
+        paths[node.id] = " > ".join(reversed(names))
+    return paths
+
+
+def feed_items(since=None, base_url="", chunk_size=2000):
+    """
+    Yield one dict per product, in id order.
+
+    A full feed lists active products only. An incremental feed lists every
+    product updated after ``since``, inactive ones marked out of stock, so
+    that partners can drop them.
+    """
+    products = Product.objects.order_by("id")
+    if since is None:
+        products = products.filter(is_active=True)
+    else:
+        products = products.filter(updated_at__gt=since)
+
+    paths = _category_paths()
+    link = base_url + reverse("store:product_detail", args=["__slug__"])
+    for row in products.values_list(*_COLUMNS).iterator(chunk_size=chunk_size):
+        (product_id, slug, title, description, category_id, regular_price, price,
+         is_active, stock, updated_at, image) = row
+        yield {
+            "id": product_id,
+            "slug": slug,
+            "title": title,
+            "description": description,
+            "link": link.replace("__slug__", slug),
+            "image_link": base_url + default_storage.url(image) if image else "",
+            "category": paths.get(category_id, ""),
+            "regular_price": str(regular_price),
+            "price": str(price),
+            "availability": "in_stock" if is_active and (stock is None or stock > 0) else "out_of_stock",
+            "updated_at": updated_at.isoformat(),
+        }
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def write_csv(items):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for item in items:
+        yield writer.writerow([item[field] for field in FIELDS])
+
+
+def write_jsonl(items):
+    for item in items:
+        yield json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def write_xml(items):
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+    )
+    for item in items:
+        yield (
+            "<item>"
+            f"<g:id>{item['id']}</g:id>"
+            f"<title>{escape(item['title'])}</title>"
+            f"<description>{escape(item['description'])}</description>"
+            f"<link>{escape(item['link'])}</link>"
+            f"<g:image_link>{escape(item['image_link'])}</g:image_link>"
+            f"<g:product_type>{escape(item['category'])}</g:product_type>"
+            f"<g:price>{item['regular_price']}</g:price>"
+            f"<g:sale_price>{item['price']}</g:sale_price>"
+            f"<g:availability>{item['availability']}</g:availability>"
+            "</item>\n"
+        )
+    yield "</channel>\n</rss>\n"
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl, "xml": write_xml}
+
+
+def stream_feed(feed_format, since=None, base_url="", chunk_size=2000):
+    """
+    Return an iterator over the text chunks of a feed.
+    """
+    return WRITERS[feed_format](feed_items(since=since, base_url=base_url, chunk_size=chunk_size))
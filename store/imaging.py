@@ -0,0 +1,123 @@
+"""
+Resized WebP/JPEG copies of product images.
+
+Uploads are handed to a small thread pool once the transaction that saved
+them commits, so the admin request that uploaded the image never waits on
+Pillow. Existing images can be backfilled in parallel with the
+``generate_image_derivatives`` management command.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.cache import cache_lock
+
+from . import page_cache
+from .models import ProductImage, ProductImageDerivative
+
+logger = logging.getLogger(__name__)
+
+SAVE_OPTIONS = {
+    ProductImageDerivative.WEBP: {"format": "WEBP", "quality": 80, "method": 4},
+    ProductImageDerivative.JPEG: {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+
+_executor = None
+
+
+def _resize(source, width):
+    height = max(round(source.height * width / source.width), 1)
+    return source.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(image, image_format):
+    if image_format == ProductImageDerivative.JPEG and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, **SAVE_OPTIONS[image_format])
+    return buffer.getvalue()
+
+
+def generate_derivatives(image_id, force=False):
+    """
+    Generate the configured derivatives of one ProductImage.
+
+    Widths larger than the original are skipped rather than upscaled.
+    Nothing is done if derivatives of the current file already exist,
+    unless ``force`` is set, or while another worker is generating them.
+    Once written, the product page is invalidated so it links them.
+
+    :return: Number of derivative files written
+    """
+    with cache_lock(f"store:image_derivatives:{image_id}") as acquired:
+        if not acquired:
+            return 0
+        written = _generate(image_id, force)
+    if written:
+        # Touch the image so the page's version, and with it its ETag, changes.
+        ProductImage.objects.filter(pk=image_id).update(updated_at=timezone.now())
+        page_cache.invalidate(*ProductImage.objects.filter(pk=image_id).values_list("product__slug", flat=True))
+    return written
+
+
+def _generate(image_id, force):
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return 0
+    existing = image.derivatives.all()
+    if not force and existing.exists() and not existing.exclude(source=image.image.name).exists():
+        return 0
+
+    with image.image.open("rb") as handle:
+        source = ImageOps.exif_transpose(Image.open(handle))
+        source.load()
+
+    for derivative in existing:
+        derivative.file.delete(save=False)
+    existing.delete()
+
+    stem = os.path.splitext(os.path.basename(image.image.name))[0]
+    written = 0
+    for width in sorted(settings.STORE_IMAGE_WIDTHS):
+        if width > source.width:
+            break
+        resized = _resize(source, width)
+        for image_format in settings.STORE_IMAGE_FORMATS:
+            derivative = ProductImageDerivative(
+                image=image, source=image.image.name, format=image_format, width=resized.width, height=resized.height
+            )
+            derivative.file.save(f"{stem}-{width}w.{image_format}", ContentFile(_encode(resized, image_format)))
+            written += 1
+    return written
+
+
+def _run(image_id):
+    try:
+        generate_derivatives(image_id)
+    except Exception:
+        logger.exception("Could not generate derivatives for product image %s", image_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(image_id):
+    """
+    Generate derivatives in the background once the current transaction commits.
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.STORE_IMAGE_WORKERS, thread_name_prefix="derivatives")
+    transaction.on_commit(lambda: _executor.submit(_run, image_id))
+
+
+def srcset(derivatives, image_format):
+    return ", ".join(f"{d.file.url} {d.width}w" for d in derivatives if d.format == image_format)
@@ -0,0 +1,222 @@
+"""
+Streaming bulk import of the product catalog.
+
+Rows are read lazily from CSV or JSON Lines and upserted in fixed-size
+chunks, each in its own transaction, using bulk_create/bulk_update. Memory
+use depends on the chunk size, not on the size of the feed.
+
+A row describes one product, keyed by its slug:
+
+    slug, title, description, category, product_type,
+    regular_price, discount_price, is_active, images, specifications
+
+``category`` is a "/"-separated path of category names, each matched by
+name under its parent and created on demand.
+In CSV, ``images`` is a "|"-separated list of media paths (the first one is
+the feature image) and each specification is a ``spec:<name>`` column; in
+JSON Lines they are a list and an object.
+"""
+
+import csv
+import json
+from decimal import Decimal
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core.cache import bump_generation_on_commit
+
+from . import facets, page_cache, search
+from .category_tree import CATEGORY_TREE_NAMESPACE
+from .models import Category, Product, ProductImage, ProductSpecification, ProductSpecificationValue, ProductType
+
+PRODUCT_FIELDS = ["product_type", "category", "title", "description", "regular_price", "discount_price", "is_active"]
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+
+
+def read_csv(handle):
+    for row in csv.DictReader(handle):
+        images = row.pop("images", "") or ""
+        specifications = {}
+        for key in list(row):
+            if key.startswith("spec:"):
+                value = row.pop(key)
+                if value:
+                    specifications[key[5:]] = value
+        row["images"] = [path for path in images.split("|") if path]
+        row["specifications"] = specifications
+        yield row
+
+
+def read_jsonl(handle):
+    for line in handle:
+        if line.strip():
+            yield json.loads(line)
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _is_active(value):
+    if isinstance(value, bool):
+        return value
+    return value is None or str(value).strip().lower() in _TRUE
+
+
+class CatalogImporter:
+    """
+    Upserts catalog rows chunk by chunk.
+
+    Category, product type and specification ids are remembered across
+    chunks, so each is looked up or created once per import.
+    """
+
+    def __init__(self):
+        self.categories = {}
+        self.product_types = {}
+        self.specifications = {}
+
+    def run(self, rows, chunk_size=1000, progress=None):
+        """
+        Import every row and return the number imported.
+
+        :param progress: Optional callable receiving the running row count
+        """
+        imported = 0
+        with Category.objects.delay_mptt_updates():
+            for chunk in chunked(rows, chunk_size):
+                with transaction.atomic():
+                    self.import_chunk(chunk)
+                imported += len(chunk)
+                if progress:
+                    progress(imported)
+        with transaction.atomic():
+            facets.rebuild()
+            bump_generation_on_commit(CATEGORY_TREE_NAMESPACE)
+        return imported
+
+    def category_id(self, path):
+        category_id = self.categories.get(path)
+        if category_id is None:
+            parent_path, _, name = path.rpartition("/")
+            parent_id = self.category_id(parent_path) if parent_path else None
+            category = Category.objects.filter(parent_id=parent_id, name=name).first()
+            if category is None:
+                category = Category.objects.create(name=name, slug=self.category_slug(path), parent_id=parent_id)
+            category_id = self.categories[path] = category.id
+        return category_id
+
+    @staticmethod
+    def category_slug(path):
+        """
+        Return an unused slug for a new category: its name's if free,
+        otherwise one derived from its whole path, numbered if need be.
+        """
+        candidates = [slugify(path.rpartition("/")[2]), slugify(path.replace("/", " "))]
+        taken = set(Category.objects.filter(slug__startswith=candidates[0]).values_list("slug", flat=True))
+        taken.update(Category.objects.filter(slug__startswith=candidates[1]).values_list("slug", flat=True))
+        for slug in candidates:
+            if slug not in taken:
+                return slug
+        number = 2
+        while f"{candidates[1]}-{number}" in taken:
+            number += 1
+        return f"{candidates[1]}-{number}"
+
+    def product_type_id(self, name):
+        if name not in self.product_types:
+            self.product_types[name] = ProductType.objects.get_or_create(name=name)[0].id
+        return self.product_types[name]
+
+    def specification_id(self, product_type_id, name):
+        key = (product_type_id, name)
+        if key not in self.specifications:
+            self.specifications[key] = ProductSpecification.objects.get_or_create(
+                product_type_id=product_type_id, name=name
+            )[0].id
+        return self.specifications[key]
+
+    def import_chunk(self, rows):
+        rows = list({row["slug"]: row for row in rows}.values())
+        existing = {}
+        for slug, product_id in Product.objects.filter(slug__in=[row["slug"] for row in rows]).values_list(
+            "slug", "id"
+        ):
+            existing.setdefault(slug, product_id)
+
+        now = timezone.now()
+        created, updated = [], []
+        for row in rows:
+            regular_price = Decimal(str(row["regular_price"]))
+            product = Product(
+                id=existing.get(row["slug"]),
+                slug=row["slug"],
+                title=row["title"],
+                description=row.get("description") or "",
+                category_id=self.category_id(row["category"]),
+                product_type_id=self.product_type_id(row["product_type"]),
+                regular_price=regular_price,
+                discount_price=Decimal(str(row.get("discount_price") or regular_price)),
+                is_active=_is_active(row.get("is_active")),
+                updated_at=now,
+            )
+            (updated if product.id else created).append(product)
+
+        Product.objects.bulk_create(created)
+        Product.objects.bulk_update(updated, PRODUCT_FIELDS + ["updated_at"])
+        products = {product.slug: product for product in created + updated}
+
+        self.import_images(rows, products)
+        self.import_specifications(rows, products)
+
+        product_ids = [product.id for product in products.values()]
+        Product.objects.filter(pk__in=product_ids).refresh_feature_images()
+        search.index_products(product_ids)
+        page_cache.invalidate_on_commit(*products)
+
+    def import_images(self, rows, products):
+        existing = {}
+        for image in ProductImage.objects.filter(product_id__in=[p.id for p in products.values()]):
+            existing[(image.product_id, image.image.name)] = image
+
+        created, updated = [], []
+        for row in rows:
+            product_id = products[row["slug"]].id
+            for position, path in enumerate(row.get("images") or []):
+                is_feature = position == 0
+                image = existing.get((product_id, path))
+                if image is None:
+                    created.append(ProductImage(product_id=product_id, image=path, is_feature=is_feature))
+                elif image.is_feature != is_feature:
+                    image.is_feature = is_feature
+                    image.updated_at = timezone.now()
+                    updated.append(image)
+        ProductImage.objects.bulk_create(created)
+        ProductImage.objects.bulk_update(updated, ["is_feature", "updated_at"])
+
+    def import_specifications(self, rows, products):
+        existing = {}
+        for value in ProductSpecificationValue.objects.filter(product_id__in=[p.id for p in products.values()]):
+            existing[(value.product_id, value.specification_id)] = value
+
+        created, updated = [], []
+        for row in rows:
+            product = products[row["slug"]]
+            for name, text in (row.get("specifications") or {}).items():
+                specification_id = self.specification_id(product.product_type_id, name)
+                value = existing.get((product.id, specification_id))
+                if value is None:
+                    created.append(
+                        ProductSpecificationValue(product_id=product.id, specification_id=specification_id, value=text)
+                    )
+                elif value.value != text:
+                    value.value = text
+                    updated.append(value)
+        ProductSpecificationValue.objects.bulk_create(created)
+        ProductSpecificationValue.objects.bulk_update(updated, ["value"])
@@ -0,0 +1,57 @@
+from . import facets
+from .category_tree import get_category_tree
+from .models import Product
+
+
+def active_products():
+    """
+    Active products with their feature image, in catalog order.
+    """
+    return Product.objects.with_feature_image().filter(is_active=True)
+
+
+def popular_products(limit):
+    """
+    The most popular active products, read in score order from the
+    popularity index (see store.popularity) without touching the orders.
+
+    :param limit: Number of products to return
+    """
+    return active_products().filter(popularity__score__gt=0).order_by("-popularity__score", "id")[:limit]
+
+
+def category_products(category):
+    """
+    Active products filed under a category or any of its descendants.
+
+    The descendant set comes from the cached category tree, so the listing
+    is a single product query however deep the tree is.
+
+    :param category: CategoryNode (or Category) to list
+    """
+    return active_products().filter(category_id__in=get_category_tree().descendant_ids(category))
+
+
+def faceted_category_products(category, query_dict):
+    """
+    Category products narrowed by the facets selected in the query string.
+
+    The match and the facet counts are cached per selection (see
+    store.facets.category_facets), so a repeated page costs no more than
+    an unfiltered one.
+
+    :param category: CategoryNode (or Category) to list
+    :param query_dict: request.GET
+    :return: (products queryset, facet groups for the template)
+    """
+    products = category_products(category)
+    index = facets.get_facet_index()
+    if not index.postings:
+        return products, []
+
+    result_ids, counts = facets.category_facets(
+        index, get_category_tree().generation, category, products, index.selection(query_dict)
+    )
+    if result_ids is not None:
+        products = facets.filter_ids(products, result_ids)
+    return products, facets.facet_groups(counts, query_dict)
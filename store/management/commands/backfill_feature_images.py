@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute Product.feature_image from the images flagged as feature."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Products updated per statement")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(Product.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            updated += Product.objects.filter(pk__in=ids).refresh_feature_images()
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"Refreshed feature images for {updated} products"))
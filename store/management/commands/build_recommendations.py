@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Count the orders paid since the last run into the \"customers also bought\" recommendations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Orders read per query")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(counted):
+            self.stdout.write(f"{counted} orders counted")
+
+        counted = build_recommendations(chunk_size=options["chunk_size"], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Counted {counted} orders in {elapsed:.1f}s"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import feeds
+
+
+class Command(BaseCommand):
+    help = "Write the partner product feed as CSV, JSON Lines or XML."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(feeds.WRITERS), default="csv", help="Feed format")
+        parser.add_argument("--output", default="-", help='Output file, or "-" for standard output')
+        parser.add_argument("--since", help="Only products updated after this ISO date or datetime")
+        parser.add_argument("--base-url", default="", help="Prefix for product and image links")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched from the database at a time")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = feeds.parse_since(options["since"])
+            if since is None:
+                raise CommandError("--since must be an ISO date or datetime")
+
+        chunks = feeds.stream_feed(
+            options["format"],
+            since=since,
+            base_url=options["base_url"].rstrip("/"),
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        with open(options["output"], "w", newline="", encoding="utf-8") as handle:
+            handle.writelines(chunks)
@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from store.imaging import generate_derivatives
+from store.models import ProductImage
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def _generate(image_ids, force):
+    written = 0
+    for image_id in image_ids:
+        written += generate_derivatives(image_id, force=force)
+    connections.close_all()
+    return len(image_ids), written
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG copies of product images in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPUs)")
+        parser.add_argument("--chunk-size", type=int, default=50, help="Images handed to a worker at a time")
+        parser.add_argument("--force", action="store_true", help="Regenerate derivatives that already exist")
+
+    def handle(self, *args, **options):
+        image_ids = list(ProductImage.objects.order_by("pk").values_list("pk", flat=True))
+        chunk_size = options["chunk_size"]
+        chunks = [image_ids[i: i + chunk_size] for i in range(0, len(image_ids), chunk_size)]
+
+        # Worker processes must open their own database connections.
+        connections.close_all()
+        images = written = 0
+        with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as executor:
+            futures = [executor.submit(_generate, chunk, options["force"]) for chunk in chunks]
+            for future in as_completed(futures):
+                done, files = future.result()
+                images += done
+                written += files
+                self.stdout.write(f"{images}/{len(image_ids)} images processed")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} derivative files for {images} images"))
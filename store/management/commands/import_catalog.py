@@ -0,0 +1,40 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import CatalogImporter, read_csv, read_jsonl
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl}
+
+
+class Command(BaseCommand):
+    help = "Stream products, images and specifications from a CSV or JSON Lines feed into the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help='Feed file, or "-" for standard input')
+        parser.add_argument("--format", choices=sorted(READERS), help="Feed format (default: from the file extension)")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Rows upserted per transaction")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        feed_format = options["format"] or path.rpartition(".")[2].lower()
+        if feed_format not in READERS:
+            raise CommandError("Cannot tell the feed format, pass --format csv or --format jsonl")
+
+        started = time.monotonic()
+
+        def progress(imported):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"{imported} rows imported ({imported / elapsed:.0f} rows/sec)")
+
+        handle = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            rows = READERS[feed_format](handle)
+            imported = CatalogImporter().run(rows, chunk_size=options["chunk_size"], progress=progress)
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} rows in {elapsed:.1f}s"))
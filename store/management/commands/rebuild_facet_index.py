@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store import facets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the facet posting lists from product specification values."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Posting lists written per insert")
+
+    def handle(self, *args, **options):
+        written = facets.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} facet posting lists"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Product ids indexed per statement")
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search requires the SQLite FTS5 extension")
+        indexed = search.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products"))
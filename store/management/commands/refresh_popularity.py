@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = "Add the orders paid since the last run to the product popularity scores."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Orders read per transaction")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(counted):
+            self.stdout.write(f"{counted} orders counted")
+
+        counted = refresh_popularity(batch_size=options["batch_size"], progress=progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Counted {counted} orders in {elapsed:.1f}s"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store.stock import release_expired, restock_unpaid
+
+
+class Command(BaseCommand):
+    help = "Return the stock of expired basket reservations and of orders left unpaid."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Reservations released per transaction")
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options["batch_size"])
+        restocked = restock_unpaid()
+        self.stdout.write(
+            self.style.SUCCESS(f"Released {released} expired reservations and restocked {restocked} unpaid orders")
+        )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="product",
+            options={
+                "ordering": ("-created_at", "-id"),
+                "verbose_name": "Product",
+                "verbose_name_plural": "Products",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["is_active", "-created_at", "-id"],
+                name="store_product_active_listing",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_product_listing_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["category", "is_active", "-created_at", "-id"],
+                name="store_product_category_listing",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_product_category_listing_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="feature_image",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                help_text="Maintained from the product images flagged as feature",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="store.productimage",
+                verbose_name="Feature image",
+            ),
+        ),
+    ]
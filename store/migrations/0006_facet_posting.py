@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_product_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FacetPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=255, verbose_name="value")),
+                (
+                    "product_ids",
+                    models.BinaryField(default=bytes, verbose_name="product ids"),
+                ),
+                (
+                    "specification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facet_postings",
+                        to="store.productspecification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Facet Posting",
+                "verbose_name_plural": "Facet Postings",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("specification", "value"),
+                        name="store_facet_posting_unique",
+                    )
+                ],
+            },
+        ),
+    ]
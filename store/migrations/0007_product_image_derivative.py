@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-18 04:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_facet_posting"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductImageDerivative",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "source",
+                    models.CharField(
+                        help_text="Image file it was generated from",
+                        max_length=255,
+                        verbose_name="source",
+                    ),
+                ),
+                (
+                    "format",
+                    models.CharField(
+                        choices=[("webp", "WebP"), ("jpeg", "JPEG")],
+                        max_length=4,
+                        verbose_name="format",
+                    ),
+                ),
+                (
+                    "file",
+                    models.ImageField(
+                        max_length=255,
+                        upload_to="images/derivatives/",
+                        verbose_name="file",
+                    ),
+                ),
+                ("width", models.PositiveIntegerField(verbose_name="width")),
+                ("height", models.PositiveIntegerField(verbose_name="height")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "image",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="derivatives",
+                        to="store.productimage",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Image Derivative",
+                "verbose_name_plural": "Product Image Derivatives",
+                "ordering": ("format", "width"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("image", "format", "width"),
+                        name="store_image_derivative_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_product_image_derivative"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PopularityState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("landmark", models.DateTimeField(verbose_name="landmark")),
+                (
+                    "last_item_id",
+                    models.BigIntegerField(default=0, verbose_name="last order item"),
+                ),
+            ],
+            options={
+                "verbose_name": "Popularity State",
+                "verbose_name_plural": "Popularity State",
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductPopularity",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="store.product",
+                    ),
+                ),
+                ("score", models.FloatField(default=0, verbose_name="score")),
+            ],
+            options={
+                "verbose_name": "Product Popularity",
+                "verbose_name_plural": "Product Popularity",
+                "indexes": [models.Index(fields=["-score"], name="store_popularity_score")],
+            },
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_product_popularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecommendationState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_order_id",
+                    models.BigIntegerField(default=0, verbose_name="last order"),
+                ),
+            ],
+            options={
+                "verbose_name": "Recommendation State",
+                "verbose_name_plural": "Recommendation State",
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductCooccurrence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "count",
+                    models.PositiveIntegerField(default=0, verbose_name="orders"),
+                ),
+                (
+                    "other",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="store.product",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="store.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Cooccurrence",
+                "verbose_name_plural": "Product Cooccurrences",
+                "constraints": [models.UniqueConstraint(fields=("product", "other"), name="store_cooccurrence_unique")],
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductRecommendation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.PositiveIntegerField(verbose_name="score")),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommendations",
+                        to="store.product",
+                    ),
+                ),
+                (
+                    "recommended",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recommended_for",
+                        to="store.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Product Recommendation",
+                "verbose_name_plural": "Product Recommendations",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "recommended"),
+                        name="store_recommendation_unique",
+                    )
+                ],
+            },
+        ),
+    ]
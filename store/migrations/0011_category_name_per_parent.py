@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0010_product_stock"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="category",
+            name="name",
+            field=models.CharField(
+                help_text="Required and unique among its siblings",
+                max_length=255,
+                verbose_name="Category Name",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="category",
+            constraint=models.UniqueConstraint(fields=("parent", "name"), name="store_category_unique_name"),
+        ),
+        migrations.AddConstraint(
+            model_name="category",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("parent__isnull", True)),
+                fields=("name",),
+                name="store_category_unique_root_name",
+            ),
+        ),
+    ]
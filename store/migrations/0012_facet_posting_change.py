@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0011_category_name_per_parent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FacetPostingChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=255, verbose_name="value")),
+                ("product_id", models.BigIntegerField(verbose_name="product id")),
+                ("added", models.BooleanField(verbose_name="added")),
+                (
+                    "specification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="facet_changes",
+                        to="store.productspecification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Facet Posting Change",
+                "verbose_name_plural": "Facet Posting Changes",
+            },
+        ),
+    ]
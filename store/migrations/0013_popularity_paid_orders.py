@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reset_popularity(apps, schema_editor):
+    # The scores so far also counted unpaid orders: recount from scratch.
+    apps.get_model("store", "ProductPopularity").objects.all().delete()
+    apps.get_model("store", "PopularityState").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0004_order_updated_index"),
+        ("store", "0012_facet_posting_change"),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_popularity, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="popularitystate",
+            name="last_item_id",
+        ),
+        migrations.AddField(
+            model_name="popularitystate",
+            name="watermark",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="watermark"),
+        ),
+        migrations.CreateModel(
+            name="CountedOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("counter", models.CharField(max_length=20, verbose_name="counter")),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="orders.order",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Counted Order",
+                "verbose_name_plural": "Counted Orders",
+                "constraints": [
+                    models.UniqueConstraint(fields=("counter", "order"), name="store_counted_order_unique")
+                ],
+            },
+        ),
+    ]
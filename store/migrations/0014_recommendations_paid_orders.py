@@ -0,0 +1,30 @@
+# Generated by Django 5.2.1 on 2026-10-18 05:40
+
+from django.db import migrations, models
+
+
+def reset_recommendations(apps, schema_editor):
+    # The matrix so far also counted unpaid orders: recount from scratch.
+    apps.get_model("store", "ProductRecommendation").objects.all().delete()
+    apps.get_model("store", "ProductCooccurrence").objects.all().delete()
+    apps.get_model("store", "RecommendationState").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0013_popularity_paid_orders"),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_recommendations, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="recommendationstate",
+            name="last_order_id",
+        ),
+        migrations.AddField(
+            model_name="recommendationstate",
+            name="watermark",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="watermark"),
+        ),
+    ]
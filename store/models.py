@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce, Now
+from django.db.models.lookups import Exact
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 from mptt.models import MPTTModel, TreeForeignKey
@@ -11,9 +14,8 @@ class Category(MPTTModel):
 
     name = models.CharField(
         verbose_name=_("Category Name"),
-        help_text=_("Required and unique"),
+        help_text=_("Required and unique among its siblings"),
         max_length=255,
-        unique=True,
     )
     slug = models.SlugField(verbose_name=_("Category safe URL"), max_length=255, unique=True)
     parent = TreeForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="children")
@@ -25,6 +27,12 @@ class Category(MPTTModel):
     class Meta:
         verbose_name = _("Category")
         verbose_name_plural = _("Categories")
+        constraints = [
+            models.UniqueConstraint(fields=["parent", "name"], name="store_category_unique_name"),
+            models.UniqueConstraint(
+                fields=["name"], condition=models.Q(parent__isnull=True), name="store_category_unique_root_name"
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("store:category_list", args=[self.slug])
@@ -67,6 +75,29 @@ class ProductSpecification(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_feature_image(self):
+        """
+        Join each product's feature image so listings fetch one image per
+        product, and prefetch that image's resized copies.
+        """
+        return self.select_related("feature_image").prefetch_related("feature_image__derivatives")
+
+    def refresh_feature_images(self):
+        """
+        Point feature_image at each product's first image flagged is_feature.
+        Products whose feature image changes get a new ``updated_at``, so
+        incremental feeds export them again.
+        """
+        feature = ProductImage.objects.filter(product=models.OuterRef("pk"), is_feature=True).order_by("id")
+        feature_id = models.Subquery(feature.values("id")[:1])
+        unchanged = Exact(Coalesce("feature_image", 0), Coalesce(feature_id, 0))
+        return self.update(
+            feature_image=feature_id,
+            updated_at=models.Case(models.When(unchanged, then=models.F("updated_at")), default=Now()),
+        )
+
+
 class Product(models.Model):
     """
     The Product table contining all product items.
@@ -108,11 +139,33 @@ class Product(models.Model):
         help_text=_("Change product visibility"),
         default=True,
     )
+    stock = models.PositiveIntegerField(
+        verbose_name=_("Stock"),
+        help_text=_("Units free to order; leave empty to not track stock"),
+        null=True,
+        blank=True,
+    )
+    feature_image = models.ForeignKey(
+        "ProductImage",
+        verbose_name=_("Feature image"),
+        help_text=_("Maintained from the product images flagged as feature"),
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     created_at = models.DateTimeField(_("Created at"), auto_now_add=True, editable=False)
     updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
-        ordering = ("-created_at",)
+        ordering = ("-created_at", "-id")
+        indexes = [
+            models.Index(fields=["is_active", "-created_at", "-id"], name="store_product_active_listing"),
+            models.Index(fields=["category", "is_active", "-created_at", "-id"], name="store_product_category_listing"),
+        ]
         verbose_name = _("Product")
         verbose_name_plural = _("Products")
 
@@ -170,4 +223,223 @@ class ProductImage(models.Model):
 
     class Meta:
         verbose_name = _("Product Image")
-        verbose_name_plural = _("Product Images") 
\ No newline at end of file
+        verbose_name_plural = _("Product Images")
+
+
+class FacetPosting(models.Model):
+    """
+    The Facet Posting table holds, for each specification value, the
+    sorted ids of the products carrying it, packed as 64-bit integers.
+    """
+
+    specification = models.ForeignKey(ProductSpecification, on_delete=models.CASCADE, related_name="facet_postings")
+    value = models.CharField(verbose_name=_("value"), max_length=255)
+    product_ids = models.BinaryField(verbose_name=_("product ids"), default=bytes)
+
+    class Meta:
+        verbose_name = _("Facet Posting")
+        verbose_name_plural = _("Facet Postings")
+        constraints = [
+            models.UniqueConstraint(fields=["specification", "value"], name="store_facet_posting_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.specification} = {self.value}"
+
+
+class FacetPostingChange(models.Model):
+    """
+    The Facet Posting Change table logs additions of products to and
+    removals from posting lists until they are folded into FacetPosting.
+    """
+
+    specification = models.ForeignKey(ProductSpecification, on_delete=models.CASCADE, related_name="facet_changes")
+    value = models.CharField(verbose_name=_("value"), max_length=255)
+    # Not a foreign key: the removal of a deleted product must outlive it.
+    product_id = models.BigIntegerField(verbose_name=_("product id"))
+    added = models.BooleanField(verbose_name=_("added"))
+
+    class Meta:
+        verbose_name = _("Facet Posting Change")
+        verbose_name_plural = _("Facet Posting Changes")
+
+    def __str__(self):
+        return f"{'+' if self.added else '-'}{self.product_id} {self.specification} = {self.value}"
+
+
+class ProductImageDerivative(models.Model):
+    """
+    The Product Image Derivative table holds the resized copies
+    generated for each product image.
+    """
+
+    WEBP = "webp"
+    JPEG = "jpeg"
+    FORMAT_CHOICES = [
+        (WEBP, "WebP"),
+        (JPEG, "JPEG"),
+    ]
+
+    image = models.ForeignKey(ProductImage, on_delete=models.CASCADE, related_name="derivatives")
+    source = models.CharField(verbose_name=_("source"), help_text=_("Image file it was generated from"), max_length=255)
+    format = models.CharField(verbose_name=_("format"), max_length=4, choices=FORMAT_CHOICES)
+    file = models.ImageField(
+        verbose_name=_("file"),
+        upload_to="images/derivatives/",
+        max_length=255,
+    )
+    width = models.PositiveIntegerField(verbose_name=_("width"))
+    height = models.PositiveIntegerField(verbose_name=_("height"))
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    class Meta:
+        ordering = ("format", "width")
+        verbose_name = _("Product Image Derivative")
+        verbose_name_plural = _("Product Image Derivatives")
+        constraints = [
+            models.UniqueConstraint(fields=["image", "format", "width"], name="store_image_derivative_unique"),
+        ]
+
+    def __str__(self):
+        return self.file.name
+
+
+class ProductPopularity(models.Model):
+    """
+    The Product Popularity table holds each product's time-decayed sales
+    score, maintained by the refresh_popularity command (see store.popularity).
+    Scores are relative to a landmark time and only meaningful for ranking.
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="popularity")
+    score = models.FloatField(verbose_name=_("score"), default=0)
+
+    class Meta:
+        verbose_name = _("Product Popularity")
+        verbose_name_plural = _("Product Popularity")
+        indexes = [models.Index(fields=["-score"], name="store_popularity_score")]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.score:g}"
+
+
+class PopularityState(models.Model):
+    """
+    The Popularity State table holds the single row recording the landmark
+    time of the popularity scores and the latest change of a paid order
+    counted in them.
+    """
+
+    landmark = models.DateTimeField(verbose_name=_("landmark"))
+    watermark = models.DateTimeField(verbose_name=_("watermark"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Popularity State")
+        verbose_name_plural = _("Popularity State")
+
+    def __str__(self):
+        return f"{self.landmark} / {self.watermark}"
+
+
+class CountedOrder(models.Model):
+    """
+    The Counted Order table marks the paid orders already counted by each
+    of the order-driven indexes (see store.paid_orders).
+    """
+
+    POPULARITY = "popularity"
+    RECOMMENDATIONS = "recommendations"
+
+    order = models.ForeignKey("orders.Order", on_delete=models.CASCADE, related_name="+")
+    counter = models.CharField(verbose_name=_("counter"), max_length=20)
+
+    class Meta:
+        verbose_name = _("Counted Order")
+        verbose_name_plural = _("Counted Orders")
+        constraints = [
+            models.UniqueConstraint(fields=["counter", "order"], name="store_counted_order_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.counter}: {self.order_id}"
+
+
+class ProductCooccurrence(models.Model):
+    """
+    The Product Cooccurrence table holds the sparse co-purchase matrix:
+    the number of orders containing both products, stored in both directions.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(verbose_name=_("orders"), default=0)
+
+    class Meta:
+        verbose_name = _("Product Cooccurrence")
+        verbose_name_plural = _("Product Cooccurrences")
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="store_cooccurrence_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} & {self.other_id}: {self.count}"
+
+
+class ProductRecommendation(models.Model):
+    """
+    The Product Recommendation table holds the top neighbours of each
+    product in the co-purchase matrix ("customers also bought").
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommendations")
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommended_for")
+    score = models.PositiveIntegerField(verbose_name=_("score"))
+
+    class Meta:
+        verbose_name = _("Product Recommendation")
+        verbose_name_plural = _("Product Recommendations")
+        constraints = [
+            models.UniqueConstraint(fields=["product", "recommended"], name="store_recommendation_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.recommended_id}"
+
+
+class RecommendationState(models.Model):
+    """
+    The Recommendation State table holds the single row recording the
+    latest change of a paid order counted in the co-purchase matrix.
+    """
+
+    watermark = models.DateTimeField(verbose_name=_("watermark"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Recommendation State")
+        verbose_name_plural = _("Recommendation State")
+
+    def __str__(self):
+        return str(self.watermark)
+
+
+class StockReservation(models.Model):
+    """
+    The Stock Reservation table holds the units of a product held for a
+    user's basket until ``expires_at`` (see store.stock). Held units have
+    already been taken out of Product.stock.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    qty = models.PositiveIntegerField(verbose_name=_("quantity"))
+    expires_at = models.DateTimeField(verbose_name=_("expires at"), db_index=True)
+
+    class Meta:
+        verbose_name = _("Stock Reservation")
+        verbose_name_plural = _("Stock Reservations")
+        constraints = [
+            models.UniqueConstraint(fields=["user", "product"], name="store_reservation_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.qty} x {self.product_id} for {self.user_id}"
@@ -0,0 +1,130 @@
+"""
+Conditional GET and full-page caching for product pages.
+
+A product's version is derived from its own and its images' ``updated_at``
+and cached by slug until the product or one of its images is saved. The
+ETag of a rendered page combines that version with everything else the
+page shows per visitor (user, basket size, category navigation) and the
+current recommendations, so an unchanged page can be answered with 304, or
+for anonymous visitors from a cached copy, without touching templates or
+the ORM.
+"""
+
+import hashlib
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse
+
+from basket.basket import get_basket
+from core.cache import get_generation
+
+from .category_tree import CATEGORY_TREE_NAMESPACE
+from .models import Product
+from .recommendations import RECOMMENDATIONS_NAMESPACE
+
+VERSION_TIMEOUT = 60 * 60 * 24
+
+
+class ProductVersion(NamedTuple):
+    product_id: int
+    tag: str
+    last_modified: float
+
+
+def _version_key(slug):
+    return f"store:product_version:{slug}"
+
+
+def _page_key(slug, etag):
+    return f"store:product_page:{slug}:{etag}"
+
+
+def _version_query(slug):
+    return (
+        Product.objects.filter(slug=slug, is_active=True)
+        .annotate(images_updated_at=Max("product_image__updated_at"), images=Count("product_image"))
+        .values_list("id", "updated_at", "images_updated_at", "images")
+    )
+
+
+def _store_version(slug, row):
+    product_id, updated_at, images_updated_at, images = row
+    last_modified = max(updated_at, images_updated_at or updated_at)
+    tag = hashlib.sha1(f"{product_id}:{updated_at.isoformat()}:{last_modified.isoformat()}:{images}".encode())
+    version = ProductVersion(product_id, tag.hexdigest()[:20], last_modified.timestamp())
+    cache.set(_version_key(slug), tuple(version), VERSION_TIMEOUT)
+    return version
+
+
+def product_version(slug):
+    """
+    Return the ProductVersion of the active product with this slug, or None.
+    """
+    version = cache.get(_version_key(slug))
+    if version is not None:
+        return ProductVersion(*version)
+    row = _version_query(slug).first()
+    return None if row is None else _store_version(slug, row)
+
+
+async def aproduct_version(slug):
+    """
+    Async version of product_version().
+    """
+    version = cache.get(_version_key(slug))
+    if version is not None:
+        return ProductVersion(*version)
+    row = await _version_query(slug).afirst()
+    return None if row is None else _store_version(slug, row)
+
+
+def invalidate(*slugs):
+    cache.delete_many([_version_key(slug) for slug in slugs if slug])
+
+
+def invalidate_on_commit(*slugs):
+    """
+    Invalidate now and again once the current transaction commits, so a
+    version cached from the pre-commit rows in the meantime is not kept.
+    """
+    invalidate(*slugs)
+    transaction.on_commit(lambda: invalidate(*slugs))
+
+
+def page_etag(request, version):
+    """
+    Build the strong ETag of a product page as seen by this visitor.
+    """
+    variant = ":".join(
+        str(part)
+        for part in (
+            version.tag,
+            request.user.pk or 0,
+            len(get_basket(request)),
+            get_generation(CATEGORY_TREE_NAMESPACE),
+            get_generation(RECOMMENDATIONS_NAMESPACE),
+        )
+    )
+    return '"%s"' % hashlib.sha1(variant.encode()).hexdigest()
+
+
+def _enabled(request):
+    return settings.STORE_PRODUCT_PAGE_CACHE_TIMEOUT and not request.user.is_authenticated
+
+
+def get_cached_page(request, slug, etag):
+    if not _enabled(request):
+        return None
+    content = cache.get(_page_key(slug, etag))
+    if content is None:
+        return None
+    return HttpResponse(content)
+
+
+def set_cached_page(request, slug, etag, response):
+    if _enabled(request) and response.status_code == 200:
+        cache.set(_page_key(slug, etag), response.content, settings.STORE_PRODUCT_PAGE_CACHE_TIMEOUT)
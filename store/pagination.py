@@ -0,0 +1,141 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """
+    Raised when a cursor cannot be decoded or does not match the ordering.
+    """
+
+
+class KeysetPage:
+    """
+    A single page of results produced by KeysetPaginator.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], "next")
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], "prev")
+
+
+class KeysetPaginator:
+    """
+    Cursor (keyset) pagination over a queryset.
+
+    Unlike offset pagination the cost of fetching a page does not depend on
+    how deep into the result set it is: each page is a range scan starting
+    at the row the cursor points to. The ordering must be unique, so it
+    should always end with the primary key.
+
+    :param queryset: QuerySet to paginate
+    :param per_page: Number of rows per page
+    :param ordering: Field names, prefixed with "-" for descending order
+    """
+
+    def __init__(self, queryset, per_page, ordering=("-created_at", "-id")):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    def get_page(self, cursor=None):
+        """
+        Return the page following (or preceding) the given cursor.
+
+        :param cursor: Opaque cursor string, or None for the first page
+        :return: KeysetPage
+        """
+        queryset, direction = self._page_query(cursor)
+        return self._make_page(list(queryset), direction)
+
+    async def aget_page(self, cursor=None):
+        """
+        Async version of get_page().
+        """
+        queryset, direction = self._page_query(cursor)
+        return self._make_page([obj async for obj in queryset], direction)
+
+    def _page_query(self, cursor):
+        if not cursor:
+            return self.queryset.order_by(*self.ordering)[: self.per_page + 1], None
+
+        direction, values = self.decode_cursor(cursor)
+        ordering = self.ordering
+        if direction == "prev":
+            ordering = tuple(self._reverse(name) for name in self.ordering)
+        queryset = self.queryset.filter(self._seek(values, ordering))
+        return queryset.order_by(*ordering)[: self.per_page + 1], direction
+
+    def _make_page(self, rows, direction):
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction == "prev":
+            rows.reverse()
+            return KeysetPage(rows, self, True, more)
+        return KeysetPage(rows, self, more, direction == "next")
+
+    def encode_cursor(self, obj, direction):
+        values = [self._field(name).value_to_string(obj) for name in self.fields]
+        payload = json.dumps([direction, values], separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+        if direction not in ("next", "prev") or len(values) != len(self.fields):
+            raise InvalidCursor("Invalid cursor")
+        try:
+            return direction, [self._field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except ValidationError:
+            raise InvalidCursor("Invalid cursor")
+
+    def _field(self, name):
+        if name == "pk":
+            return self.queryset.model._meta.pk
+        return self.queryset.model._meta.get_field(name)
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith("-") else "-" + name
+
+    def _seek(self, values, ordering):
+        """
+        Build the row-value comparison ``(a, b, c) > (x, y, z)`` as a
+        chain of OR-ed prefix equalities, honouring each field's direction.
+        """
+        condition = Q()
+        for position, name in enumerate(ordering):
+            lookup = "lt" if name.startswith("-") else "gt"
+            term = Q(**{f"{name.lstrip('-')}__{lookup}": values[position]})
+            for prefix, value in zip(ordering[:position], values):
+                term &= Q(**{prefix.lstrip("-"): value})
+            condition |= term
+        return condition
@@ -0,0 +1,45 @@
+"""
+Paid orders still to be counted by one of the order-driven indexes
+(popularity scores, recommendations).
+
+An order only counts once it is paid, which can be long after it was
+placed, so each index keeps as its watermark the largest ``Order.updated``
+it has counted. Rows written by transactions that committed late can carry
+an older timestamp, so every read re-covers a window of WATERMARK_OVERLAP
+before it; the CountedOrder markers make sure nothing in that window is
+counted twice.
+"""
+
+from datetime import timedelta
+
+from django.db.models import Exists, OuterRef
+
+from orders.models import Order
+
+from .models import CountedOrder
+
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+
+def pending_orders(counter, watermark):
+    """
+    Paid orders not counted by ``counter`` yet, changed at or after
+    ``watermark`` less the overlap, oldest change first.
+
+    :param counter: CountedOrder counter name
+    :param watermark: Latest ``updated`` counted, or None for all orders
+    """
+    orders = Order.objects.filter(billing_status=True).filter(
+        ~Exists(CountedOrder.objects.filter(counter=counter, order=OuterRef("pk")))
+    )
+    if watermark is not None:
+        orders = orders.filter(updated__gte=watermark - WATERMARK_OVERLAP)
+    return orders.order_by("updated", "id")
+
+
+def mark_counted(counter, order_ids):
+    """
+    Record orders as counted by ``counter``. Must run in the transaction
+    that counts them.
+    """
+    CountedOrder.objects.bulk_create(CountedOrder(counter=counter, order_id=order_id) for order_id in order_ids)
@@ -0,0 +1,115 @@
+"""
+Product popularity from order history, with forward exponential decay.
+
+Every unit of a paid order placed at time ``t`` adds ``2 ** ((t - landmark) / half_life)``
+to its product's score. Weighting by age relative to a fixed landmark
+instead of relative to now means a contribution never has to be rewritten
+as it ages: the scores differ from the usual decayed sums
+``2 ** -((now - t) / half_life)`` by the same factor for every product, so
+they rank products identically. Each refresh therefore only adds the
+orders paid since the previous one (see store.paid_orders).
+
+The weights double every half-life, so once the landmark is far enough in
+the past it is moved up to now and every score is scaled down with a
+single UPDATE.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from orders.models import OrderItem
+
+from .models import CountedOrder, PopularityState, ProductPopularity
+from .paid_orders import mark_counted, pending_orders
+
+# Half-lives after which the landmark is moved forward.
+REBASE_AFTER = 32
+# Scores below this after a rebase no longer rank anything and are dropped.
+MIN_SCORE = 1e-6
+
+
+def decay_weight(when, landmark, half_life):
+    """
+    Weight of one unit ordered at ``when``.
+
+    :param when: Time of the order
+    :param landmark: Landmark time of the scores
+    :param half_life: timedelta over which a unit's relative weight halves
+    """
+    return 2 ** ((when - landmark) / half_life)
+
+
+def refresh_popularity(batch_size=1000, now=None, progress=None):
+    """
+    Add the orders paid since the last refresh to the popularity scores.
+
+    :param batch_size: Orders read per transaction
+    :param now: Current time, for tests
+    :param progress: Called with the running number of orders after each batch
+    :return: Number of orders counted
+    """
+    now = now or timezone.now()
+    half_life = timedelta(days=settings.STORE_POPULARITY_HALF_LIFE_DAYS)
+    PopularityState.objects.get_or_create(pk=1, defaults={"landmark": now})
+    _rebase(now, half_life)
+
+    total = 0
+    while True:
+        count = _refresh_batch(half_life, batch_size)
+        total += count
+        if count and progress:
+            progress(total)
+        if count < batch_size:
+            return total
+
+
+@transaction.atomic
+def _refresh_batch(half_life, batch_size):
+    # Locking the state row serialises concurrent runs, so an order is never counted twice.
+    state = PopularityState.objects.select_for_update().get(pk=1)
+    orders = list(
+        pending_orders(CountedOrder.POPULARITY, state.watermark).values_list("id", "created", "updated")[:batch_size]
+    )
+    if not orders:
+        return 0
+    weights = {order_id: decay_weight(created, state.landmark, half_life) for order_id, created, updated in orders}
+
+    deltas = defaultdict(float)
+    for order_id, product_id, quantity in OrderItem.objects.filter(order_id__in=weights).values_list(
+        "order_id", "product_id", "quantity"
+    ):
+        deltas[product_id] += quantity * weights[order_id]
+    scores = dict(ProductPopularity.objects.filter(product_id__in=deltas).values_list("product_id", "score"))
+    ProductPopularity.objects.bulk_create(
+        [
+            ProductPopularity(product_id=product_id, score=scores.get(product_id, 0) + delta)
+            for product_id, delta in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["score"],
+    )
+
+    mark_counted(CountedOrder.POPULARITY, weights)
+
+    newest = orders[-1][2]
+    if state.watermark is None or newest > state.watermark:
+        state.watermark = newest
+        state.save(update_fields=["watermark"])
+    return len(orders)
+
+
+@transaction.atomic
+def _rebase(now, half_life):
+    state = PopularityState.objects.select_for_update().get(pk=1)
+    if now - state.landmark < REBASE_AFTER * half_life:
+        return
+    ProductPopularity.objects.update(score=F("score") / decay_weight(now, state.landmark, half_life))
+    ProductPopularity.objects.filter(score__lt=MIN_SCORE).delete()
+    state.landmark = now
+    state.save(update_fields=["landmark"])
@@ -0,0 +1,182 @@
+"""
+"Customers also bought" recommendations from order co-occurrence.
+
+``build_recommendations()`` streams the orders paid since its last run
+(see store.paid_orders) in chunks, counts every pair of products bought together, and
+folds the counts into the ProductCooccurrence matrix. For each product
+whose row of the matrix changed it then keeps the top
+STORE_RECOMMENDATION_NEIGHBOURS neighbours in ProductRecommendation, which
+pages read with one indexed lookup (see also_bought()).
+
+Memory stays bounded however many order lines there are: a chunk's lines
+are grouped per order in arrays, pairs are counted as packed 64-bit keys,
+and the pending counts are flushed to the database whenever they exceed
+FLUSH_PAIRS. Orders with more than MAX_ORDER_PRODUCTS distinct products
+(bulk purchases) are skipped, since they would add many pairs and say
+little about what goes together.
+"""
+
+import heapq
+from array import array
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from core.cache import bump_generation_on_commit
+from orders.models import OrderItem
+
+from .listing import active_products
+from .models import CountedOrder, ProductCooccurrence, ProductRecommendation, RecommendationState
+from .paid_orders import mark_counted, pending_orders
+
+RECOMMENDATIONS_NAMESPACE = "store:recommendations"
+
+MAX_ORDER_PRODUCTS = 50
+FLUSH_PAIRS = 200_000
+# Products whose matrix rows are merged and ranked together.
+PRODUCT_GROUP = 200
+
+
+def _pair_key(first, second):
+    return first << 32 | second
+
+
+def count_pairs(products_by_order, pairs):
+    """
+    Add the product pairs of each order to a Counter.
+
+    :param products_by_order: Iterable of the product ids of each order
+    :param pairs: Counter of packed ``(low id, high id)`` keys
+    """
+    for products in products_by_order:
+        products = sorted(set(products))
+        if 1 < len(products) <= MAX_ORDER_PRODUCTS:
+            pairs.update(_pair_key(first, second) for first, second in combinations(products, 2))
+
+
+def build_recommendations(chunk_size=1000, progress=None):
+    """
+    Count the orders paid since the last run into the recommendations.
+
+    :param chunk_size: Orders read per query
+    :param progress: Called with the running number of orders after each chunk
+    :return: Number of orders counted
+    """
+    state, _ = RecommendationState.objects.get_or_create(pk=1)
+    orders = pending_orders(CountedOrder.RECOMMENDATIONS, state.watermark)
+    pairs = Counter()
+    counted = array("q")
+    watermark = state.watermark
+    after = None
+    total = 0
+    while True:
+        page = orders
+        if after is not None:
+            # Orders read but not flushed yet have no marker: page past them.
+            page = orders.filter(Q(updated__gt=after[0]) | Q(updated=after[0], id__gt=after[1]))
+        chunk = list(page.values_list("id", "updated")[:chunk_size])
+        if not chunk:
+            break
+        order_ids = [order_id for order_id, updated in chunk]
+
+        lines = OrderItem.objects.filter(order_id__in=order_ids)
+        products_by_order = defaultdict(lambda: array("q"))
+        for order_id, product_id in lines.values_list("order_id", "product_id").iterator(chunk_size=10_000):
+            products_by_order[order_id].append(product_id)
+        count_pairs(products_by_order.values(), pairs)
+
+        counted.extend(order_ids)
+        after = chunk[-1][1], chunk[-1][0]
+        watermark = after[0] if watermark is None else max(watermark, after[0])
+        if len(pairs) >= FLUSH_PAIRS:
+            _flush(pairs, counted, watermark)
+            pairs = Counter()
+            counted = array("q")
+        total += len(order_ids)
+        if progress:
+            progress(total)
+        if len(order_ids) < chunk_size:
+            break
+
+    _flush(pairs, counted, watermark)
+    return total
+
+
+@transaction.atomic
+def _flush(pairs, order_ids, watermark):
+    """
+    Add the counted pairs to the matrix, re-rank the products they touch
+    and mark their orders as counted.
+    """
+    # Locking the state row serialises concurrent runs; the markers' unique
+    # constraint makes a run that raced another fail instead of double counting.
+    state = RecommendationState.objects.select_for_update().get(pk=1)
+    deltas = defaultdict(dict)
+    for key, count in pairs.items():
+        first, second = key >> 32, key & 0xFFFFFFFF
+        deltas[first][second] = count
+        deltas[second][first] = count
+
+    products = sorted(deltas)
+    for start in range(0, len(products), PRODUCT_GROUP):
+        _merge_group({product_id: deltas[product_id] for product_id in products[start:start + PRODUCT_GROUP]})
+
+    mark_counted(CountedOrder.RECOMMENDATIONS, order_ids)
+    if watermark is not None and (state.watermark is None or watermark > state.watermark):
+        state.watermark = watermark
+        state.save(update_fields=["watermark"])
+    if deltas:
+        bump_generation_on_commit(RECOMMENDATIONS_NAMESPACE)
+
+
+def _merge_group(deltas):
+    rows = defaultdict(dict)
+    for product_id, other_id, count in ProductCooccurrence.objects.filter(product_id__in=deltas).values_list(
+        "product_id", "other_id", "count"
+    ):
+        rows[product_id][other_id] = count
+    for product_id, counts in deltas.items():
+        row = rows[product_id]
+        for other_id, count in counts.items():
+            row[other_id] = row.get(other_id, 0) + count
+
+    ProductCooccurrence.objects.bulk_create(
+        [
+            ProductCooccurrence(product_id=product_id, other_id=other_id, count=rows[product_id][other_id])
+            for product_id, counts in deltas.items()
+            for other_id in counts
+        ],
+        update_conflicts=True,
+        unique_fields=["product", "other"],
+        update_fields=["count"],
+    )
+
+    neighbours = settings.STORE_RECOMMENDATION_NEIGHBOURS
+    ProductRecommendation.objects.filter(product_id__in=deltas).delete()
+    ProductRecommendation.objects.bulk_create(
+        ProductRecommendation(product_id=product_id, recommended_id=other_id, score=count)
+        for product_id in deltas
+        for other_id, count in heapq.nlargest(
+            neighbours, rows[product_id].items(), key=lambda item: (item[1], -item[0])
+        )
+    )
+
+
+def also_bought(product_ids, limit):
+    """
+    Active products most often bought together with any of the given ones,
+    from the precomputed top neighbours, excluding the given products.
+
+    :param product_ids: Ids of the products being viewed or in the basket
+    :param limit: Number of products to return
+    """
+    return (
+        active_products()
+        .filter(recommended_for__product__in=product_ids)
+        .exclude(id__in=product_ids)
+        .annotate(recommendation_score=Sum("recommended_for__score"))
+        .order_by("-recommendation_score", "id")[:limit]
+    )
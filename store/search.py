@@ -0,0 +1,162 @@
+"""
+Full-text product search backed by an SQLite FTS5 table.
+
+``store_product_fts`` holds one document per active product, keyed by the
+product id as rowid, with the title, description, category name and all
+specification values as separate columns. Documents are (re)built with a
+single INSERT ... SELECT so indexing a product, a category or the whole
+catalog all go through the same statement.
+"""
+
+import re
+
+from django.db import connection
+
+FTS_TABLE = "store_product_fts"
+
+# bm25 column weights: title, description, category, specifications.
+RANK = "bm25(10.0, 1.0, 4.0, 2.0)"
+
+# bm25 costs a few microseconds per matching row, so very broad queries
+# are ranked over the newest matches only to keep latency flat.
+MAX_CANDIDATES = 5000
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, description, category, specifications, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+CONFIGURE_SQL = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', '{RANK}')"
+DROP_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+_DOCUMENTS_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description, category, specifications)
+    SELECT p.id, p.title, p.description, c.name,
+           (SELECT group_concat(v.value, ' ')
+              FROM store_productspecificationvalue v
+             WHERE v.product_id = p.id)
+      FROM store_product p
+      JOIN store_category c ON c.id = p.category_id
+     WHERE p.is_active AND {{where}}
+"""
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def is_available():
+    """
+    Return True when the default database can host the FTS5 index.
+    """
+    return connection.vendor == "sqlite"
+
+
+def _placeholders(values):
+    return ", ".join(["%s"] * len(values))
+
+
+def index_products(product_ids):
+    """
+    Re-index the given products. Inactive or missing products are dropped.
+    """
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({_placeholders(product_ids)})", product_ids)
+        cursor.execute(_DOCUMENTS_SQL.format(where=f"p.id IN ({_placeholders(product_ids)})"), product_ids)
+
+
+def remove_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({_placeholders(product_ids)})", product_ids)
+
+
+def index_category(category_id):
+    """
+    Re-index every product filed directly under a category.
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM store_product WHERE category_id = %s)",
+            [category_id],
+        )
+        cursor.execute(_DOCUMENTS_SQL.format(where="p.category_id = %s"), [category_id])
+
+
+def rebuild(batch_size=10000):
+    """
+    Rebuild the whole index in product id ranges and optimise it.
+
+    :return: Number of documents indexed
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(CONFIGURE_SQL)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute("SELECT coalesce(max(id), 0) FROM store_product")
+        max_id = cursor.fetchone()[0]
+        for start in range(0, max_id, batch_size):
+            cursor.execute(_DOCUMENTS_SQL.format(where="p.id > %s AND p.id <= %s"), [start, start + batch_size])
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 query: every word must match, the last one
+    as a prefix so partially typed words still find results.
+    """
+    words = _WORD.findall(query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) > 1:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchResults(list):
+    """
+    Product ids of one page of results. ``truncated`` is True when the query
+    matched more than MAX_CANDIDATES products and only the newest of them
+    were ranked.
+    """
+
+    def __init__(self, ids=(), truncated=False):
+        super().__init__(ids)
+        self.truncated = truncated
+
+
+def search(query, limit=20, offset=0):
+    """
+    Return the ids of matching products, best match first.
+
+    Only the newest MAX_CANDIDATES matches are ranked, so a broad query
+    costs at most that many bm25 scores; the result's ``truncated`` flag
+    tells callers when older matches were left out.
+
+    :return: SearchResults
+    """
+    match = build_match(query)
+    if not match or not is_available():
+        return SearchResults()
+    with connection.cursor() as cursor:
+        # Walking the doclist in rowid order needs no bm25 scores.
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT 1 OFFSET %s",
+            [match, MAX_CANDIDATES],
+        )
+        truncated = cursor.fetchone() is not None
+        cursor.execute(
+            "SELECT rowid FROM ("
+            f"  SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s"
+            ") ORDER BY rank LIMIT %s OFFSET %s",
+            [match, MAX_CANDIDATES, limit, offset],
+        )
+        return SearchResults([row[0] for row in cursor.fetchall()], truncated)
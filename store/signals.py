@@ -0,0 +1,107 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from core.cache import bump_generation_on_commit
+
+from . import facets, imaging, page_cache, search
+from .category_tree import CATEGORY_TREE_NAMESPACE
+from .models import Category, Product, ProductImage, ProductSpecification, ProductSpecificationValue
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def category_tree_changed(sender, **kwargs):
+    bump_generation_on_commit(CATEGORY_TREE_NAMESPACE)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, **kwargs):
+    Product.objects.filter(Q(pk=instance.product_id) | Q(feature_image=instance.pk)).refresh_feature_images()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductSpecificationValue)
+@receiver(post_delete, sender=ProductSpecificationValue)
+def product_specification_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_products([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_category(instance.pk)
+
+
+@receiver(pre_save, sender=ProductSpecificationValue)
+def product_specification_value_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._facet_previous = (
+            ProductSpecificationValue.objects.filter(pk=instance.pk).values_list("specification_id", "value").first()
+        )
+
+
+@receiver(post_save, sender=ProductSpecificationValue)
+def product_specification_value_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_facet_previous", None)
+    current = (instance.specification_id, instance.value)
+    if previous and previous != current:
+        facets.remove_product(*previous, instance.product_id)
+    facets.add_product(*current, instance.product_id)
+
+
+@receiver(post_delete, sender=ProductSpecificationValue)
+def product_specification_value_deleted(sender, instance, **kwargs):
+    facets.remove_product(instance.specification_id, instance.value, instance.product_id)
+
+
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+def product_specification_changed_name(sender, **kwargs):
+    bump_generation_on_commit(facets.FACET_NAMESPACE)
+
+
+@receiver(pre_save, sender=Product)
+def product_changing(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_slug = Product.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_page_changed(sender, instance, **kwargs):
+    page_cache.invalidate_on_commit(instance.slug, getattr(instance, "_previous_slug", None))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_facets_changed(sender, **kwargs):
+    bump_generation_on_commit(facets.FACET_COUNTS_NAMESPACE)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_page_changed(sender, instance, **kwargs):
+    page_cache.invalidate_on_commit(*Product.objects.filter(pk=instance.product_id).values_list("slug", flat=True))
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        imaging.schedule(instance.pk)
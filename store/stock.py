@@ -0,0 +1,282 @@
+"""
+Stock levels and reservations.
+
+``Product.stock`` counts the units free to order; NULL means the product's
+stock is not tracked. Units only ever leave it through a conditional
+``UPDATE ... SET stock = stock - n WHERE stock >= n``, so concurrent
+writers can never take it below zero, whatever they read before.
+
+* hold() keeps the units in an authenticated user's basket reserved for
+  STORE_STOCK_RESERVATION_SECONDS after each basket change.
+* take() runs in the checkout transaction and takes the ordered units,
+  first from the user's holds and the rest from free stock.
+* release_expired() returns the units of lapsed holds to stock.
+* restock_unpaid() returns the units of orders left unpaid for
+  STORE_UNPAID_ORDER_SECONDS, and take_paid() takes them again if such
+  an order is paid after all.
+
+Stock changes that sell a product out or bring it back also set its
+``updated_at``, so incremental product feeds pick up the new availability.
+
+All of them lock any order rows first, then the product rows they change,
+in ascending id order, and only then the reservations, so two transactions
+always lock rows in the same order and cannot deadlock.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Now
+from django.db.models.lookups import Exact
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+
+from .models import Product, StockReservation
+
+
+class OutOfStock(Exception):
+    """
+    Raised when an order asks for more units than are free.
+    """
+
+    def __init__(self, product_ids):
+        super().__init__(f"Not enough stock for products {product_ids}")
+        self.product_ids = product_ids
+
+
+def _lock_products(product_ids):
+    """
+    Lock the tracked products among ``product_ids`` in ascending id order.
+
+    :return: Dict of product id to free stock, in id order
+    """
+    return dict(
+        Product.objects.select_for_update()
+        .filter(pk__in=product_ids, stock__isnull=False)
+        .order_by("pk")
+        .values_list("pk", "stock")
+    )
+
+
+def _set_stock(products, stock):
+    """
+    Set the stock of ``products`` to the expression ``stock``, touching
+    ``updated_at`` of the ones that sell out or come back in stock.
+
+    :return: Number of products updated
+    """
+    available_changed = Q(stock=0) ^ Q(Exact(stock, 0))
+    return products.update(
+        stock=stock, updated_at=Case(When(available_changed, then=Now()), default=F("updated_at"))
+    )
+
+
+def _decrement(product_id, qty):
+    """
+    Take ``qty`` free units of a product.
+
+    :return: True if they were taken or the product's stock is not tracked
+    """
+    products = Product.objects.filter(Q(stock__isnull=True) | Q(stock__gte=qty), pk=product_id)
+    return bool(_set_stock(products, F("stock") - qty))
+
+
+def _increment(product_id, qty):
+    _set_stock(Product.objects.filter(pk=product_id, stock__isnull=False), F("stock") + qty)
+
+
+@transaction.atomic
+def hold(user_id, quantities, now=None):
+    """
+    Hold the given quantities of products for a user, replacing their
+    previous holds and extending them by STORE_STOCK_RESERVATION_SECONDS.
+
+    A hold only grows if the extra units are free; otherwise the previous
+    hold is kept and checkout takes the difference from free stock, if it
+    is there by then.
+
+    :param user_id: Id of the basket's user
+    :param quantities: Dict of product id to basket quantity, 0 to release
+    :param now: Current time, for tests
+    :return: Ids of the products that could not be held in full
+    """
+    tracked = list(_lock_products(quantities))
+    if not tracked:
+        return []
+    held = dict(
+        StockReservation.objects.select_for_update()
+        .filter(user_id=user_id, product_id__in=tracked)
+        .order_by("product_id")
+        .values_list("product_id", "qty")
+    )
+    expires_at = (now or timezone.now()) + timedelta(seconds=settings.STORE_STOCK_RESERVATION_SECONDS)
+
+    holds, released, short = [], [], []
+    for product_id in tracked:
+        current, wanted = held.get(product_id, 0), quantities[product_id]
+        if wanted > current:
+            if _decrement(product_id, wanted - current):
+                current = wanted
+            else:
+                short.append(product_id)
+        elif wanted < current:
+            _increment(product_id, current - wanted)
+            current = wanted
+        if current:
+            holds.append(StockReservation(user_id=user_id, product_id=product_id, qty=current, expires_at=expires_at))
+        else:
+            released.append(product_id)
+
+    if holds:
+        StockReservation.objects.bulk_create(
+            holds, update_conflicts=True, unique_fields=["user", "product"], update_fields=["qty", "expires_at"]
+        )
+    if released:
+        StockReservation.objects.filter(user_id=user_id, product_id__in=released).delete()
+    return short
+
+
+def release(user_id):
+    """
+    Return every unit held for a user to stock.
+    """
+    held = StockReservation.objects.filter(user_id=user_id).values_list("product_id", flat=True)
+    hold(user_id, dict.fromkeys(held, 0))
+
+
+def take(user_id, lines):
+    """
+    Take the units of an order, first from the user's holds and the rest
+    from free stock. Must run inside the transaction that creates the
+    order, so nothing is taken if it fails.
+
+    The free units of every line are taken with one conditional UPDATE,
+    so the cost does not grow with the number of lines.
+
+    :param user_id: Id of the ordering user
+    :param lines: Iterable of (product id, quantity) pairs
+    :raises OutOfStock: If any product has too few free units
+    """
+    quantities = defaultdict(int)
+    for product_id, qty in lines:
+        quantities[product_id] += qty
+    free = _lock_products(quantities)
+    if not free:
+        return
+    held = dict(
+        StockReservation.objects.select_for_update()
+        .filter(user_id=user_id, product_id__in=free)
+        .order_by("product_id")
+        .values_list("product_id", "qty")
+    )
+
+    needed = {}
+    for product_id in free:
+        extra = quantities[product_id] - held.get(product_id, 0)
+        if extra > 0:
+            needed[product_id] = extra
+        elif extra < 0:
+            _increment(product_id, -extra)
+    short = [product_id for product_id, extra in needed.items() if free[product_id] < extra]
+    if short:
+        raise OutOfStock(short)
+    if needed:
+        extra = Case(*(When(pk=product_id, then=qty) for product_id, qty in needed.items()))
+        taken = _set_stock(Product.objects.filter(pk__in=needed, stock__gte=extra), F("stock") - extra)
+        if taken != len(needed):
+            # Another checkout got there between the read and the update.
+            raise OutOfStock(sorted(needed))
+    if held:
+        StockReservation.objects.filter(user_id=user_id, product_id__in=held).delete()
+
+
+def release_expired(now=None, batch_size=500):
+    """
+    Return the units of expired holds to stock and delete the holds.
+
+    :param now: Current time, for tests
+    :param batch_size: Holds released per transaction
+    :return: Number of holds released
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.filter(expires_at__lte=now).order_by("product_id", "id")
+            product_ids = set(expired.values_list("product_id", flat=True)[:batch_size])
+            if not product_ids:
+                return total
+            # Products first, then the holds, re-read now that nobody can change them.
+            _lock_products(product_ids)
+            expired = list(
+                expired.select_for_update()
+                .filter(product_id__in=product_ids)
+                .values_list("id", "product_id", "qty")[:batch_size]
+            )
+            returned = defaultdict(int)
+            for reservation_id, product_id, qty in expired:
+                returned[product_id] += qty
+            for product_id in sorted(returned):
+                _increment(product_id, returned[product_id])
+            StockReservation.objects.filter(id__in=[reservation[0] for reservation in expired]).delete()
+        total += len(expired)
+
+
+def _order_quantities(order_ids):
+    quantities = defaultdict(int)
+    for product_id, qty in OrderItem.objects.filter(order_id__in=order_ids).values_list("product_id", "quantity"):
+        quantities[product_id] += qty
+    return quantities
+
+
+def restock_unpaid(now=None, batch_size=100):
+    """
+    Return the units of orders left unpaid for STORE_UNPAID_ORDER_SECONDS to
+    stock, so abandoned checkouts do not keep them for good.
+
+    :param now: Current time, for tests
+    :param batch_size: Orders restocked per transaction
+    :return: Number of orders restocked
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.STORE_UNPAID_ORDER_SECONDS)
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Locking the orders keeps a concurrent payment confirmation out.
+            order_ids = list(
+                Order.objects.select_for_update()
+                .filter(billing_status=False, stock_returned=False, created__lt=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not order_ids:
+                return total
+            returned = _order_quantities(order_ids)
+            for product_id in _lock_products(returned):
+                _increment(product_id, returned[product_id])
+            Order.objects.filter(id__in=order_ids).update(stock_returned=True)
+        total += len(order_ids)
+
+
+def take_paid(order_ids):
+    """
+    Take the units of orders that restock_unpaid() had returned to stock but
+    that have been paid after all. Must run in the transaction that marks
+    them paid, with the order rows locked.
+
+    A paid order cannot be refused, so a product with too few free units
+    is taken down to zero and reported.
+
+    :param order_ids: Ids of the orders
+    :return: Ids of the products that were short
+    """
+    needed = _order_quantities(order_ids)
+    free = _lock_products(needed)
+    short = [product_id for product_id, units in free.items() if units < needed[product_id]]
+    for product_id, units in free.items():
+        _set_stock(Product.objects.filter(pk=product_id), Value(max(units - needed[product_id], 0)))
+    return short
@@ -0,0 +1,46 @@
+from django import template
+from django.utils.html import format_html
+
+from store.imaging import srcset
+from store.models import ProductImageDerivative
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes="100vw", css_class="img-fluid", width=None, height=None):
+    """
+    Render a product image as a <picture> offering its resized WebP and
+    JPEG copies through srcset, falling back to the original upload.
+
+    ``sizes`` only picks the copy to download; ``width`` sets the rendered
+    width in pixels. Its height follows from the copies' aspect ratio unless
+    given, so the browser can reserve the space before the image loads.
+
+    Usage: {% responsive_image product.feature_image sizes="200px" width=200 %}
+    """
+    if not image:
+        return ""
+    alt = image.alt_text or "Responsive image"
+    derivatives = list(image.derivatives.all())
+    if width and not height and derivatives:
+        height = round(int(width) * derivatives[0].height / derivatives[0].width)
+    dimensions = ""
+    if width:
+        dimensions = format_html(' width="{}"', width)
+        if height:
+            dimensions += format_html(' height="{}"', height)
+    if not derivatives:
+        return format_html('<img class="{}" src="{}"{} alt="{}">', css_class, image.image.url, dimensions, alt)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img class="{}" src="{}" srcset="{}" sizes="{}"{} alt="{}" loading="lazy"></picture>',
+        srcset(derivatives, ProductImageDerivative.WEBP),
+        sizes,
+        css_class,
+        image.image.url,
+        srcset(derivatives, ProductImageDerivative.JPEG),
+        sizes,
+        dimensions,
+        alt,
+    )
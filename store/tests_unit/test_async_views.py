@@ -0,0 +1,59 @@
+import importlib
+
+from django.test import TestCase, override_settings
+from django.urls import clear_url_caches, reverse
+
+import basket.urls
+import core.urls
+import store.urls
+from store import views
+from store.models import Category, Product, ProductType
+
+
+def reload_urls():
+    for module in (store.urls, basket.urls, core.urls):
+        importlib.reload(module)
+    clear_url_caches()
+
+
+@override_settings(ASYNC_VIEWS=True)
+class TestAsyncCatalogViews(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reload_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        reload_urls()
+
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        self.category = Category.objects.create(name='django', slug='django')
+        self.product = Product.objects.create(
+            product_type=product_type, category=self.category, title='django beginners', slug='django-beginners',
+            regular_price='20.00', discount_price='20.00',
+        )
+
+    def test_async_views_are_routed(self):
+        self.assertIs(self.client.get('/').resolver_match.func, views.aproduct_all)
+
+    async def test_catalog_pages(self):
+        """
+        The async views render the same pages as the sync ones.
+        """
+        response = await self.async_client.get(reverse('store:store_home'))
+        self.assertContains(response, 'django beginners')
+        response = await self.async_client.get(reverse('store:category_list', args=['django']))
+        self.assertContains(response, 'django beginners')
+        response = await self.async_client.get(reverse('store:category_list', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_product_detail_conditional_get(self):
+        url = self.product.get_absolute_url()
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'django beginners')
+        self.assertIn('csrftoken', response.cookies)
+        response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
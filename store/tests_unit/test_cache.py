@@ -0,0 +1,189 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import cache as shared_cache
+from core.cache import bump_generation, cache_lock, cache_stats, get_or_compute, versioned_key
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-cache'}}
+
+
+class CacheTestMixin:
+    def setUp(self):
+        cache.clear()
+        shared_cache.stats.reset()
+        self.calls = 0
+
+    def compute(self, value='value', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+
+        return compute
+
+    def fetch_concurrently(self, threads, compute):
+        barrier = threading.Barrier(threads)
+        results = []
+
+        def fetch():
+            barrier.wait()
+            results.append(get_or_compute('test', 'key', compute=compute, timeout=60))
+
+        workers = [threading.Thread(target=fetch) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return results
+
+    def test_value_is_computed_once(self):
+        for _ in range(3):
+            self.assertEqual(get_or_compute('test', 'key', compute=self.compute(), timeout=60), 'value')
+        self.assertEqual(self.calls, 1)
+        counts = cache_stats()['test']
+        self.assertEqual((counts['hits'], counts['misses'], counts['computes']), (2, 1, 1))
+        self.assertAlmostEqual(counts['ratio'], 2 / 3)
+
+    def test_bumping_the_generation_recomputes(self):
+        get_or_compute('test', 'key', compute=self.compute('old'), timeout=60)
+        bump_generation('test')
+        self.assertEqual(get_or_compute('test', 'key', compute=self.compute('new'), timeout=60), 'new')
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_misses_compute_once(self):
+        results = self.fetch_concurrently(8, self.compute(delay=0.2))
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.calls, 1)
+        counts = cache_stats()['test']
+        self.assertEqual(counts['misses'], 8)
+        self.assertEqual(counts['waits'], 7)
+
+    def test_waits_for_the_lock_holder(self):
+        key = versioned_key('test', 'key')
+
+        def store_later():
+            time.sleep(0.1)
+            cache.set(key, ('stored', 0.0, None))
+
+        with cache_lock(key) as acquired:
+            self.assertTrue(acquired)
+            writer = threading.Thread(target=store_later)
+            writer.start()
+            value = get_or_compute('test', 'key', compute=self.compute(), timeout=60)
+            writer.join()
+        self.assertEqual(value, 'stored')
+        self.assertEqual(self.calls, 0)
+
+    def test_computes_when_the_lock_holder_never_stores(self):
+        key = versioned_key('test', 'key')
+        with mock.patch.object(shared_cache, 'LOCK_WAIT', 0.1), cache_lock(key):
+            self.assertEqual(get_or_compute('test', 'key', compute=self.compute(), timeout=60), 'value')
+        self.assertEqual(self.calls, 1)
+
+    def test_refreshes_a_hit_early(self):
+        get_or_compute('test', 'key', compute=self.compute('old'), timeout=60)
+        with mock.patch.object(shared_cache, '_expires_early', return_value=True):
+            self.assertEqual(get_or_compute('test', 'key', compute=self.compute('new'), timeout=60), 'new')
+        self.assertEqual(get_or_compute('test', 'key', compute=self.compute('newer'), timeout=60), 'new')
+        self.assertEqual(cache_stats()['test']['early'], 1)
+
+    def test_early_refresh_skipped_while_locked(self):
+        get_or_compute('test', 'key', compute=self.compute('old'), timeout=60)
+        with mock.patch.object(shared_cache, '_expires_early', return_value=True), cache_lock(
+            versioned_key('test', 'key')
+        ):
+            self.assertEqual(get_or_compute('test', 'key', compute=self.compute('new'), timeout=60), 'old')
+        self.assertEqual(self.calls, 1)
+
+
+@override_settings(CACHES=LOCMEM)
+class TestGetOrComputeLocMem(CacheTestMixin, SimpleTestCase):
+    pass
+
+
+class TestGetOrComputeFileBased(CacheTestMixin, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.directory,
+            }
+        }
+        settings = override_settings(CACHES=caches)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+    def lock_files(self):
+        return os.listdir(os.path.join(self.directory, 'locks'))
+
+    def test_file_lock_is_exclusive(self):
+        key = versioned_key('test', 'key')
+        with cache_lock(key) as acquired:
+            self.assertTrue(acquired)
+            with cache_lock(key) as again:
+                self.assertFalse(again)
+            self.assertEqual(len(self.lock_files()), 1)
+        self.assertEqual(self.lock_files(), [])
+        with cache_lock(key) as acquired:
+            self.assertTrue(acquired)
+
+    def test_file_lock_holder_leaves_a_successors_lock(self):
+        key = versioned_key('test', 'key')
+        first = cache_lock(key)
+        self.assertTrue(first.__enter__())
+        (name,) = self.lock_files()
+        os.remove(os.path.join(self.directory, 'locks', name))
+        with cache_lock(key) as second:
+            self.assertTrue(second)
+            first.__exit__(None, None, None)
+            self.assertEqual(self.lock_files(), [name])
+            with cache_lock(key) as third:
+                self.assertFalse(third)
+
+
+@skipUnless(os.environ.get('DJANGO_TEST_REDIS_URL') or fakeredis, 'needs DJANGO_TEST_REDIS_URL or fakeredis')
+class TestGetOrComputeRedis(CacheTestMixin, SimpleTestCase):
+    """
+    Runs against the Redis or Redis-compatible server at DJANGO_TEST_REDIS_URL,
+    whose database is flushed by every test, or else an in-process fakeredis.
+    """
+
+    def setUp(self):
+        if os.environ.get('DJANGO_TEST_REDIS_URL'):
+            backend = {'LOCATION': os.environ['DJANGO_TEST_REDIS_URL']}
+        else:
+            backend = {
+                'LOCATION': 'redis://fakeredis',
+                'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': fakeredis.FakeServer()},
+            }
+        caches = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', **backend}}
+        settings = override_settings(CACHES=caches)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+
+class TestExpiresEarly(SimpleTestCase):
+    def test_probability_grows_near_expiry(self):
+        expires_at = time.time() + 0.5
+        with mock.patch('core.cache.random.random', return_value=0.0):
+            self.assertFalse(shared_cache._expires_early(1.0, expires_at, 1.0))
+        with mock.patch('core.cache.random.random', return_value=0.9):
+            self.assertTrue(shared_cache._expires_early(1.0, expires_at, 1.0))
+            self.assertFalse(shared_cache._expires_early(1.0, expires_at, 0))
+            self.assertFalse(shared_cache._expires_early(1.0, None, 1.0))
@@ -0,0 +1,47 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from store.category_tree import get_category_tree
+from store.models import Category
+
+
+class TestCategoryTree(TestCase):
+    def setUp(self):
+        self.books = Category.objects.create(name='books', slug='books')
+        self.django = Category.objects.create(name='django', slug='django', parent=self.books)
+
+    def test_tree_is_cached(self):
+        """
+        Once built, the tree is served without touching the database.
+        """
+        tree = get_category_tree()
+        self.assertEqual([node.slug for node in tree], ['books', 'django'])
+        self.assertEqual(tree.get('django').parent_id, self.books.id)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_category_tree(), tree)
+
+    def test_edits_invalidate_tree(self):
+        """
+        Saving, moving or deleting a category is visible on the next lookup.
+        """
+        get_category_tree()
+        Category.objects.create(name='python', slug='python')
+        self.assertIsNotNone(get_category_tree().get('python'))
+
+        self.django.move_to(None)
+        self.assertIsNone(get_category_tree().get('django').parent_id)
+
+        self.django.delete()
+        self.assertIsNone(get_category_tree().get('django'))
+
+    def test_navigation_renders_from_tree(self):
+        """
+        Pages render the category dropdown from the cached tree.
+        """
+        get_category_tree()
+        with CaptureQueriesContext(connection) as queries:
+            html = self.client.get('/basket/').content.decode('utf8')
+        self.assertFalse([q for q in queries.captured_queries if 'store_category' in q['sql']])
+        self.assertIn(self.django.get_absolute_url(), html)
@@ -0,0 +1,164 @@
+from array import array
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from core.cache import bump_generation
+from store import facets
+from store.models import (Category, FacetPosting, FacetPostingChange, Product, ProductSpecification,
+                          ProductSpecificationValue, ProductType)
+
+
+class TestFacets(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product_type = ProductType.objects.create(name='book')
+        self.category = Category.objects.create(name='Books', slug='books')
+        self.format = ProductSpecification.objects.create(product_type=self.product_type, name='format')
+        self.language = ProductSpecification.objects.create(product_type=self.product_type, name='language')
+        self.products = {}
+        for slug, book_format, language in [
+            ('a', 'hardback', 'English'),
+            ('b', 'hardback', 'French'),
+            ('c', 'paperback', 'English'),
+        ]:
+            product = self.products[slug] = Product.objects.create(
+                product_type=self.product_type,
+                category=self.category,
+                title=slug,
+                slug=slug,
+                regular_price='9.99',
+                discount_price='4.99',
+            )
+            ProductSpecificationValue.objects.create(product=product, specification=self.format, value=book_format)
+            ProductSpecificationValue.objects.create(product=product, specification=self.language, value=language)
+
+    def ids(self, *slugs):
+        return array('q', sorted(self.products[slug].id for slug in slugs))
+
+    def test_postings_follow_specification_values(self):
+        """
+        Posting lists are updated as specification values change.
+        """
+        index = facets.get_facet_index()
+        self.assertEqual(index.postings['format']['hardback'], self.ids('a', 'b'))
+
+        value = ProductSpecificationValue.objects.get(product=self.products['b'], specification=self.format)
+        value.value = 'paperback'
+        value.save()
+        index = facets.get_facet_index()
+        self.assertEqual(index.postings['format']['hardback'], self.ids('a'))
+        self.assertEqual(index.postings['format']['paperback'], self.ids('b', 'c'))
+
+        value.delete()
+        self.assertEqual(facets.get_facet_index().postings['format']['paperback'], self.ids('c'))
+
+    def test_changes_are_logged_then_compacted(self):
+        """
+        Value changes are logged instead of rewriting the posting list, and
+        compacting folds them in without changing the index.
+        """
+        facets.rebuild()
+        hardback = FacetPosting.objects.filter(specification=self.format, value='hardback')
+        stored = bytes(hardback.get().product_ids)
+        value = ProductSpecificationValue.objects.get(product=self.products['b'], specification=self.format)
+        value.value = 'paperback'
+        value.save()
+        self.assertEqual(FacetPostingChange.objects.count(), 2)
+        self.assertEqual(bytes(hardback.get().product_ids), stored)
+        before = facets.get_facet_index().postings
+
+        self.assertEqual(facets.compact(), 2)
+        self.assertFalse(FacetPostingChange.objects.exists())
+        self.assertEqual(facets.unpack(hardback.get().product_ids), self.ids('a'))
+        bump_generation(facets.FACET_NAMESPACE)
+        self.assertEqual(facets.get_facet_index().postings, before)
+
+    def test_compacts_once_enough_changes_are_pending(self):
+        facets.rebuild()
+        value = ProductSpecificationValue.objects.get(product=self.products['b'], specification=self.format)
+        with mock.patch.object(facets, 'COMPACT_AFTER', 3), self.captureOnCommitCallbacks(execute=True):
+            value.value = 'paperback'
+            value.save()
+            self.assertEqual(FacetPostingChange.objects.count(), 2)
+            value.value = 'ebook'
+            value.save()
+        self.assertFalse(FacetPostingChange.objects.exists())
+        self.assertEqual(facets.unpack(FacetPosting.objects.get(value='ebook').product_ids), self.ids('b'))
+
+    def test_category_counts_are_scoped_and_cached(self):
+        """
+        A category page only counts the facets of its product types, and
+        repeats come from the cache until a product changes.
+        """
+        shirt = ProductType.objects.create(name='shirt')
+        size = ProductSpecification.objects.create(product_type=shirt, name='size')
+        clothes = Category.objects.create(name='Clothes', slug='clothes')
+        for slug in ['s', 'm', 'l']:
+            product = Product.objects.create(
+                product_type=shirt, category=clothes, title=slug, slug=f'shirt-{slug}',
+                regular_price='9.99', discount_price='4.99',
+            )
+            ProductSpecificationValue.objects.create(product=product, specification=size, value=slug)
+
+        url = reverse('store:category_list', args=['books'])
+        with mock.patch.object(facets, 'intersect', wraps=facets.intersect) as intersect:
+            response = self.client.get(url)
+            self.assertEqual(intersect.call_count, 4)
+            self.assertEqual([group['name'] for group in response.context['facets']], ['format', 'language'])
+
+            intersect.reset_mock()
+            self.client.get(url)
+            self.assertEqual(intersect.call_count, 0)
+
+            self.products['c'].is_active = False
+            self.products['c'].save()
+            response = self.client.get(url)
+            groups = {group['name']: group['values'] for group in response.context['facets']}
+            self.assertEqual([(v['value'], v['count']) for v in groups['format']], [('hardback', 2)])
+
+    def test_match_and_counts(self):
+        """
+        Selected values are OR-ed within a facet and AND-ed across facets.
+        """
+        index = facets.get_facet_index()
+        self.assertEqual(index.match({'format': ['hardback'], 'language': ['English']}), self.ids('a'))
+        self.assertEqual(index.match({'language': ['English', 'French']}), self.ids('a', 'b', 'c'))
+        self.assertIsNone(index.match({}))
+        self.assertEqual(
+            index.counts(self.ids('a', 'b')),
+            {'format': {'hardback': 2}, 'language': {'English': 1, 'French': 1}},
+        )
+
+    def test_rebuild(self):
+        """
+        The rebuild command recreates identical posting lists.
+        """
+        before = facets.get_facet_index().postings
+        FacetPosting.objects.all().delete()
+        call_command('rebuild_facet_index', stdout=StringIO())
+        self.assertEqual(facets.get_facet_index().postings, before)
+
+    def test_category_view_filters(self):
+        """
+        Facet query parameters filter the category page and report counts.
+        """
+        url = reverse('store:category_list', args=['books'])
+        response = self.client.get(url, {'format': 'hardback', 'language': 'English'})
+        self.assertEqual(response.context['products'], [self.products['a']])
+
+        response = self.client.get(url, {'format': 'hardback'})
+        self.assertEqual(set(response.context['products']), {self.products['a'], self.products['b']})
+        groups = {group['name']: group['values'] for group in response.context['facets']}
+        self.assertEqual([(v['value'], v['count']) for v in groups['language']], [('English', 1), ('French', 1)])
+
+    def test_large_id_filter(self):
+        """
+        Large id sets are passed to SQLite as a single parameter.
+        """
+        ids = array('q', range(self.products['c'].id, self.products['c'].id + 2000))
+        self.assertEqual(list(facets.filter_ids(Product.objects.all(), ids)), [self.products['c']])
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from store.listing import active_products
+from store.models import Category, Product, ProductImage, ProductType
+
+
+class TestFeatureImage(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            product_type=ProductType.objects.create(name='book'),
+            category=Category.objects.create(name='django', slug='django'),
+            title='django',
+            slug='django',
+            regular_price='9.99',
+            discount_price='4.99',
+        )
+
+    def feature_image(self):
+        return Product.objects.get(pk=self.product.pk).feature_image
+
+    def test_hooks_keep_feature_image(self):
+        """
+        Saving and deleting images keeps Product.feature_image in step.
+        """
+        ProductImage.objects.create(product=self.product, image='images/a.jpg')
+        self.assertIsNone(self.feature_image())
+
+        feature = ProductImage.objects.create(product=self.product, image='images/b.jpg', is_feature=True)
+        self.assertEqual(self.feature_image(), feature)
+
+        feature.is_feature = False
+        feature.save()
+        self.assertIsNone(self.feature_image())
+
+        second = ProductImage.objects.create(product=self.product, image='images/c.jpg', is_feature=True)
+        feature.is_feature = True
+        feature.save()
+        self.assertEqual(self.feature_image(), feature)
+        feature.delete()
+        self.assertEqual(self.feature_image(), second)
+
+    def test_changed_feature_image_touches_product(self):
+        """
+        Only a changed feature image gives the product a new updated_at.
+        """
+        old = timezone.now() - timedelta(days=1)
+        Product.objects.update(updated_at=old)
+        Product.objects.refresh_feature_images()
+        self.assertEqual(Product.objects.get().updated_at, old)
+
+        ProductImage.objects.create(product=self.product, image='images/b.jpg', is_feature=True)
+        self.assertGreater(Product.objects.get().updated_at, old)
+
+    def test_listing_fetches_one_image_per_product(self):
+        """
+        Listing products with their feature image (and its resized copies)
+        takes one query for the products and one for the derivatives.
+        """
+        ProductImage.objects.create(product=self.product, image='images/a.jpg')
+        feature = ProductImage.objects.create(product=self.product, image='images/b.jpg', is_feature=True)
+        with self.assertNumQueries(2):
+            self.assertEqual([p.feature_image for p in active_products()], [feature])
+
+    def test_backfill_command(self):
+        """
+        The backfill command repairs products whose feature image is missing.
+        """
+        feature = ProductImage.objects.create(product=self.product, image='images/b.jpg', is_feature=True)
+        Product.objects.update(feature_image=None)
+        call_command('backfill_feature_images', stdout=StringIO())
+        self.assertEqual(self.feature_image(), feature)
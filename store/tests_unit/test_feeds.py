@@ -0,0 +1,83 @@
+import csv
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from store.models import Category, Product, ProductImage, ProductType
+from store.stock import hold
+
+
+class TestProductFeed(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        books = Category.objects.create(name='Books', slug='books')
+        python = Category.objects.create(name='Python', slug='python', parent=books)
+        self.django = Product.objects.create(
+            product_type=product_type, category=python, title='Django & co', slug='django',
+            regular_price='9.99', discount_price='4.99',
+        )
+        ProductImage.objects.create(product=self.django, image='images/django.jpg', is_feature=True)
+        self.retired = Product.objects.create(
+            product_type=product_type, category=books, title='Retired', slug='retired',
+            regular_price='1.00', discount_price='1.00', is_active=False,
+        )
+
+    def feed(self, feed_format, **params):
+        response = self.client.get(reverse('store:product_feed', args=[feed_format]), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_feed(self):
+        """
+        The full feed lists active products with their category path and image.
+        """
+        rows = list(csv.DictReader(StringIO(self.feed('csv'))))
+        self.assertEqual([row['slug'] for row in rows], ['django'])
+        self.assertEqual(rows[0]['category'], 'Books > Python')
+        self.assertEqual(rows[0]['image_link'], 'http://testserver/media/images/django.jpg')
+        self.assertEqual(rows[0]['link'], 'http://testserver/django/')
+        self.assertEqual(rows[0]['price'], '4.99')
+
+    def test_jsonl_and_xml_feeds(self):
+        items = [json.loads(line) for line in self.feed('jsonl').splitlines()]
+        self.assertEqual(items[0]['title'], 'Django & co')
+        self.assertIn('<title>Django &amp; co</title>', self.feed('xml'))
+        self.assertEqual(self.client.get('/feeds/products.pdf').status_code, 404)
+
+    def test_incremental_feed(self):
+        """
+        ?since= lists products updated after it, including deactivated ones.
+        """
+        since = timezone.now() - timedelta(minutes=1)
+        Product.objects.filter(pk=self.django.pk).update(updated_at=since - timedelta(days=1))
+        items = [json.loads(line) for line in self.feed('jsonl', since=since.isoformat()).splitlines()]
+        self.assertEqual([(item['slug'], item['availability']) for item in items], [('retired', 'out_of_stock')])
+        response = self.client.get(reverse('store:product_feed', args=['csv']), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_sold_out_products(self):
+        """
+        A product whose last unit is held is out of stock, also in the incremental feed.
+        """
+        user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        Product.objects.filter(pk=self.django.pk).update(stock=2, updated_at=timezone.now() - timedelta(days=1))
+        since = timezone.now() - timedelta(minutes=1)
+        hold(user.id, {self.django.id: 1})
+        self.assertEqual(self.feed('jsonl', since=since.isoformat()).count('django'), 0)
+        hold(user.id, {self.django.id: 2})
+        items = [json.loads(line) for line in self.feed('jsonl', since=since.isoformat()).splitlines()]
+        self.assertIn(('django', 'out_of_stock'), [(item['slug'], item['availability']) for item in items])
+        hold(user.id, {self.django.id: 0})
+        self.assertEqual(json.loads(self.feed('jsonl').splitlines()[0])['availability'], 'in_stock')
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_feed', format='jsonl', base_url='https://shop.example/', stdout=out)
+        item = json.loads(out.getvalue())
+        self.assertEqual(item['link'], 'https://shop.example/django/')
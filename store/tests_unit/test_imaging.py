@@ -0,0 +1,80 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.cache import cache_lock
+from store import page_cache
+from store.imaging import generate_derivatives
+from store.models import Category, Product, ProductImage, ProductType
+
+
+class TestImageDerivatives(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, STORE_IMAGE_WIDTHS=(100, 200, 800))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        product = Product.objects.create(
+            product_type=ProductType.objects.create(name='book'),
+            category=Category.objects.create(name='django', slug='django'),
+            title='django',
+            slug='django',
+            regular_price='9.99',
+            discount_price='4.99',
+        )
+        buffer = BytesIO()
+        Image.new('RGBA', (400, 300), (255, 0, 0, 255)).save(buffer, format='PNG')
+        self.image = ProductImage(product=product, is_feature=True)
+        self.image.image.save('cover.png', ContentFile(buffer.getvalue()))
+
+    def test_generates_resized_copies(self):
+        """
+        Each configured width up to the original is written in every format.
+        """
+        self.assertEqual(generate_derivatives(self.image.pk), 4)
+        derivatives = {(d.format, d.width, d.height) for d in self.image.derivatives.all()}
+        self.assertEqual(derivatives, {('webp', 100, 75), ('webp', 200, 150), ('jpeg', 100, 75), ('jpeg', 200, 150)})
+
+        self.assertEqual(generate_derivatives(self.image.pk), 0)
+        self.assertEqual(generate_derivatives(self.image.pk, force=True), 4)
+        self.assertEqual(self.image.derivatives.count(), 4)
+
+    def test_page_version_changes(self):
+        """
+        Writing the derivatives gives the product page a new version.
+        """
+        version = page_cache.product_version('django')
+        generate_derivatives(self.image.pk)
+        self.assertNotEqual(page_cache.product_version('django'), version)
+
+    def test_skipped_while_another_worker_generates(self):
+        with cache_lock(f'store:image_derivatives:{self.image.pk}'):
+            self.assertEqual(generate_derivatives(self.image.pk), 0)
+        self.assertEqual(generate_derivatives(self.image.pk), 4)
+
+    def test_responsive_image_tag(self):
+        """
+        The template tag offers the derivatives through srcset.
+        """
+        generate_derivatives(self.image.pk)
+        html = Template('{% load store_images %}{% responsive_image image sizes="200px" %}').render(
+            Context({'image': self.image}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-200w.jpeg 200w', html)
+
+    def test_responsive_image_tag_dimensions(self):
+        """
+        A rendered width is emitted along with the height from the aspect ratio.
+        """
+        template = Template('{% load store_images %}{% responsive_image image sizes="200px" width=200 %}')
+        self.assertIn('width="200"', template.render(Context({'image': self.image})))
+        generate_derivatives(self.image.pk)
+        self.image = type(self.image).objects.get(pk=self.image.pk)
+        self.assertIn('width="200" height="150"', template.render(Context({'image': self.image})))
@@ -0,0 +1,86 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from store import search
+from store.category_tree import get_category_tree
+from store.importer import CatalogImporter, read_csv
+from store.models import Category, Product, ProductImage, ProductSpecificationValue
+
+CSV_FEED = """slug,title,description,category,product_type,regular_price,discount_price,is_active,images,spec:format
+django,Django for beginners,Web apps,Books/Python/Django,book,9.99,4.99,1,images/a.jpg|images/b.jpg,hardback
+flask,Flask in action,Microframework,Books/Python,book,19.99,,true,images/c.jpg,paperback
+"""
+
+
+class TestCatalogImport(TestCase):
+    def test_csv_import(self):
+        """
+        Importing creates products, nested categories, images and specifications.
+        """
+        imported = CatalogImporter().run(read_csv(StringIO(CSV_FEED)), chunk_size=1)
+        self.assertEqual(imported, 2)
+
+        django = Product.objects.get(slug='django')
+        self.assertEqual(django.category.get_ancestors().count(), 2)
+        self.assertEqual(str(django.discount_price), '4.99')
+        self.assertEqual(str(Product.objects.get(slug='flask').discount_price), '19.99')
+        self.assertEqual(django.feature_image.image.name, 'images/a.jpg')
+        self.assertEqual(ProductSpecificationValue.objects.get(product=django).value, 'hardback')
+        self.assertEqual(search.search('flask'), [Product.objects.get(slug='flask').id])
+
+        tree = get_category_tree()
+        books = tree.get('books')
+        self.assertEqual(len(tree.descendant_ids(books)), 3)
+
+    def test_reimport_updates_in_place(self):
+        """
+        Rows are upserted by slug rather than duplicated.
+        """
+        CatalogImporter().run(read_csv(StringIO(CSV_FEED)))
+        feed = CSV_FEED.replace('Django for beginners', 'Django for professionals').replace('hardback', 'ebook')
+        CatalogImporter().run(read_csv(StringIO(feed)))
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(ProductImage.objects.count(), 3)
+        self.assertEqual(Category.objects.count(), 3)
+        django = Product.objects.get(slug='django')
+        self.assertEqual(django.title, 'Django for professionals')
+        self.assertEqual(ProductSpecificationValue.objects.get(product=django).value, 'ebook')
+
+    def test_same_name_under_different_parents(self):
+        """
+        Categories are matched under their parent, and new ones get unique slugs.
+        """
+        rows = [
+            {'slug': slug, 'title': slug, 'category': path, 'product_type': 'book', 'regular_price': '5.00'}
+            for slug, path in [('emma', 'Fiction/Classics'), ('gibbon', 'History/Classics'), ('ulysses', 'Classics')]
+        ]
+        CatalogImporter().run(rows)
+
+        self.assertEqual(Product.objects.get(slug='emma').category.parent.name, 'Fiction')
+        self.assertEqual(Product.objects.get(slug='gibbon').category.parent.name, 'History')
+        self.assertIsNone(Product.objects.get(slug='ulysses').category.parent)
+        self.assertEqual(
+            sorted(Category.objects.filter(name='Classics').values_list('slug', flat=True)),
+            ['classics', 'classics-2', 'history-classics'],
+        )
+
+    def test_jsonl_command(self):
+        """
+        The management command streams a JSON Lines feed.
+        """
+        row = {
+            'slug': 'rails', 'title': 'Rails', 'category': 'Books/Ruby', 'product_type': 'book',
+            'regular_price': '5.00', 'images': ['images/r.jpg'], 'specifications': {'format': 'ebook'},
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as feed:
+            feed.write(json.dumps(row) + '\n')
+            feed.flush()
+            out = StringIO()
+            call_command('import_catalog', feed.name, stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertTrue(Product.objects.filter(slug='rails', category__parent__name='Books').exists())
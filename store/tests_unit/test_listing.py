@@ -0,0 +1,59 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from store.category_tree import get_category_tree
+from store.listing import category_products
+from store.models import Category, Product, ProductType
+
+
+class TestCategoryListing(TestCase):
+    def setUp(self):
+        self.product_type = ProductType.objects.create(name='book')
+        self.books = Category.objects.create(name='Books', slug='books')
+        self.python = Category.objects.create(name='Python', slug='python', parent=self.books)
+        self.django = Category.objects.create(name='Django', slug='django', parent=self.python)
+        self.music = Category.objects.create(name='Music', slug='music')
+        self.deep = self.create_product(self.django, 'deep')
+        self.shallow = self.create_product(self.books, 'shallow')
+        self.other = self.create_product(self.music, 'other')
+        self.hidden = self.create_product(self.python, 'hidden', is_active=False)
+
+    def create_product(self, category, slug, is_active=True):
+        return Product.objects.create(
+            product_type=self.product_type,
+            category=category,
+            title=slug,
+            slug=slug,
+            regular_price='9.99',
+            discount_price='4.99',
+            is_active=is_active,
+        )
+
+    def test_descendant_ids(self):
+        """
+        Descendant sets follow the MPTT ranges and include the node itself.
+        """
+        tree = get_category_tree()
+        self.assertEqual(tree.descendant_ids(tree.get('books')), {self.books.id, self.python.id, self.django.id})
+        self.assertEqual(tree.descendant_ids(tree.get('django')), {self.django.id})
+        self.assertEqual(tree.descendant_ids(tree.get('music')), {self.music.id})
+
+    def test_category_products(self):
+        """
+        A category lists active products of its whole subtree in one query.
+        """
+        node = get_category_tree().get('books')
+        with self.assertNumQueries(1):
+            products = list(category_products(node).prefetch_related(None))
+        self.assertEqual(products, [self.shallow, self.deep])
+
+    def test_category_view(self):
+        """
+        The category page is looked up by slug, not by name.
+        """
+        response = self.client.get(reverse('store:category_list', args=['python']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['products'], [self.deep])
+
+        response = self.client.get(reverse('store:category_list', args=['missing']))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,74 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from store import page_cache
+from store.models import Category, Product, ProductImage, ProductType
+
+
+class TestProductPageCache(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            product_type=ProductType.objects.create(name='book'),
+            category=Category.objects.create(name='django', slug='django'),
+            title='django beginners',
+            slug='django-beginners',
+            regular_price='9.99',
+            discount_price='4.99',
+        )
+        self.url = reverse('store:product_detail', args=['django-beginners'])
+
+    def test_not_modified(self):
+        """
+        Revalidating an unchanged page returns 304.
+        """
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response.headers)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_produce_new_etag(self):
+        """
+        Saving the product or one of its images changes the ETag.
+        """
+        etag = self.client.get(self.url).headers['ETag']
+        ProductImage.objects.create(product=self.product, image='images/a.jpg')
+        image_etag = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).headers['ETag']
+        self.assertNotEqual(image_etag, etag)
+
+        self.product.title = 'django for professionals'
+        self.product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=image_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'django for professionals')
+
+    def test_version_cached_before_commit_is_dropped(self):
+        """
+        A version cached between the save and its commit is invalidated on commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.title = 'django for professionals'
+            self.product.save()
+            page_cache.product_version('django-beginners')
+            self.assertIsNotNone(cache.get(page_cache._version_key('django-beginners')))
+        self.assertIsNone(cache.get(page_cache._version_key('django-beginners')))
+
+    def test_anonymous_pages_served_from_cache(self):
+        """
+        A repeat anonymous visit is served without querying the database.
+        """
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+
+    def test_renamed_slug_is_not_served(self):
+        """
+        The old URL of a product stops resolving once its slug changes.
+        """
+        self.client.get(self.url)
+        self.product.slug = 'django-basics'
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
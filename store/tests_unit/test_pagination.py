@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from store.models import Category, Product, ProductType
+from store.pagination import InvalidCursor, KeysetPaginator
+
+
+class TestKeysetPaginator(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='django', slug='django')
+        self.product_type = ProductType.objects.create(name='book')
+        for i in range(7):
+            Product.objects.create(
+                product_type=self.product_type,
+                category=self.category,
+                title=f'book {i}',
+                slug=f'book-{i}',
+                regular_price='9.99',
+                discount_price='4.99',
+            )
+        self.ordered = list(Product.objects.all())
+
+    def test_pages_walk_forward_and_back(self):
+        """
+        Following next cursors visits every product once, prev cursors return.
+        """
+        paginator = KeysetPaginator(Product.objects.all(), 3)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+
+        self.assertEqual(first.object_list + second.object_list + third.object_list, self.ordered)
+        self.assertFalse(first.has_previous)
+        self.assertFalse(third.has_next)
+        self.assertEqual(paginator.get_page(second.previous_cursor).object_list, first.object_list)
+        self.assertFalse(paginator.get_page(second.previous_cursor).has_previous)
+
+    def test_invalid_cursor(self):
+        """
+        Garbage cursors are rejected instead of producing a server error.
+        """
+        paginator = KeysetPaginator(Product.objects.all(), 3)
+        with self.assertRaises(InvalidCursor):
+            paginator.get_page('not-a-cursor')
+
+    @override_settings(STORE_PAGE_SIZE=5)
+    def test_homepage_is_paginated(self):
+        """
+        The homepage renders one page and links to the next one.
+        """
+        response = self.client.get(reverse('store:store_home'))
+        self.assertEqual(len(response.context['products']), 5)
+        self.assertContains(response, '?cursor=')
+
+        response = self.client.get(reverse('store:store_home'), {'cursor': response.context['page'].next_cursor})
+        self.assertEqual(response.context['products'], self.ordered[5:])
+
+        response = self.client.get(reverse('store:store_home'), {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store.listing import popular_products
+from store.models import Category, PopularityState, Product, ProductPopularity, ProductType
+from store.popularity import REBASE_AFTER, refresh_popularity
+
+
+@override_settings(STORE_POPULARITY_HALF_LIFE_DAYS=1, STORE_POPULAR_COUNT=2)
+class TestPopularity(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'book {n}', slug=f'book-{n}',
+                regular_price='10.00', discount_price='10.00',
+            )
+            for n in range(3)
+        ]
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.now = timezone.now()
+
+    def order(self, age, *lines, paid=True):
+        order = Order.objects.create(
+            user=self.user, full_name='name', address1='add1', address2='add2', city='', phone='',
+            post_code='', total_paid='10.00', order_key=f'key-{Order.objects.count()}', billing_status=paid,
+        )
+        Order.objects.filter(pk=order.pk).update(created=self.now - age)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price='10.00', quantity=qty) for product, qty in lines
+        )
+        return order
+
+    def ranking(self):
+        return [product.slug for product in popular_products(3)]
+
+    def test_recent_orders_outrank_older_larger_ones(self):
+        old, recent, unsold = self.products
+        self.order(timedelta(days=3), (old, 6))
+        self.order(timedelta(days=1), (recent, 4))
+        self.assertEqual(refresh_popularity(now=self.now), 2)
+        self.assertEqual(self.ranking(), ['book-1', 'book-0'])
+
+        scores = dict(ProductPopularity.objects.values_list('product_id', 'score'))
+        self.assertAlmostEqual(scores[recent.id] / scores[old.id], 4 / (6 / 4))
+
+    def test_refresh_only_counts_new_paid_orders(self):
+        first, second, third = self.products
+        self.order(timedelta(hours=1), (first, 1))
+        refresh_popularity(batch_size=1, now=self.now)
+        self.order(timedelta(hours=1), (second, 3))
+        unpaid = self.order(timedelta(hours=1), (third, 10), paid=False)
+
+        self.assertEqual(refresh_popularity(now=self.now), 1)
+        self.assertEqual(self.ranking(), ['book-1', 'book-0'])
+        self.assertEqual(refresh_popularity(now=self.now), 0)
+
+        Order.objects.filter(pk=unpaid.pk).update(billing_status=True, updated=timezone.now())
+        self.assertEqual(refresh_popularity(now=self.now), 1)
+        self.assertEqual(self.ranking(), ['book-2', 'book-1', 'book-0'])
+        self.assertEqual(refresh_popularity(now=self.now), 0)
+
+    def test_rebase_keeps_ranking(self):
+        first, second, third = self.products
+        self.order(timedelta(hours=2), (first, 2), (second, 1))
+        refresh_popularity(now=self.now)
+        later = self.now + timedelta(days=REBASE_AFTER + 1)
+        refresh_popularity(now=later)
+        self.assertEqual(PopularityState.objects.get().landmark, later)
+        self.assertEqual(self.ranking(), [])
+
+        self.now = later
+        self.order(timedelta(hours=2), (second, 2), (third, 1))
+        refresh_popularity(now=later)
+        self.assertEqual(self.ranking(), ['book-1', 'book-2'])
+
+    def test_home_page_lists_popular_products(self):
+        self.order(timedelta(hours=1), (self.products[2], 1))
+        self.order(timedelta(hours=2), (self.products[0], 1))
+        call_command('refresh_popularity', stdout=StringIO())
+        Product.objects.filter(pk=self.products[0].pk).update(is_active=False)
+
+        response = self.client.get(reverse('store:store_home'))
+        self.assertEqual([product.slug for product in response.context['popular']], ['book-2'])
+        self.assertContains(response, 'Popular')
@@ -0,0 +1,114 @@
+from collections import Counter
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from store import recommendations
+from store.models import Category, Product, ProductCooccurrence, ProductRecommendation, ProductType
+from store.recommendations import also_bought, build_recommendations, count_pairs
+
+
+@override_settings(STORE_RECOMMENDATION_NEIGHBOURS=2, STORE_PRODUCT_PAGE_CACHE_TIMEOUT=0)
+class TestRecommendations(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.products = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'book {n}', slug=f'book-{n}',
+                regular_price='10.00', discount_price='10.00',
+            )
+            for n in range(5)
+        ]
+        self.user = get_user_model().objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+
+    def order(self, *indexes, paid=True):
+        order = Order.objects.create(
+            user=self.user, full_name='name', address1='add1', address2='add2', city='', phone='',
+            post_code='', total_paid='10.00', order_key=f'key-{Order.objects.count()}', billing_status=paid,
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=self.products[index], price='10.00', quantity=1) for index in indexes
+        )
+        return order
+
+    def pay(self, order):
+        Order.objects.filter(pk=order.pk).update(billing_status=True, updated=timezone.now())
+
+    def recommended(self, index):
+        return [product.slug for product in also_bought([self.products[index].id], 5)]
+
+    def test_count_pairs(self):
+        pairs = Counter()
+        count_pairs([[3, 1, 2], [2, 3, 3], [4]], pairs)
+        self.assertEqual(
+            {(key >> 32, key & 0xFFFFFFFF): count for key, count in pairs.items()},
+            {(1, 2): 1, (1, 3): 1, (2, 3): 2},
+        )
+
+    def test_top_neighbours_are_kept(self):
+        self.order(0, 1, 2)
+        self.order(0, 1)
+        self.order(0, 3)
+        self.order(0, 2)
+        self.order(0, 1, 4)
+        self.assertEqual(build_recommendations(chunk_size=2), 5)
+
+        self.assertEqual(ProductRecommendation.objects.filter(product=self.products[0]).count(), 2)
+        self.assertEqual(self.recommended(0), ['book-1', 'book-2'])
+        self.assertEqual(self.recommended(4), ['book-0', 'book-1'])
+        self.assertEqual(
+            ProductCooccurrence.objects.get(product=self.products[1], other=self.products[0]).count, 3
+        )
+
+    def test_incremental_updates(self):
+        self.order(0, 1)
+        build_recommendations()
+        self.assertEqual(self.recommended(0), ['book-1'])
+
+        self.order(0, 2)
+        unpaid = self.order(0, 2, paid=False)
+        self.assertEqual(build_recommendations(), 1)
+        self.assertEqual(build_recommendations(), 0)
+        self.assertEqual(self.recommended(0), ['book-1', 'book-2'])
+
+        self.pay(unpaid)
+        self.assertEqual(build_recommendations(), 1)
+        self.assertEqual(build_recommendations(), 0)
+        self.assertEqual(self.recommended(0), ['book-2', 'book-1'])
+        self.assertEqual(ProductCooccurrence.objects.get(product=self.products[0], other=self.products[2]).count, 2)
+
+    def test_counts_survive_flushing_mid_run(self):
+        self.order(0, 1)
+        self.order(0, 1)
+        self.order(1, 2)
+        with mock.patch.object(recommendations, 'FLUSH_PAIRS', 1):
+            build_recommendations(chunk_size=1)
+        self.assertEqual(ProductCooccurrence.objects.get(product=self.products[0], other=self.products[1]).count, 2)
+        self.assertEqual(self.recommended(1), ['book-0', 'book-2'])
+
+    def test_pages_show_recommendations(self):
+        orders = [self.order(0, 1, paid=False), self.order(1, 2, paid=False)]
+        call_command('build_recommendations', stdout=StringIO())
+
+        response = self.client.get(self.products[0].get_absolute_url())
+        self.assertEqual([product.slug for product in response.context['also_bought']], [])
+
+        for order in orders:
+            self.pay(order)
+        call_command('build_recommendations', stdout=StringIO())
+        response = self.client.get(self.products[0].get_absolute_url())
+        self.assertContains(response, 'Customers also bought')
+        self.assertEqual([product.slug for product in response.context['also_bought']], ['book-1'])
+
+        self.client.post(
+            reverse('basket:basket_add'), {'productid': self.products[1].id, 'productqty': 1, 'action': 'post'}
+        )
+        response = self.client.get(reverse('basket:basket_summary'))
+        self.assertEqual([product.slug for product in response.context['also_bought']], ['book-0', 'book-2'])
@@ -0,0 +1,92 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from store import search
+from store.models import Category, Product, ProductSpecification, ProductSpecificationValue, ProductType
+
+
+class TestProductSearch(TestCase):
+    def setUp(self):
+        self.product_type = ProductType.objects.create(name='book')
+        self.category = Category.objects.create(name='Programming', slug='programming')
+        self.django = self.create_product('Django for beginners', 'Build web apps with Python.')
+        self.flask = self.create_product('Flask in action', 'A small Python web framework, unlike django.')
+
+    def create_product(self, title, description, is_active=True):
+        return Product.objects.create(
+            product_type=self.product_type,
+            category=self.category,
+            title=title,
+            description=description,
+            slug=title.lower().replace(' ', '-'),
+            regular_price='9.99',
+            discount_price='4.99',
+            is_active=is_active,
+        )
+
+    def test_ranks_title_matches_first(self):
+        """
+        A title match outranks a description match.
+        """
+        self.assertEqual(search.search('django'), [self.django.id, self.flask.id])
+        self.assertEqual(search.search('djan'), [self.django.id, self.flask.id])
+        self.assertEqual(search.search('"); drop'), [])
+
+    def test_broad_queries_are_truncated(self):
+        """
+        Only the newest MAX_CANDIDATES matches are ranked, and the results say so.
+        """
+        for n in range(30):
+            self.create_product(f'Web book {n}', 'Mentions django in passing.')
+        results = search.search('django', limit=1)
+        self.assertEqual(results, [self.django.id])
+        self.assertFalse(results.truncated)
+        with mock.patch.object(search, 'MAX_CANDIDATES', 10):
+            results = search.search('django', limit=100)
+        self.assertNotIn(self.django.id, results)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(results.truncated)
+
+    def test_incremental_updates(self):
+        """
+        Product, category and specification changes reach the index.
+        """
+        self.flask.is_active = False
+        self.flask.save()
+        self.assertEqual(search.search('python'), [self.django.id])
+
+        self.category.name = 'Software'
+        self.category.save()
+        self.assertEqual(search.search('software'), [self.django.id])
+
+        specification = ProductSpecification.objects.create(product_type=self.product_type, name='format')
+        value = ProductSpecificationValue.objects.create(
+            product=self.django, specification=specification, value='hardback')
+        self.assertEqual(search.search('hardback'), [self.django.id])
+        value.delete()
+        self.assertEqual(search.search('hardback'), [])
+
+        self.django.delete()
+        self.assertEqual(search.search('python'), [])
+
+    def test_rebuild_command(self):
+        """
+        The rebuild command restores an emptied index.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM store_product_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search.search('flask'), [self.flask.id])
+
+    def test_search_view(self):
+        """
+        The search page lists matching products.
+        """
+        response = self.client.get(reverse('store:search'), {'q': 'flask'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['products'], [self.flask])
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.checkout import place_order
+from orders.models import Order
+from orders.views import payment_confirmation
+from store.models import Category, Product, ProductType, StockReservation
+from store.stock import OutOfStock, hold, release_expired, restock_unpaid, take
+
+
+@override_settings(STORE_STOCK_RESERVATION_SECONDS=60, STORE_UNPAID_ORDER_SECONDS=3600)
+class TestStock(TestCase):
+    def setUp(self):
+        product_type = ProductType.objects.create(name='book')
+        category = Category.objects.create(name='django', slug='django')
+        self.hot, self.other, self.untracked = [
+            Product.objects.create(
+                product_type=product_type, category=category, title=f'book {n}', slug=f'book-{n}',
+                regular_price='10.00', discount_price='10.00', stock=stock,
+            )
+            for n, stock in enumerate([5, 2, None])
+        ]
+        User = get_user_model()
+        self.user = User.objects.create_user('a@example.com', 'a', 'secret', is_active=True)
+        self.rival = User.objects.create_user('b@example.com', 'b', 'secret', is_active=True)
+
+    def stock(self, product):
+        return Product.objects.values_list('stock', flat=True).get(pk=product.pk)
+
+    def held(self, user):
+        return dict(StockReservation.objects.filter(user=user).values_list('product_id', 'qty'))
+
+    def test_hold_moves_units_out_of_stock(self):
+        self.assertEqual(hold(self.user.id, {self.hot.id: 3, self.untracked.id: 9}), [])
+        self.assertEqual(self.stock(self.hot), 2)
+        self.assertEqual(self.held(self.user), {self.hot.id: 3})
+
+        self.assertEqual(hold(self.rival.id, {self.hot.id: 3}), [self.hot.id])
+        self.assertEqual(self.stock(self.hot), 2)
+        self.assertEqual(self.held(self.rival), {})
+
+        hold(self.user.id, {self.hot.id: 1})
+        self.assertEqual(self.stock(self.hot), 4)
+        hold(self.user.id, {self.hot.id: 0})
+        self.assertEqual(self.stock(self.hot), 5)
+        self.assertEqual(self.held(self.user), {})
+
+    def test_take_uses_holds_then_free_stock(self):
+        hold(self.user.id, {self.hot.id: 2})
+        with transaction.atomic():
+            take(self.user.id, [(self.hot.id, 3), (self.other.id, 2), (self.untracked.id, 7)])
+        self.assertEqual((self.stock(self.hot), self.stock(self.other)), (2, 0))
+        self.assertIsNone(self.stock(self.untracked))
+        self.assertEqual(self.held(self.user), {})
+
+    def test_take_returns_unused_holds(self):
+        hold(self.user.id, {self.hot.id: 4})
+        with transaction.atomic():
+            take(self.user.id, [(self.hot.id, 1)])
+        self.assertEqual(self.stock(self.hot), 4)
+
+    def test_place_order_rolls_back_when_out_of_stock(self):
+        with self.assertRaises(OutOfStock) as raised:
+            place_order(self.user.id, 'key', [(self.hot.id, 1), (self.other.id, 3)])
+        self.assertEqual(raised.exception.product_ids, [self.other.id])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.hot), 5)
+
+        hold(self.rival.id, {self.hot.id: 4})
+        order, created = place_order(self.user.id, 'key', [(self.hot.id, 1)])
+        self.assertTrue(created)
+        self.assertEqual(self.stock(self.hot), 0)
+        with self.assertRaises(OutOfStock):
+            place_order(self.user.id, 'key2', [(self.hot.id, 1)])
+
+    def test_expired_holds_are_released(self):
+        hold(self.user.id, {self.hot.id: 2, self.other.id: 1})
+        hold(self.rival.id, {self.hot.id: 1}, now=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(minutes=2), batch_size=1), 2)
+        self.assertEqual((self.stock(self.hot), self.stock(self.other)), (4, 2))
+        self.assertEqual(self.held(self.rival), {self.hot.id: 1})
+
+        out = StringIO()
+        call_command('release_stock_reservations', stdout=out)
+        self.assertIn('Released 0', out.getvalue())
+
+    def test_products_are_locked_before_reservations(self):
+        """
+        Every operation locks product rows before reservation rows, so a
+        checkout racing a sweep or a basket change cannot deadlock.
+        """
+        locked = []
+        select_for_update = QuerySet.select_for_update
+
+        def record(queryset, *args, **kwargs):
+            locked.append(queryset.model)
+            return select_for_update(queryset, *args, **kwargs)
+
+        hold(self.user.id, {self.hot.id: 2}, now=timezone.now() - timedelta(minutes=2))
+        hold(self.rival.id, {self.hot.id: 1, self.other.id: 1})
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=record):
+            for operation in [
+                lambda: hold(self.user.id, {self.other.id: 1}),
+                lambda: take(self.rival.id, [(self.hot.id, 1)]),
+                lambda: release_expired(),
+            ]:
+                locked.clear()
+                with transaction.atomic():
+                    operation()
+                self.assertEqual(locked[0], Product)
+                self.assertEqual(locked.index(StockReservation), 1)
+
+    def test_unpaid_orders_are_restocked(self):
+        place_order(self.user.id, 'paid', [(self.hot.id, 1)])
+        place_order(self.user.id, 'abandoned', [(self.hot.id, 2), (self.other.id, 1)])
+        payment_confirmation('paid')
+        self.assertEqual(restock_unpaid(), 0)
+        later = timezone.now() + timedelta(hours=2)
+        self.assertEqual(restock_unpaid(now=later), 1)
+        self.assertEqual((self.stock(self.hot), self.stock(self.other)), (4, 2))
+        self.assertEqual(restock_unpaid(now=later), 0)
+
+        out = StringIO()
+        call_command('release_stock_reservations', stdout=out)
+        self.assertIn('restocked 0 unpaid orders', out.getvalue())
+
+    def test_restocked_order_paid_late_takes_stock_again(self):
+        place_order(self.user.id, 'late', [(self.hot.id, 2), (self.other.id, 2)])
+        restock_unpaid(now=timezone.now() + timedelta(hours=2))
+        place_order(self.rival.id, 'rival', [(self.other.id, 1)])
+
+        with self.assertLogs('orders.views', 'WARNING'):
+            payment_confirmation('late')
+        self.assertEqual((self.stock(self.hot), self.stock(self.other)), (3, 0))
+        self.assertFalse(Order.objects.get(order_key='late').stock_returned)
+        self.assertEqual(restock_unpaid(now=timezone.now() + timedelta(hours=2)), 1)
+        self.assertTrue(Order.objects.get(order_key='rival').stock_returned)
+
+    def test_basket_changes_hold_stock(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('basket:basket_add'), {'productid': self.hot.id, 'productqty': 2, 'action': 'post'})
+        self.assertEqual(self.held(self.user), {self.hot.id: 2})
+        self.client.post(reverse('basket:basket_delete'), {'productid': self.hot.id, 'action': 'post'})
+        self.assertEqual(self.held(self.user), {})
+        self.assertEqual(self.stock(self.hot), 5)
+
+    def test_basket_views_report_unheld_products(self):
+        self.client.force_login(self.user)
+        add = {'productid': self.other.id, 'productqty': 3, 'action': 'post'}
+        self.assertEqual(self.client.post(reverse('basket:basket_add'), add).json(), {
+            'qty': 3, 'unavailable': [self.other.id]})
+        update = {'productid': self.other.id, 'productqty': 2, 'action': 'post'}
+        self.assertNotIn('unavailable', self.client.post(reverse('basket:basket_update'), update).json())
+        operations = {'operations': [{'op': 'add', 'product': self.hot.id, 'qty': 6}]}
+        response = self.client.post(reverse('basket:basket_batch'), operations, content_type='application/json')
+        self.assertEqual(response.json()['unavailable'], [self.hot.id])
+
+    def test_checkout_view_reports_out_of_stock(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('basket:basket_add'), {'productid': self.other.id, 'productqty': 2, 'action': 'post'})
+        Product.objects.filter(pk=self.other.pk).update(stock=0)
+        StockReservation.objects.all().delete()
+        response = self.client.post(reverse('orders:add'), {'action': 'post', 'order_key': 'key'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['products'], [self.other.id])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -5,7 +6,17 @@ from . import views
 app_name = "store"
 
 urlpatterns = [
-    path("", views.product_all, name="store_home"),
-    path("<slug:slug>/", views.product_detail, name="product_detail"),
-    path("shop/<slug:category_slug>/", views.category_list, name="category_list"),
+    path("", views.aproduct_all if settings.ASYNC_VIEWS else views.product_all, name="store_home"),
+    path("search/", views.search, name="search"),
+    path("feeds/products.<str:feed_format>", views.product_feed, name="product_feed"),
+    path(
+        "<slug:slug>/",
+        views.aproduct_detail if settings.ASYNC_VIEWS else views.product_detail,
+        name="product_detail",
+    ),
+    path(
+        "shop/<slug:category_slug>/",
+        views.acategory_list if settings.ASYNC_VIEWS else views.category_list,
+        name="category_list",
+    ),
 ]
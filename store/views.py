@@ -1,21 +1,185 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import ensure_csrf_cookie
 
-from .models import Category, Product
+from core.shortcuts import aprepare, arender
+
+from . import feeds, page_cache
+from . import search as product_search
+from .category_tree import aget_category_tree, get_category_tree
+from .listing import active_products, faceted_category_products, popular_products
+from .models import Product
+from .pagination import InvalidCursor, KeysetPaginator
+from .recommendations import also_bought
+
+
+def _paginate(request, products):
+    paginator = KeysetPaginator(products, settings.STORE_PAGE_SIZE, ordering=Product._meta.ordering)
+    try:
+        return paginator.get_page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid page")
+
+
+async def _apaginate(request, products):
+    paginator = KeysetPaginator(products, settings.STORE_PAGE_SIZE, ordering=Product._meta.ordering)
+    try:
+        return await paginator.aget_page(request.GET.get("cursor"))
+    except InvalidCursor:
+        raise Http404("Invalid page")
+
+
+def _page_query(request):
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    return params.urlencode()
 
 
 def product_all(request):
-    products = Product.objects.prefetch_related("product_image").filter(is_active=True)
-    return render(request, "store/index.html", {"products": products})
+    page = _paginate(request, active_products())
+    popular = [] if page.has_previous else list(popular_products(settings.STORE_POPULAR_COUNT))
+    return render(request, "store/index.html", {"products": page.object_list, "page": page, "popular": popular})
+
+
+async def aproduct_all(request):
+    page = await _apaginate(request, active_products())
+    popular = []
+    if not page.has_previous:
+        popular = [product async for product in popular_products(settings.STORE_POPULAR_COUNT)]
+    return await arender(
+        request, "store/index.html", {"products": page.object_list, "page": page, "popular": popular}
+    )
 
 
 def category_list(request, category_slug=None):
-    category = get_object_or_404(Category, slug=category_slug)
-    products = Product.objects.filter(
-        category__in=Category.objects.get(name=category_slug).get_descendants(include_self=True)
+    category = get_category_tree().get(category_slug)
+    if category is None:
+        raise Http404("No category matches the given query.")
+    products, facets = faceted_category_products(category, request.GET)
+    page = _paginate(request, products)
+    return render(
+        request,
+        "store/category.html",
+        {
+            "category": category,
+            "products": page.object_list,
+            "page": page,
+            "page_query": _page_query(request),
+            "facets": facets,
+        },
+    )
+
+
+async def acategory_list(request, category_slug=None):
+    category = (await aget_category_tree()).get(category_slug)
+    if category is None:
+        raise Http404("No category matches the given query.")
+    # Facet counts come from the in-memory facet index, whose (re)load is synchronous.
+    products, facets = await sync_to_async(faceted_category_products)(category, request.GET)
+    page = await _apaginate(request, products)
+    return await arender(
+        request,
+        "store/category.html",
+        {
+            "category": category,
+            "products": page.object_list,
+            "page": page,
+            "page_query": _page_query(request),
+            "facets": facets,
+        },
     )
-    return render(request, "store/category.html", {"category": category, "products": products})
 
 
+@ensure_csrf_cookie
 def product_detail(request, slug):
-    product = get_object_or_404(Product, slug=slug, is_active=True)
-    return render(request, "store/product_detail.html", {"product": product})
\ No newline at end of file
+    version = page_cache.product_version(slug)
+    if version is None:
+        raise Http404("No Product matches the given query.")
+    etag = page_cache.page_etag(request, version)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(version.last_modified))
+    if response is None:
+        response = page_cache.get_cached_page(request, slug, etag)
+    if response is None:
+        product = get_object_or_404(
+            Product.objects.prefetch_related("product_image__derivatives"), pk=version.product_id
+        )
+        recommended = also_bought([product.id], settings.STORE_RECOMMENDATIONS)
+        response = render(request, "store/product_detail.html", {"product": product, "also_bought": recommended})
+        page_cache.set_cached_page(request, slug, etag, response)
+
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(version.last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@ensure_csrf_cookie
+async def aproduct_detail(request, slug):
+    version = await page_cache.aproduct_version(slug)
+    if version is None:
+        raise Http404("No Product matches the given query.")
+    await aprepare(request)
+    etag = page_cache.page_etag(request, version)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(version.last_modified))
+    if response is None:
+        response = page_cache.get_cached_page(request, slug, etag)
+    if response is None:
+        try:
+            products = Product.objects.prefetch_related("product_image__derivatives")
+            product = await products.aget(pk=version.product_id)
+        except Product.DoesNotExist:
+            raise Http404("No Product matches the given query.")
+        recommended = [item async for item in also_bought([product.id], settings.STORE_RECOMMENDATIONS)]
+        response = await arender(
+            request, "store/product_detail.html", {"product": product, "also_bought": recommended}
+        )
+        page_cache.set_cached_page(request, slug, etag, response)
+
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(version.last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    try:
+        page_number = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        raise Http404("Invalid page")
+    per_page = settings.STORE_PAGE_SIZE
+    ids = product_search.search(query, limit=per_page + 1, offset=(page_number - 1) * per_page)
+    found = Product.objects.with_feature_image().filter(is_active=True).in_bulk(ids[:per_page])
+    products = [found[product_id] for product_id in ids[:per_page] if product_id in found]
+    return render(
+        request,
+        "store/search.html",
+        {
+            "query": query,
+            "products": products,
+            "page_number": page_number,
+            "has_next": len(ids) > per_page,
+            "truncated": ids.truncated,
+        },
+    )
+
+
+def product_feed(request, feed_format):
+    if feed_format not in feeds.WRITERS:
+        raise Http404("Unknown feed format")
+    since = None
+    if request.GET.get("since"):
+        since = feeds.parse_since(request.GET["since"])
+        if since is None:
+            return HttpResponseBadRequest("Invalid since parameter")
+    base_url = request.build_absolute_uri("/")[:-1]
+    return StreamingHttpResponse(
+        feeds.stream_feed(feed_format, since=since, base_url=base_url),
+        content_type=feeds.CONTENT_TYPES[feed_format],
+    )